@@ -0,0 +1,58 @@
+"""
+Compares selecting large NEOs with q < 1.3 AU from 35k asteroids as property dictionaries and as an AsteroidCatalog,
+and times the vectorized orbit quantities (MOID, Tisserand parameter...) over the whole catalog.
+"""
+import sys
+from os import path
+from timeit import timeit
+
+import numpy as np
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from classes import AsteroidCatalog  # noqa: E402
+
+
+def synthetic_catalog(count, seed=0):
+    """Returns an AsteroidCatalog of random NEOs, a third of them without a measured diameter."""
+    rng = np.random.default_rng(seed)
+    a = rng.uniform(0.6, 4, count)
+    e = rng.uniform(0, 0.9, count)
+    diameter = rng.lognormal(-2, 1.2, count)
+    diameter[rng.random(count) < 1 / 3] = np.nan
+    return AsteroidCatalog({'spkid': [str(54_000_000 + index) for index in range(count)], 'designation': [f'2020 A{index}' for index in range(count)],
+                            'neo': [True] * count, 'H': rng.uniform(15, 30, count).tolist(), 'diameter': diameter.tolist(),
+                            'a': a.tolist(), 'e': e.tolist(), 'q': (a * (1 - e)).tolist(), 'Q': (a * (1 + e)).tolist(),
+                            'i': rng.uniform(0, 40, count).tolist(), 'om': rng.uniform(0, 360, count).tolist(),
+                            'w': rng.uniform(0, 360, count).tolist()})
+
+
+def property_dicts(catalog):
+    """The per-asteroid way: the diameter and perihelion distance dictionaries of physical_properties and orbital_properties."""
+    return [({'diameter': {'km': 'Unavailable' if np.isnan(diameter) else diameter}}, {'perihelion distance': {'AU': q}})
+            for diameter, q in zip(catalog.diameter.tolist(), catalog.q.tolist())]
+
+
+def loop(asteroids):
+    return [index for index, (physical, orbital) in enumerate(asteroids) if physical['diameter']['km'] != 'Unavailable'
+            and physical['diameter']['km'] > 0.14 and orbital['perihelion distance']['AU'] < 1.3]
+
+
+if __name__ == '__main__':
+    catalog = synthetic_catalog(35_000)
+    asteroids = property_dicts(catalog)
+    number = 20
+    looped = timeit(lambda: loop(asteroids), number=number) / number
+    vectorized = timeit(lambda: catalog.filter(neo=True, diameter_min=0.14, q_max=1.3), number=number) / number
+    converted = timeit(lambda: catalog.convert('q', 'km'), number=number) / number
+    ranked = timeit(lambda: catalog.sort('diameter', descending=True), number=number) / number
+    moid = timeit(lambda: catalog.earth_moid(), number=1)
+    derived = timeit(lambda: (catalog.tisserand(), catalog.synodic_period(), catalog.perihelion_velocity(), catalog.aphelion_velocity()),
+                     number=number) / number
+    print(f"{len(catalog):,} asteroids, {len(loop(asteroids)):,} selected")
+    print(f"loop over dictionaries: {looped * 1e3:7.2f} ms")
+    print(f"AsteroidCatalog.filter: {vectorized * 1e3:7.2f} ms ({looped / vectorized:.0f}x faster)")
+    print(f"convert q to km:        {converted * 1e3:7.2f} ms")
+    print(f"sort by diameter:       {ranked * 1e3:7.2f} ms")
+    print(f"Earth MOID:             {moid * 1e3:7.2f} ms")
+    print(f"Tisserand, synodic period, perihelion and aphelion velocity: {derived * 1e3:.2f} ms")
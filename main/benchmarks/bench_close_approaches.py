@@ -0,0 +1,46 @@
+"""Compares the memory of a 100k-row close approach survey held as nested dictionaries and as CloseApproach records."""
+import sys
+import tracemalloc
+from os import path
+
+import numpy as np
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from classes import CloseApproachList, CloseApproachTable  # noqa: E402
+
+
+def synthetic_cad(count, seed=0):
+    """Returns a CAD-style response with random approaches over ten years."""
+    rng = np.random.default_rng(seed)
+    minutes = np.sort(rng.integers(0, 10 * 365 * 24 * 60, count))
+    dates = (np.datetime64('2020-01-01T00:00') + minutes.astype('timedelta64[m]')).astype(object)
+    data = [[f'2020 {code}', '1', '0', date.strftime('%Y-%b-%d %H:%M'), str(distance), '0', '0', str(velocity), '0', '< 00:01', '24']
+            for code, date, distance, velocity in zip(rng.integers(0, 20000, count), dates, rng.uniform(0, 0.05, count), rng.uniform(1, 40, count))]
+    return {'fields': ['des', 'orbit_id', 'jd', 'cd', 'dist', 'dist_min', 'dist_max', 'v_rel', 'v_inf', 't_sigma_f', 'h'], 'data': data}
+
+
+def nested_dicts(table):
+    """The previous format: one three-level dictionary per approach."""
+    columns = table.rounded_columns()
+    return [{'designation': designation, 'date': date,
+             'distance': {'mi': columns['distance_mi'][index], 'km': columns['distance_km'][index], 'au': columns['distance_au'][index]},
+             'velocity': {'km/s': columns['velocity_kms'][index], 'mi/s': columns['velocity_mis'][index]}}
+            for index, (designation, date) in enumerate(zip(table.designation.tolist(), table.date_strings().tolist()))]
+
+
+def measure(build, table):
+    tracemalloc.start()
+    result = build(table)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+if __name__ == '__main__':
+    table = CloseApproachTable(synthetic_cad(100_000))
+    dicts, dict_bytes = measure(nested_dicts, table)
+    del dicts
+    records, record_bytes = measure(lambda t: CloseApproachList(t.records()), table)
+    print(f"nested dictionaries: {dict_bytes / 1e6:6.1f} MB")
+    print(f"CloseApproachList:   {record_bytes / 1e6:6.1f} MB ({dict_bytes / record_bytes:.1f}x smaller, {len(records):,} rows)")
@@ -0,0 +1,34 @@
+"""Steps a headless SimulationEngine with the default planets and a swarm of synthetic asteroids."""
+import sys
+from os import path
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from engine import SimulationEngine  # noqa: E402
+
+
+def synthetic_orbits(count, seed=0):
+    """Returns SBDB-style orbit sections for random main-belt and near-Earth orbits."""
+    rng = np.random.default_rng(seed)
+    orbits = list()
+    for a, e, i, om, w, ma in zip(rng.uniform(0.8, 3.5, count), rng.uniform(0, 0.6, count), rng.uniform(0, 30, count),
+                                  rng.uniform(0, 360, count), rng.uniform(0, 360, count), rng.uniform(0, 360, count)):
+        orbits.append({'epoch': 2460600.5, 'elements': {'a': a, 'e': e, 'i': i, 'om': om, 'w': w, 'ma': ma}})
+    return orbits
+
+
+if __name__ == '__main__':
+    for count in (10, 100, 1_000, 10_000):
+        engine = SimulationEngine(time='2025-01-01 00:00:00')
+        engine.add_defaults()
+        engine.add_bodies([dict(horizons_id=f'synthetic {n}', name=f'synthetic {n}', color='grey', radius_km=1, elements=orbit)
+                           for n, orbit in enumerate(synthetic_orbits(count))])
+        steps = 200
+        start = perf_counter()
+        for _ in range(steps):
+            engine.step(24)
+        elapsed = perf_counter() - start
+        print(f"{len(engine.ids):6} bodies: {elapsed / steps * 1e3:8.3f} ms per step, {len(engine.ids) * steps / elapsed:12,.0f} body-steps/s")
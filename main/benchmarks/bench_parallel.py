@@ -0,0 +1,49 @@
+"""
+Reports bodies x steps per second against the number of processes for a swarm of asteroids, both for Kepler positions
+(at many times) and for the N-body integrator. Pass the process counts to try, e.g. python bench_parallel.py 1 2 4 8 16 32;
+by default, powers of two up to the number of CPU cores are tried.
+"""
+import os
+import sys
+from os import path
+from timeit import timeit
+
+import numpy as np
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from bench_nbody import propagator_with_asteroids  # noqa: E402
+from kepler import J2000  # noqa: E402
+from nbody import NBodyIntegrator  # noqa: E402
+from parallel import ParallelPropagator  # noqa: E402
+
+BODIES = 35_000
+KEPLER_TIMES = 200  # Positions computed at daily times
+NBODY_STEPS = 40
+
+
+def worker_counts():
+    if len(sys.argv) > 1:
+        return [int(argument) for argument in sys.argv[1:]]
+    cores = os.cpu_count() or 1
+    return sorted({2 ** power for power in range(cores.bit_length()) if 2 ** power <= cores} | {cores})
+
+
+if __name__ == '__main__':
+    propagator = propagator_with_asteroids(BODIES)
+    jds = J2000 + np.arange(KEPLER_TIMES)
+    bodies = len(propagator)
+    print(f"{bodies:,} bodies on {os.cpu_count()} cores")
+    serial_kepler = timeit(lambda: [propagator.positions(jd) for jd in jds], number=1)
+    integrator = NBodyIntegrator.from_propagator(propagator, J2000)
+    serial_nbody = timeit(lambda: integrator.integrate(integrator.jd + NBODY_STEPS * integrator.step_days), number=1)
+    print(f"{'serial':>9}   Kepler: {bodies * KEPLER_TIMES / serial_kepler:12,.0f} body-steps/s"
+          f"   N-body: {bodies * NBODY_STEPS / serial_nbody:12,.0f} body-steps/s")
+    for workers in worker_counts():
+        parallel = ParallelPropagator(workers)
+        parallel.positions(propagator, jds[:1])  # Start the processes and copy the elements before timing
+        kepler = timeit(lambda: parallel.positions(propagator, jds), number=1)
+        nbody = timeit(lambda: parallel.integrate(integrator, integrator.jd + NBODY_STEPS * integrator.step_days), number=1)
+        parallel.close()
+        print(f"{workers:3} procs   Kepler: {bodies * KEPLER_TIMES / kepler:12,.0f} body-steps/s ({serial_kepler / kepler:4.1f}x)"
+              f"   N-body: {bodies * NBODY_STEPS / nbody:12,.0f} body-steps/s ({serial_nbody / nbody:4.1f}x)")
@@ -0,0 +1,50 @@
+"""
+Compares drawing the orbits of 500 asteroids as one Line2D per orbit and as the single LineCollection of AOS.PathLayer,
+and times computing the orbit polylines of every body at once.
+"""
+import sys
+from os import path
+from timeit import timeit
+
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.collections import LineCollection  # noqa: E402
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from bench_nbody import propagator_with_asteroids  # noqa: E402
+from kepler import J2000  # noqa: E402
+
+ORBITS = 500
+
+
+def figure_with_lines(orbits):
+    fig, ax = plt.subplots()
+    for orbit in orbits:
+        ax.plot(orbit[:, 0], orbit[:, 1], color='grey', alpha=0.35, linewidth=0.6)
+    ax.set_xlim(-4, 4)
+    ax.set_ylim(-4, 4)
+    return fig
+
+
+def figure_with_collection(orbits):
+    fig, ax = plt.subplots()
+    ax.add_collection(LineCollection(orbits, colors=(0.5, 0.5, 0.5, 0.35), linewidths=0.6))
+    ax.set_xlim(-4, 4)
+    ax.set_ylim(-4, 4)
+    return fig
+
+
+if __name__ == '__main__':
+    propagator = propagator_with_asteroids(ORBITS)
+    number = 5
+    computed = timeit(lambda: propagator.orbit_paths(J2000), number=number) / number
+    orbits = propagator.orbit_paths(J2000)[:, :, :2]
+    lines_figure, collection_figure = figure_with_lines(orbits), figure_with_collection(orbits)
+    lines = timeit(lambda: lines_figure.canvas.draw(), number=number) / number
+    collection = timeit(lambda: collection_figure.canvas.draw(), number=number) / number
+    print(f"orbit polylines of {len(orbits)} bodies: {computed * 1e3:7.2f} ms")
+    print(f"one Line2D per orbit:            {lines * 1e3:7.2f} ms per draw")
+    print(f"one LineCollection:              {collection * 1e3:7.2f} ms per draw ({lines / collection:.1f}x faster)")
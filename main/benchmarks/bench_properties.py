@@ -0,0 +1,36 @@
+"""Compares computing an asteroid's physical and orbital properties with reading the memoized result."""
+import sys
+from os import path
+from timeit import timeit
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from classes import Asteroid, NearEarthObject  # noqa: E402
+from payloads import apophis_neows, apophis_sbdb  # noqa: E402
+
+
+def make(cls):
+    """Builds an asteroid from the recorded payloads, without going through the network."""
+    asteroid = object.__new__(cls)
+    asteroid.SBDB = apophis_sbdb()
+    asteroid.NEOWS = apophis_neows()
+    asteroid.IAU, asteroid.SPKID = '99942', '2099942'
+    return asteroid
+
+
+def uncached(asteroid):
+    asteroid.invalidate_properties()
+    return asteroid.physical_properties, asteroid.orbital_properties
+
+
+def cached(asteroid):
+    return asteroid.physical_properties, asteroid.orbital_properties
+
+
+if __name__ == '__main__':
+    number = 20_000
+    for cls in (Asteroid, NearEarthObject):
+        asteroid = make(cls)
+        cold = timeit(lambda: uncached(asteroid), number=number) / number
+        warm = timeit(lambda: cached(asteroid), number=number) / number
+        print(f"{cls.__name__:16} computed: {cold * 1e6:8.2f} us   memoized: {warm * 1e6:6.3f} us   speedup: {cold / warm:,.0f}x")
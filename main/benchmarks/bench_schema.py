@@ -0,0 +1,68 @@
+"""Compares reading SBDB payloads with the previous try/except probing and with the one-pass schema extractor."""
+import sys
+from os import path
+from timeit import timeit
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+from schema import extract_sbdb  # noqa: E402
+from payloads import apophis_sbdb, sparse_sbdb  # noqa: E402
+
+PHYS_KEYS = ('H', 'diameter', 'albedo', 'rot_per', 'density')
+ELEMENT_KEYS = (('e',), ('a',), ('q',), ('Q', 'ad'), ('i',), ('om',), ('w',), ('M', 'ma'), ('tp',), ('period', 'per'), ('n',))
+
+
+def probe(section, keys):
+    """The previous way: try each key as a Quantity, fall back to a float on AttributeError, and move on on KeyError."""
+    for key in keys:
+        try:
+            return float(section[key].value)
+        except KeyError:
+            continue
+        except AttributeError:
+            try:
+                return float(section[key])
+            except KeyError:
+                continue
+    return 'Unavailable'
+
+
+def probe_legacy(sbdb):
+    """Reads the same fields as SBDBRecord by probing the payload."""
+    values = dict()
+    for key in PHYS_KEYS:
+        try:
+            values[key] = probe(sbdb['phys_par'], (key,))
+        except KeyError:
+            values[key] = 'Unavailable'
+    for keys in ELEMENT_KEYS:
+        values[keys[0]] = probe(sbdb['orbit']['elements'], keys)
+    for key in ('epoch', 'moid'):
+        values[key] = probe(sbdb['orbit'], (key,))
+    for key in ('spec_B', 'spec_T'):
+        try:
+            values[key] = sbdb['phys_par'][key]
+        except KeyError:
+            values[key] = 'Unavailable'
+    try:
+        values['orbit_class'] = sbdb['object']['orbit_class']['name']
+    except KeyError:
+        values['orbit_class'] = 'Unavailable'
+    for key in ('fullname', 'des', 'neo', 'pha', 'orbit_id'):
+        try:
+            values[key] = sbdb['object'][key]
+        except KeyError:
+            values[key] = 'Unavailable'
+    return values
+
+
+if __name__ == '__main__':
+    number = 20_000
+    for name, payload in (('Apophis (Quantities)', apophis_sbdb()), ('2024 YR4 (floats, sparse)', sparse_sbdb())):
+        legacy = timeit(lambda: probe_legacy(payload), number=number) / number
+        schema = timeit(lambda: extract_sbdb(payload), number=number) / number
+        print(f"{name:26} probing: {legacy * 1e6:6.2f} us   extractor: {schema * 1e6:6.2f} us   speedup: {legacy / schema:.1f}x")
+    payloads = [apophis_sbdb(), sparse_sbdb()] * 15_000
+    legacy = timeit(lambda: [probe_legacy(payload) for payload in payloads], number=1)
+    schema = timeit(lambda: [extract_sbdb(payload) for payload in payloads], number=1)
+    print(f"{len(payloads):,} payloads          probing: {legacy * 1e3:6.1f} ms   extractor: {schema * 1e3:6.1f} ms")
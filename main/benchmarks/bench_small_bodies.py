@@ -0,0 +1,65 @@
+"""
+Compares drawing asteroids as one Circle and label each (as CelestialBody does) and as AOS.SmallBodyLayer, and finding
+the asteroid under the mouse with a GridIndex and by measuring the distance to every asteroid.
+"""
+import sys
+from os import path
+from timeit import timeit
+
+import matplotlib
+import numpy as np
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+import AOS  # noqa: E402
+
+
+def figure():
+    fig, ax = plt.subplots(figsize=(5, 5))
+    ax.set_xlim(-2, 2)
+    ax.set_ylim(-2, 2)
+    ax.set_xticks([])
+    ax.set_yticks([])
+    return fig, ax
+
+
+def figure_with_circles(positions):
+    fig, ax = figure()
+    for index, (x, y) in enumerate(positions.tolist()):
+        ax.add_artist(plt.Circle((x, y), radius=0.005, color='grey'))
+        ax.text(x + 0.01, y, f'A{index}', fontsize=10, ha='center', va='center', color='white')
+    return fig
+
+
+def figure_with_layer(positions):
+    fig, ax = figure()
+    layer = AOS.SmallBodyLayer(ax, fig.canvas)
+    layer.set_bodies([str(index) for index in range(len(positions))], [f'A{index}' for index in range(len(positions))],
+                     ['grey'] * len(positions), np.arange(len(positions)), positions, reference=(1, 0))
+    return fig, layer
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    for count in (500, 2_000):
+        positions = rng.uniform(-2, 2, (count, 2))
+        circles = figure_with_circles(positions)
+        elapsed = timeit(lambda: circles.canvas.draw(), number=1)
+        print(f"{count:6,} Circles and labels: {elapsed * 1e3:8.1f} ms per draw")
+        plt.close(circles)
+    positions = rng.uniform(-2, 2, (35_000, 2))
+    fig, layer = figure_with_layer(positions)
+    number = 5
+    drawn = timeit(lambda: fig.canvas.draw(), number=number) / number
+    moved = timeit(lambda: layer.move(positions, reference=(1, 0)), number=number) / number
+    print(f"{len(positions):6,} in SmallBodyLayer: {drawn * 1e3:8.1f} ms per draw, {moved * 1e3:.2f} ms to move them")
+    built = timeit(lambda: AOS.GridIndex(positions, 0.02), number=number) / number
+    index = AOS.GridIndex(positions, 0.02)
+    queries = rng.uniform(-2, 2, (1000, 2)).tolist()
+    grid = timeit(lambda: [index.near(x, y, 0.02) for x, y in queries], number=1) / len(queries)
+    brute = timeit(lambda: [np.flatnonzero(np.hypot(positions[:, 0] - x, positions[:, 1] - y) <= 0.02) for x, y in queries],
+                   number=1) / len(queries)
+    print(f"GridIndex: built in {built * 1e3:.2f} ms, {grid * 1e6:.1f} us per hover (every asteroid: {brute * 1e6:.1f} us)")
@@ -0,0 +1,59 @@
+"""Recorded API payloads used by the benchmarks, so they can run without network access."""
+from collections import OrderedDict
+
+import astropy.units as u
+
+
+def apophis_sbdb():
+    """Returns the SBDB payload for 99942 Apophis, in the form astroquery's SBDB.query(..., phys=True) returns it."""
+    return OrderedDict([
+        ('object', OrderedDict([
+            ('neo', True), ('pha', True), ('des', '99942'), ('spkid', '20099942'), ('prefix', None),
+            ('fullname', '99942 Apophis (2004 MN4)'), ('kind', 'an'), ('orbit_id', '220'),
+            ('orbit_class', OrderedDict([('name', 'Aten'), ('code', 'ATE')])),
+        ])),
+        ('orbit', OrderedDict([
+            ('epoch', 2460600.5 * u.d), ('equinox', 'J2000'), ('source', 'JPL'), ('moid', 0.000251 * u.au),
+            ('elements', OrderedDict([
+                ('e', 0.1911663355386089), ('a', 0.9223803173917017 * u.au), ('q', 0.7460515589457074 * u.au),
+                ('i', 3.336590694919695 * u.deg), ('om', 203.9582378502498 * u.deg), ('w', 126.6560202062138 * u.deg),
+                ('ma', 300.8006396099432 * u.deg), ('tp', 2460714.130318469 * u.d), ('per', 323.5726271007727 * u.d),
+                ('n', 1.112576149426087 * u.deg / u.d), ('ad', 1.098709075837696 * u.au),
+            ])),
+        ])),
+        ('phys_par', OrderedDict([
+            ('H', 19.09), ('diameter', 0.34 * u.km), ('albedo', 0.35), ('rot_per', 30.56 * u.h), ('spec_B', 'Sq'),
+        ])),
+    ])
+
+
+
+def sparse_sbdb():
+    """
+    Returns an SBDB payload for a small unnumbered NEO in the shape of a plain JSON response: numbers instead of Quantities,
+    the alternate element keys (Q, M, period) and only H among the physical parameters.
+    """
+    return {
+        'object': {'neo': True, 'pha': False, 'des': '2024 YR4', 'spkid': '54509621', 'prefix': None, 'fullname': '(2024 YR4)',
+                   'kind': 'au', 'orbit_id': '48', 'orbit_class': {'name': 'Apollo', 'code': 'APO'}},
+        'orbit': {
+            'epoch': 2460800.5, 'equinox': 'J2000', 'source': 'JPL', 'moid': 0.00283,
+            'elements': {
+                'e': 0.6615999, 'a': 2.515998, 'q': 0.8513815, 'i': 3.408004, 'om': 271.3677, 'w': 134.3644,
+                'M': 40.15459, 'tp': 2460615.5, 'period': 1457.643, 'n': 0.2469744, 'Q': 4.180614,
+            },
+        },
+        'phys_par': {'H': 23.92},
+    }
+
+def apophis_neows():
+    """Returns the NeoWs payload for 99942 Apophis, trimmed to the fields ASTROINFO reads."""
+    return {
+        'id': '2099942', 'name': '99942 Apophis (2004 MN4)', 'absolute_magnitude_h': 19.09,
+        'estimated_diameter': {'kilometers': {'estimated_diameter_min': 0.3640000, 'estimated_diameter_max': 0.8139}},
+        'orbital_data': {
+            'orbit_id': '220', 'eccentricity': '.1911663355386089', 'semi_major_axis': '.9223803173917017',
+            'perihelion_distance': '.7460515589457074', 'aphelion_distance': '1.098709075837696',
+            'orbital_period': '323.5726271007727', 'mean_anomaly': '300.8006396099432',
+        },
+    }
@@ -2,32 +2,21 @@ from datetime import datetime, timedelta
 from re import sub
 from warnings import filterwarnings
 
-import astropy.units as u
 import customtkinter as ctk
 import matplotlib.pyplot as plt
-from astropy.time import Time
-from astroquery.jplhorizons import Horizons
-from matplotlib import use
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba_array
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 
-from pyfiles.classes import Asteroid
-use('TkAgg')
+from engine import DEFAULT_BODIES, SimulationEngine, coords
+from playback import Playback
+from worker import BackgroundWorker
 
-# Create a coords function to get heliocentric coordinates of an object
-def coords(horizons_id, time, id_type=None):
-    """
-    Returns the heliocentric coordinates of an object from JPL Horizons.
-    :param time: The time of the calculation in YYYY-MM-DD HH:MM:SS
-    :param horizons_id: The Horizons ID of the object in question.
-    :param id_type: Optional id-type for JPL Horizons.
-    :return: Tuple (X, Y) coordinates in AU.
-    """
-    result = Horizons(id=horizons_id, location='500@0', epochs=Time(time).tdb.jd, id_type=id_type).vectors(refplane='earth')
-    x_coord, y_coord = result['x'].quantity.to(u.AU).value[0], result['y'].quantity.to(u.AU).value[0]
-    return float(x_coord), float(y_coord)
 # Create a celestial body class
 class CelestialBody:
-    def __init__(self, plot: plt.subplots, start_time: str, color: str, name: str, fig_canvas: FigureCanvasTkAgg, horizons_id: str | float, radius_km: float = 695700.0, id_type=None):
+    def __init__(self, plot: plt.subplots, start_time: str, color: str, name: str, fig_canvas: FigureCanvasTkAgg, horizons_id: str | float, radius_km: float = 695700.0, id_type=None,
+                 position: tuple[float, float] | None = None):
         """
         A class representing a celestial body made for simplicity.
         :param plot: A matplotlib subplot for the body to be graphed on.
@@ -37,32 +26,252 @@ class CelestialBody:
         :param horizons_id: The horizons ID of the object.
         :param id_type: The ID type of the object; is usually either None or 'smallbody'.
         :param radius_km: The radius in km of the object (used for scale).
+        :param position: The (X, Y) coordinates at start_time, if they are already known; otherwise they come from JPL Horizons.
         """
         self.horizons_id = horizons_id
         self.color = color
         self.radius_au = radius_km / 1.4960e+8
-        self.x, self.y = coords(horizons_id, id_type=id_type, time=start_time)
+        self.x, self.y = position if position is not None else coords(horizons_id, id_type=id_type, time=start_time)
+        # The circle and label are created once and moved on every update
         self.obj = plt.Circle((self.x, self.y), radius=self.radius_au, color=color)
         self.plot = plot
         self.plot.add_artist(self.obj)
         self.name = name
-        self.plot.text(self.x + 2 * self.radius_au, self.y, name, fontsize=10, ha='center', va='center', color='white')
+        self.label = self.plot.text(self.x + 2 * self.radius_au, self.y, name, fontsize=10, ha='center', va='center', color='white')
         self.fig_canvas = fig_canvas
         self.id_type = id_type
     def __eq__(self, other):
         return (
             self.horizons_id == other.horizons_id
         )
-    def upd(self, time):
-        """Updates the object's position according to the current time and date."""
-        if self.obj is not None:
-            self.obj.remove()  # First, remove the object.
-        # Remove texts in the global function.
-        self.x, self.y = coords(self.horizons_id, id_type=self.id_type, time=time)  # Update the time accordingly, and get new coordinates.
-        self.obj = plt.Circle((self.x, self.y), radius=self.radius_au, color=self.color)  # Redraw the circle.
-        self.plot.add_artist(self.obj)  # Adds the circle to the plot.
-        self.plot.text(self.x + 2 * self.radius_au, self.y, self.name, fontsize=10, ha='center', va='center')  # Readds the text.
-        self.fig_canvas.draw()
+    def upd(self, time, position: tuple[float, float] | None = None):
+        """
+        Updates the object's position according to the current time and date.
+        :param time: The current time of the simulation.
+        :param position: The (X, Y) coordinates at that time, if they were computed locally; otherwise they come from JPL Horizons.
+        """
+        if position is not None:
+            self.x, self.y = position
+        else:
+            self.x, self.y = coords(self.horizons_id, id_type=self.id_type, time=time)  # Update the time accordingly, and get new coordinates.
+        # Move the existing artists; the simulation redraws the canvas once all bodies are updated.
+        self.obj.set_center((self.x, self.y))
+        self.label.set_position((self.x + 2 * self.radius_au, self.y))
+    def remove(self):
+        """Removes the object's circle and label from the plot."""
+        self.obj.remove()
+        self.label.remove()
+
+# Create a registry for the bodies in a simulation
+class BodyRegistry:
+    def __init__(self):
+        """An ordered collection of celestial bodies keyed by their Horizons ID, for O(1) lookups, additions and removals."""
+        self._bodies = dict()
+    def __contains__(self, horizons_id):
+        return str(horizons_id) in self._bodies
+    def __iter__(self):
+        return iter(list(self._bodies.values()))
+    def __len__(self):
+        return len(self._bodies)
+    def get(self, horizons_id):
+        """Returns the body with a Horizons ID, or None if it isn't registered."""
+        return self._bodies.get(str(horizons_id))
+    def add(self, body: CelestialBody):
+        """Registers a body, replacing (and removing the artists of) any body with the same Horizons ID."""
+        if (old := self._bodies.get(str(body.horizons_id))) is not None:
+            old.remove()
+        self._bodies[str(body.horizons_id)] = body
+    def remove(self, horizons_id):
+        """Unregisters a body and removes its artists. Returns the body, or None if it wasn't registered."""
+        body = self._bodies.pop(str(horizons_id), None)
+        if body is not None:
+            body.remove()
+        return body
+    def clear(self):
+        """Unregisters every body and removes their artists."""
+        for body in self._bodies.values():
+            body.remove()
+        self._bodies.clear()
+
+# Create a layer for the orbits and trails of every body
+class PathLayer:
+    def __init__(self, plot: plt.subplots, trail_length: int = 60):
+        """
+        The orbit ellipses and fading trails of every body, drawn as two LineCollections however many bodies there are.
+        Orbits are polylines computed by the engine once per set of elements; trails are the bodies' last positions,
+        kept in one array that every step shifts by one row.
+        :param plot: A matplotlib subplot for the paths to be graphed on.
+        :param trail_length: The number of positions in a trail.
+        """
+        self.orbits = LineCollection([], linewidths=0.6, zorder=1)
+        self.trails = LineCollection([], linewidths=1.2, zorder=2)
+        plot.add_collection(self.orbits)
+        plot.add_collection(self.trails)
+        self.ids = list()  # Horizons IDs, in the order of the columns of self.history
+        self.colors = np.empty((0, 4))
+        self.history = np.full((trail_length, 0, 2), np.nan)  # The last positions of every body, oldest first; NaN where unknown
+        self.fade = np.linspace(0, 0.8, trail_length)[1:]  # The alpha of each segment of a trail, oldest first
+    def set_bodies(self, ids, positions: np.ndarray, colors, orbit_ids, orbits):
+        """
+        Sets the bodies the layer draws, keeping the trails of bodies that were already drawn.
+        :param ids: The Horizons IDs of the bodies.
+        :param positions: Their current (N, 2) positions, which start the trails of new bodies.
+        :param colors: Their colors.
+        :param orbit_ids: The Horizons IDs of the bodies with an orbit.
+        :param orbits: An (N, samples, 2) array of their orbits (see SimulationEngine.orbit_paths).
+        """
+        columns = {horizons_id: column for column, horizons_id in enumerate(self.ids)}
+        history = np.full((len(self.history), len(ids), 2), np.nan)
+        history[-1] = positions
+        kept = [(column, columns[horizons_id]) for column, horizons_id in enumerate(ids) if horizons_id in columns]
+        if kept:
+            new, old = np.array(kept).T
+            history[:, new] = self.history[:, old]
+        self.ids, self.history = list(ids), history
+        self.colors = to_rgba_array(list(colors)).reshape(-1, 4)
+        color_of = dict(zip(self.ids, self.colors))
+        orbit_colors = np.array([color_of[horizons_id] for horizons_id in orbit_ids]).reshape(-1, 4)
+        orbit_colors[:, 3] = 0.35
+        self.orbits.set_segments(orbits)
+        self.orbits.set_color(orbit_colors)
+        self._draw_trails()
+    def push(self, positions: np.ndarray):
+        """Adds the current (N, 2) positions of the bodies (in the order of self.ids) to their trails."""
+        self.history = np.roll(self.history, -1, axis=0)
+        self.history[-1] = positions
+        self._draw_trails()
+    def clear_trails(self):
+        """Forgets the trails (e.g. after jumping to another date)."""
+        self.history[:] = np.nan
+        self._draw_trails()
+    def _draw_trails(self):
+        # Every segment between consecutive positions of every body, body by body: (N * (trail_length - 1), 2, 2)
+        points = self.history.transpose(1, 0, 2)
+        segments = np.stack([points[:, :-1], points[:, 1:]], axis=2).reshape(-1, 2, 2)
+        colors = np.repeat(self.colors, len(self.fade), axis=0)
+        colors[:, 3] = np.tile(self.fade, len(self.ids))
+        known = ~np.isnan(segments).any(axis=(1, 2))
+        self.trails.set_segments(segments[known])
+        self.trails.set_color(colors[known])
+
+# Create a spatial index for finding the bodies near a point
+class GridIndex:
+    ROW_SPAN = 2 ** 32  # Keys are column * ROW_SPAN + row, so every column of cells is one run of sorted keys
+    def __init__(self, points: np.ndarray, cell_size: float):
+        """
+        Buckets points into square cells, so the points near a position are found by looking at a few cells instead of
+        every point. Building it sorts the points once; a query is a couple of binary searches per column of cells.
+        :param points: An (N, 2) array of points.
+        :param cell_size: The width of a cell; queries are fastest with a radius of about this size.
+        """
+        self.points = points
+        self.cell_size = cell_size
+        cells = np.floor(points / cell_size).astype(np.int64)
+        keys = cells[:, 0] * self.ROW_SPAN + cells[:, 1]
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+    def near(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Returns the indices of the points within a radius of (x, y)."""
+        first_column, last_column = int(np.floor((x - radius) / self.cell_size)), int(np.floor((x + radius) / self.cell_size))
+        first_row, last_row = int(np.floor((y - radius) / self.cell_size)), int(np.floor((y + radius) / self.cell_size))
+        columns = np.arange(first_column, last_column + 1, dtype=np.int64) * self.ROW_SPAN
+        starts = np.searchsorted(self.keys, columns + first_row, side='left')
+        stops = np.searchsorted(self.keys, columns + last_row, side='right')
+        candidates = np.concatenate([self.order[start:stop] for start, stop in zip(starts, stops)] or [np.empty(0, dtype=int)])
+        distances = np.hypot(self.points[candidates, 0] - x, self.points[candidates, 1] - y)
+        return candidates[distances <= radius]
+
+# Create a layer for the small bodies
+class SmallBodyLayer:
+    def __init__(self, plot: plt.subplots, fig_canvas: FigureCanvasTkAgg, label_count: int = 10, hover_pixels: float = 6):
+        """
+        Every small body (asteroid) drawn as a scatter PathCollection per color (usually just one), whose offsets are moved
+        in place on every step, so tens of thousands of them draw about as fast as one artist. Matplotlib stamps the same
+        marker for every point of a one-color collection, which is several times faster than coloring each point.
+        Only the label_count bodies nearest the Earth (or the middle of the view) are labelled, plus the one under the
+        mouse, which is found with a GridIndex.
+        :param plot: A matplotlib subplot for the bodies to be graphed on.
+        :param fig_canvas: The FigureCanvasTkAgg of the plot; it is redrawn when the hovered body changes.
+        :param label_count: The number of nearest bodies that are labelled.
+        :param hover_pixels: How close (in pixels) the mouse must be to a body to label it.
+        """
+        self.plot = plot
+        self.fig_canvas = fig_canvas
+        self.hover_pixels = hover_pixels
+        self.groups = list()  # (scatter, indices of its bodies, the scatter's own array of offsets) for every color
+        self.offsets = np.empty((0, 2))  # The positions of every small body
+        self.ids, self.names = list(), list()
+        self.rows = np.empty(0, dtype=int)  # The rows of the bodies in SimulationEngine.positions
+        self.labels = [plot.annotate('', xy=(0, 0), xytext=(4, 4), textcoords='offset points', fontsize=8, color='white', visible=False)
+                       for _ in range(label_count)]
+        self.hover_label = plot.annotate('', xy=(0, 0), xytext=(6, 6), textcoords='offset points', fontsize=10, color='white',
+                                         visible=False, zorder=5)
+        self.hovered = None  # The index of the body under the mouse
+        self.index = None  # Built on the first hover after the bodies move
+        fig_canvas.mpl_connect('motion_notify_event', self.on_hover)
+    def set_bodies(self, ids, names, colors, rows, positions: np.ndarray, reference=None):
+        """
+        Sets the small bodies the layer draws.
+        :param ids: The Horizons IDs of the bodies.
+        :param names: Their names.
+        :param colors: Their colors.
+        :param rows: Their rows in positions.
+        :param positions: The (N, 2) positions of every body of the simulation (SimulationEngine.positions).
+        :param reference: The (X, Y) point the labelled bodies are nearest to; if None, the middle of the view.
+        """
+        self.ids, self.names = list(ids), list(names)
+        self.rows = np.asarray(rows, dtype=int).reshape(-1)
+        self.offsets = positions[self.rows].reshape(-1, 2)
+        for scatter, _, _ in self.groups:
+            scatter.remove()
+        self.groups = list()
+        colors = to_rgba_array(list(colors)).reshape(-1, 4)
+        unique_colors, members = np.unique(colors, axis=0, return_inverse=True)
+        for group, color in enumerate(unique_colors):
+            indices = np.flatnonzero(members.reshape(-1) == group)
+            scatter = self.plot.scatter(self.offsets[indices, 0], self.offsets[indices, 1], s=6, color=color, linewidths=0, zorder=3)
+            self.groups.append((scatter, indices, scatter.get_offsets()))  # The scatter's own array, written to in place
+        self.hovered = None
+        self.hover_label.set_visible(False)
+        self.move(positions, reference)
+    def move(self, positions: np.ndarray, reference=None):
+        """Moves the bodies to their rows of positions (SimulationEngine.positions) and relabels the nearest ones."""
+        np.take(positions, self.rows, axis=0, out=self.offsets)
+        for scatter, indices, offsets in self.groups:
+            np.take(self.offsets, indices, axis=0, out=offsets)
+            scatter.stale = True
+        self.index = None
+        if reference is None:
+            reference = (np.mean(self.plot.get_xlim()), np.mean(self.plot.get_ylim()))
+        count = min(len(self.labels), len(self.ids))
+        distances = np.sum((self.offsets - reference) ** 2, axis=1)
+        nearest = np.argpartition(distances, count - 1)[:count] if 0 < count < len(self.ids) else np.arange(count)
+        for label, index in zip(self.labels, nearest.tolist()):
+            label.set_text(self.names[index])
+            label.xy = tuple(self.offsets[index])
+            label.set_visible(True)
+        for label in self.labels[count:]:
+            label.set_visible(False)
+        if self.hovered is not None:
+            self.hover_label.xy = tuple(self.offsets[self.hovered])
+    def on_hover(self, event):
+        """Labels the body under the mouse, if any."""
+        hovered = None
+        if event.inaxes is self.plot and len(self.ids):
+            x_min, x_max = self.plot.get_xlim()
+            radius = self.hover_pixels * (x_max - x_min) / self.plot.bbox.width  # From pixels to AU
+            if self.index is None or self.index.cell_size != radius:  # Rebuilt after the bodies move or the view is zoomed
+                self.index = GridIndex(self.offsets, radius)
+            near = self.index.near(event.xdata, event.ydata, radius)
+            if near.size:
+                hovered = int(near[np.argmin(np.hypot(self.offsets[near, 0] - event.xdata, self.offsets[near, 1] - event.ydata))])
+        if hovered != self.hovered:
+            self.hovered = hovered
+            if hovered is not None:
+                self.hover_label.set_text(self.names[hovered])
+                self.hover_label.xy = tuple(self.offsets[hovered])
+            self.hover_label.set_visible(hovered is not None)
+            self.fig_canvas.draw_idle()
 
 # Create a placeholdertext class for the large text box where objects are inputted
 class PlaceholderText(ctk.CTkTextbox):
@@ -88,19 +297,19 @@ class PlaceholderText(ctk.CTkTextbox):
             self.insert("1.0", self.placeholder)
             self.tag_add("placeholder", "1.0", "end")
 
-class ORBITALSIM(ctk.CTk):
-    def __init__(self, time: None | str = None):
+# Create a view class shared by every orbital simulation widget
+class OrbitalSimView:
+    """
+    The user interface of an orbital simulation. It draws the bodies of a SimulationEngine and forwards user input to it;
+    ORBITALSIM, TOPLEVELORBITALSIM and FRAMEORBITALSIM put it in a window, a toplevel window and a frame respectively.
+    """
+    max_small_body_paths = 1000  # Small bodies only get orbits and trails while there are at most this many of them
+    def build_view(self, engine: SimulationEngine):
         """
-        The new and improved orbital simulation class.
-        :param time: The time of the simulation at the start. If nothing is entered, then it automatically becomes
-        the current date and time of the initialization. If it is an invalid string, it is reset to the default.
+        Creates the plot and widgets, and subscribes to the engine.
+        :param engine: The simulation to display.
         """
-        # <editor-fold desc="Super Call and Root Settings">
-        super().__init__()
-        self.title("ASTROINFO Orbital Simulation")
-        self.tk_setPalette(activeBackground='#4b4b4b', foreground='white', activeForeground='white', background='#3b3b3b')
         filterwarnings(action='ignore')  # Ignore erfa warnings
-        # </editor-fold>
         # <editor-fold desc="Fig and Ax settings"
         plt.style.use('dark_background')
         self.fig, self.ax = plt.subplots(figsize=(5, 5))
@@ -168,97 +377,140 @@ class ORBITALSIM(ctk.CTk):
         self.step_entry.grid(row=0, column=4, sticky='nsew', padx=6, pady=6)
         self.forward_button = ctk.CTkButton(self.time_travel_frame, text='>>', font=('Roboto', 20), command=lambda: self.time_forward())
         self.forward_button.grid(row=0, column=5, sticky='nsew', columnspan=3, padx=6, pady=6)
+        self.play_button = ctk.CTkButton(self.time_travel_frame, text='PLAY', font=('Roboto', 20), command=lambda: self.toggle_playback())
+        self.play_button.grid(row=1, column=0, sticky='nsew', columnspan=3, padx=6, pady=(0, 6))
+        self.rate_entry = ctk.CTkEntry(self.time_travel_frame, font=('Roboto', 20), placeholder_text='Enter play rate (hrs/s)...', width=250)
+        self.rate_entry.grid(row=1, column=4, sticky='nsew', columnspan=4, padx=6, pady=(0, 6))
+        # Shown while positions or objects are being fetched
+        self.progress_bar = ctk.CTkProgressBar(self.time_travel_frame, mode='indeterminate')
+        self.progress_bar.grid(row=2, column=0, sticky='ew', columnspan=8, padx=6, pady=(0, 6))
+        self.progress_bar.grid_remove()
         # </editor-fold>
         # </editor-fold>
         # <editor-fold desc="Global Variables">
-        if time is not None:
-            try:
-                self.time = (datetime.strptime(time, "%Y-%m-%d %H:%M:%S")).strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                self.time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            self.time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.bodies = list()
+        self.bodies = BodyRegistry()  # The drawn bodies, keyed by Horizons ID
+        self.paths = PathLayer(self.ax)  # The orbits and trails of the bodies
+        self.small_bodies = SmallBodyLayer(self.ax, self.canvas)  # The asteroids, drawn as one scatter
+        self.rows = dict()  # Horizons ID -> row in engine.positions
+        self.path_rows = np.empty(0, dtype=int)  # The rows of the bodies the path layer draws
+        self.engine = engine
+        self.engine.subscribe(self.on_engine_event)
+        self.worker = BackgroundWorker(self, on_busy=self.show_progress)  # Runs network requests without freezing the window
+        self.target_time = None  # The time a step in progress is moving to
+        self.jumping = False  # Whether the step in progress jumps to a date, so the trails are cleared when it finishes
+        self.playback = Playback(self.canvas.get_tk_widget(), self.engine, on_state=self.show_playing)  # Animates the simulation
         # </editor-fold>
-        self.create_defaults()
+        if len(self.engine.ids):
+            self.on_engine_event(self.engine, 'added', self.engine.ids)
+        else:
+            self.create_defaults()
+    @property
+    def time(self):
+        """The current time of the simulation in YYYY-MM-DD HH:MM:SS."""
+        return self.engine.time_string
+    def on_engine_event(self, engine: SimulationEngine, event: str, ids):
+        """Updates the drawn bodies whenever the engine changes, then redraws the canvas once."""
+        if event == 'added':
+            for horizons_id in ids:
+                body = engine.bodies[horizons_id]
+                if body.get('id_type') == 'smallbody':  # Drawn by the small body layer
+                    continue
+                self.bodies.add(CelestialBody(horizons_id=body['horizons_id'], name=body['name'], fig_canvas=self.canvas, radius_km=body['radius_km'], color=body['color'],
+                                              plot=self.ax, id_type=body.get('id_type'), start_time=engine.time_string, position=engine.position(horizons_id)))
+        elif event == 'removed':
+            for horizons_id in ids:
+                self.bodies.remove(horizons_id)
+        elif event == 'moved':
+            for body in self.bodies:  # Move every body's artists, then redraw once.
+                body.upd(engine.time_string, position=tuple(engine.positions[self.rows[str(body.horizons_id)]]))
+            self.small_bodies.move(engine.positions, self.label_reference(engine))
+            self.paths.push(engine.positions[self.path_rows])
+        if event in ('added', 'removed'):
+            self.arrange_layers(engine)
+        self.canvas.draw_idle()
+    def arrange_layers(self, engine: SimulationEngine):
+        """Hands the small bodies to the small body layer, and the bodies that get an orbit and a trail to the path layer."""
+        self.rows = {horizons_id: row for row, horizons_id in enumerate(engine.ids)}
+        small = [horizons_id for horizons_id in engine.ids if engine.bodies[horizons_id].get('id_type') == 'smallbody']
+        self.small_bodies.set_bodies(small, [engine.bodies[horizons_id]['name'] for horizons_id in small],
+                                     [engine.bodies[horizons_id]['color'] for horizons_id in small], [self.rows[horizons_id] for horizons_id in small],
+                                     engine.positions, self.label_reference(engine))
+        # Orbits and trails of tens of thousands of asteroids would hide everything else (and be slow to draw)
+        small_set = set(small)
+        path_ids = engine.ids if len(small) <= self.max_small_body_paths else [horizons_id for horizons_id in engine.ids if horizons_id not in small_set]
+        self.path_rows = np.array([self.rows[horizons_id] for horizons_id in path_ids], dtype=int)
+        self.paths.set_bodies(path_ids, engine.positions[self.path_rows], [engine.bodies[horizons_id]['color'] for horizons_id in path_ids],
+                              *engine.orbit_paths(ids=path_ids))
+    def label_reference(self, engine: SimulationEngine):
+        """The point the labelled small bodies are nearest to: the Earth if it's in the simulation, otherwise the middle of the view."""
+        return engine.positions[self.rows['399']] if '399' in self.rows else None
+    def show_progress(self, busy: bool):
+        """Shows the progress bar while the worker is busy."""
+        if busy:
+            self.progress_bar.grid()
+            self.progress_bar.start()
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.grid_remove()
+    def move_to(self, time: datetime, jump: bool = False):
+        """
+        Computes the positions at a time in the background, then moves the simulation there. A step that is still running is
+        superseded, so only the latest time is drawn. Stops the playback, if it's playing.
+        :param jump: If True, the trails are cleared instead of connecting the old positions to the new ones.
+        """
+        self.playback.pause()
+        self.target_time = time
+        self.jumping = jump or self.jumping
+        self.worker.submit('step', self.engine.positions_at, time, on_done=self.finish_move)
+    def finish_move(self, result):
+        """Applies positions computed by move_to."""
+        if self.jumping:
+            self.paths.clear_trails()
+        self.target_time, self.jumping = None, False
+        self.engine.apply_positions(*result)
     def update_sim(self, hours=0):
         """
         Updates the simulation. Can move time forward or backward a certain number of hours.
         :param hours: An integer; representing the number of hours the simulation should be forwarded or reversed by. If the number
-        is negative, then time goes backwards.
-        """
-        # Save zoom
-        xlim = self.ax.get_xlim()
-        ylim = self.ax.get_ylim()
-        # Clear ax
-        self.ax.cla()
-        # Restore ax settings
-        self.ax.set_aspect('equal')
-        self.ax.axes.format_coord = lambda x, y: ""
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.ax.set_xlim(-2, 2)
-        self.ax.set_ylim(-2, 2)
-        self.ax.set_xlim(xlim)
-        self.ax.set_ylim(ylim)
-        if hours > 0:
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S") + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        elif hours < 0:
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S") - timedelta(hours=(hours * -1))).strftime("%Y-%m-%d %H:%M:%S")
-        for text in self.ax.texts:  # First, remove the texts.
-            text.set_visible(False)
-            del text
-        for body in self.bodies:  # Then, update the bodies accordingly.
-            body.upd(self.time)
-        self.canvas.draw()
-    def add_body(self, horizons_id: str, color: str, name: str, radius_km: float, id_type: str | None = None):
-        """Adds a celestial body to the simulation."""
-        if CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, id_type=id_type, start_time=self.time) in self.bodies:
-            # This means the object already exists
-            del obj
-            return None
-        else:  # This means the object doesn't exist
-            obj = CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, id_type=id_type, start_time=self.time)
-            self.bodies.append(obj)
-            self.update_sim()
-    def remove_body(self, horizons_id: str, color: str, name: str, radius_km: float):
-        """Removes an object from the simulation."""
-        if obj := CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, start_time=self.time) in self.bodies:
-            # This means the object exists
-            self.bodies.remove(self.bodies.index(obj))
-            del obj
-            self.update_sim()
-        else:
-            pass
+        is negative, then time goes backwards. Steps taken while another step is running add up.
+        """
+        self.move_to((self.target_time or self.engine.time) + timedelta(hours=hours))
+    def add_body(self, horizons_id: str, color: str, name: str, radius_km: float, id_type: str | None = None, elements=None):
+        """
+        Adds a celestial body to the simulation. Does nothing if a body with the same Horizons ID is already in it.
+        :param elements: The orbit section of the body's SBDB payload, used to compute its position locally.
+        """
+        failed = self.add_bodies([dict(horizons_id=horizons_id, color=color, name=name, radius_km=radius_km, id_type=id_type, elements=elements)])
+        if failed:
+            raise ValueError(f"Horizons couldn't find the object {horizons_id}")
+    def add_bodies(self, bodies):
+        """
+        Adds many celestial bodies at once (see SimulationEngine.add_bodies).
+        :return: A list of the dictionaries of the bodies that couldn't be added because Horizons doesn't know them.
+        """
+        return self.engine.add_bodies(bodies)
+    def remove_body(self, horizons_id: str):
+        """Removes an object from the simulation, if it's in it."""
+        self.engine.remove_body(horizons_id)
     def create_defaults(self):
-        """Creates the default bodies (the inner solar system + Jupiter, more planets coming soon)"""
-        self.add_body(horizons_id='10', color='orange', name='Sun', radius_km=695700)  # The sun
-        self.add_body(horizons_id='199', radius_km=2440, color='grey', name='Mercury')  # Mercury
-        self.add_body(horizons_id='299', radius_km=6052, color='orange', name='Venus')  # Venus
-        self.add_body(horizons_id='399', radius_km=6378, color='blue', name='Earth')  # Earth
-        self.add_body(horizons_id='301', radius_km=1737.5, color='silver', name='Moon')  # The moon
-        self.add_body(horizons_id='499', radius_km=2110.29, color='red', name='Mars')  # Mars
-        self.add_body(horizons_id='599', radius_km=69911, color='navajowhite', name='Jupiter')  # Jupiter
-        self.canvas.draw()
+        """Creates the default bodies (the inner solar system + Jupiter, more planets coming soon); they are located in the background."""
+        self.worker.submit('objects', self.engine.locate_bodies, DEFAULT_BODIES, on_done=lambda located: self.engine.place_bodies(*located))
     def set_date_time(self):
         """Sets the date and time according to the user's input."""
-        initial_time = self.time
         try:
-            self.time = (
+            time = (
             (f"{self.date_entries['year'].get()}-{self.date_entries['month'].get()}-{self.date_entries['day'].get()} {self.date_entries['hour'].get()}:{self.date_entries['minute'].get()}:"
              f"{self.date_entries['second'].get()}").replace("Jan", '01').replace("Feb", '02').replace("Mar", '03').replace("Apr", '04').replace(
                 "May", '05').replace("Jun", '06').replace("Jul", '07').replace("Aug", '08').replace("Sep", '09').replace(
                 "Oct", "10").replace("Nov", "11").replace("Dec", "12").replace("SS", f"{datetime.now().second}").replace(
                 ":MM:", f":{datetime.now().minute}:").replace("HH", f"{datetime.now().hour}").replace("DD", f"{datetime.now().date().day}").replace(
                 "-MM-", f"-{datetime.now().date().month}-").replace("YYYY", f"{datetime.now().date().year}"))
-            formatted_time = sub(r'(....)-(\d{1, 2})-(\d{1, 2})', r'\1-0\2-0\3', self.time)
+            formatted_time = sub(r'(....)-(\d{1, 2})-(\d{1, 2})', r'\1-0\2-0\3', time)
             formatted_time = sub(r' (\d):', r' 0\1:', formatted_time)
-            self.time = sub(r':(\d):', r':0\1:', formatted_time)
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S")).strftime("%Y-%m-%d %H:%M:%S")  # Check if the time string is valid
-            self.update_sim()
+            time = sub(r':(\d):', r':0\1:', formatted_time)
+            self.move_to(datetime.strptime(time, "%Y-%m-%d %H:%M:%S"), jump=True)  # Check if the time string is valid
         except ValueError:
-            self.time = initial_time
-            self.update_sim()
+            self.move_to(self.target_time or self.engine.time)
     def time_forward(self):
         """Moves the time forward according to the step set by the user."""
         try:
@@ -273,538 +525,104 @@ class ORBITALSIM(ctk.CTk):
             self.update_sim(hours=-step)
         except (ValueError, AttributeError, KeyError):
             pass
+    def toggle_playback(self):
+        """Plays the simulation at the rate set by the user (24 simulated hours per second if none is set), or pauses it."""
+        try:
+            rate = float(self.rate_entry.get())
+        except ValueError:
+            rate = 24.0
+        if not self.playback.playing:
+            self.worker.cancel('step')  # Playback starts from the time shown, not from a step still running
+            self.target_time, self.jumping = None, False
+        self.playback.toggle(rate)
+    def show_playing(self, playing: bool):
+        """Shows whether the simulation is playing on the play button."""
+        self.play_button.configure(text='PAUSE' if playing else 'PLAY')
     def add_inputted_objects(self):
         """Adds the objects that were put into the text box by the user."""
         obj_str = self.object_input.get("1.0", ctk.END)
-        object_data = dict()
-        invalid_objs = list()
-        self.bodies.clear()
-        self.create_defaults()
-        for id in obj_str.splitlines():
-            try:
-                if id == "" or id.isspace():
-                    pass
-                else:
-                    asteroid = Asteroid(id)
-                    # Assume the asteroid has a nickname (e.g. 4 VESTA, or 99942 APOPHIS)
-                    IAU = asteroid.identifiers['SPKID']
-                    full_name = asteroid.identifiers['full name']
-                    first_space_index = full_name.index(' ')
-                    if int(IAU) <= 4_000_000:
-                        try:
-                            second_space_index = full_name.index(' ', first_space_index + 1)
-                            third_space_index = full_name.index(' ', second_space_index + 1)
-                        except Exception:
-                            second_space_index = None
-
-                        if second_space_index is not None:
-                            name = full_name[first_space_index + 1:second_space_index]
-                        else:
-                            name = full_name[:first_space_index]
-                    else:
-                        name = asteroid.identifiers['full name']
-                    try:
-                        if asteroid.physical_properties['diameter']['km'] != 'Unavailable':
-                            radius_km = float(asteroid.physical_properties['diameter']['km']) / 2
-                        else:
-                            radius_km = 1  # Average
-                    except KeyError:
-                        radius_km = 1  # Average
-
-                    if radius_km is not None:
-                        object_data[str(IAU)] = {'radius': float(radius_km), 'name': name, 'fullname': full_name}
-                    else:
-                        object_data[str(IAU)] = {'radius': None, 'name': name, 'fullname': full_name}
-
-            except (AttributeError, KeyError, ValueError):
-                pass
+        identifiers = [line for line in obj_str.splitlines() if line.strip()]
+        # Identifiers the local index doesn't know are marked right away; they are looked up online with the rest
+        self.mark_objects(SimulationEngine.unresolved_identifiers(identifiers), 'unresolved')
+        # Look the asteroids up in the background; the simulation only changes once they are found.
+        self.worker.submit('objects', self.find_objects, identifiers, on_done=self.replace_objects)
+    def mark_objects(self, identifiers, tag: str):
+        """
+        Colors the lines of the object box that hold the given identifiers, and clears the colors of every other line.
+        :param tag: 'unresolved' (not in the local index yet) or 'invalid' (not found at all).
+        """
+        identifiers = {line.strip() for line in identifiers}
+        self.object_input.tag_config('unresolved', foreground='#e0a040')
+        self.object_input.tag_config('invalid', foreground='#ff6b6b')
+        self.object_input.tag_remove('unresolved', '1.0', ctk.END)
+        self.object_input.tag_remove('invalid', '1.0', ctk.END)
+        for number, line in enumerate(self.object_input.get("1.0", "end-1c").splitlines(), start=1):
+            if line.strip() in identifiers:
+                self.object_input.tag_add(tag, f"{number}.0", f"{number}.end")
+    def find_objects(self, identifiers):
+        """
+        Looks up asteroids and locates them along with the default bodies, without changing the simulation; runs on the worker.
+        :return: A tuple of the identifiers that couldn't be found, and the located default bodies and asteroids.
+        """
+        bodies, invalid = SimulationEngine.lookup_asteroids(identifiers)
+        return invalid, self.engine.locate_bodies(DEFAULT_BODIES), self.engine.locate_asteroid_bodies(bodies)
+    def replace_objects(self, result):
+        """Replaces the simulated objects with the default bodies and the asteroids found by find_objects."""
+        invalid, defaults, asteroids = result
+        self.engine.clear()
+        self.engine.place_bodies(*defaults)
+        self.mark_objects(invalid + [body['identifier'] for body in self.engine.place_bodies(*asteroids)], 'invalid')
 
-        for iau, dictionary in object_data.items():
-            if dictionary['radius'] is not None:
-                try:
-                    self.add_body(horizons_id=dictionary['name'], color='grey', name=dictionary['fullname'], radius_km=dictionary['radius'], id_type='smallbody')
-                except ValueError:
-                    try:
-                        self.add_body(horizons_id=iau, color='grey', name=dictionary['fullname'], radius_km=dictionary['radius'], id_type='smallbody')
-                    except ValueError:
-                        pass
-class TOPLEVELORBITALSIM(ctk.CTkToplevel):
-    def __init__(self, time: None | str = None):
+class ORBITALSIM(OrbitalSimView, ctk.CTk):
+    def __init__(self, time: None | str = None, use_horizons: bool = False, use_nbody: bool = False,
+                 engine: SimulationEngine | None = None):
+        """
+        The new and improved orbital simulation class.
+        :param time: The time of the simulation at the start. If nothing is entered, then it automatically becomes
+        the current date and time of the initialization. If it is an invalid string, it is reset to the default.
+        :param use_horizons: If True, every position comes from JPL Horizons instead of being computed locally (see SimulationEngine).
+        :param use_nbody: If True, asteroids are integrated under the gravity of the Sun and planets instead of following
+        fixed Kepler orbits (see SimulationEngine).
+        :param engine: An existing simulation to display instead of creating one; time, use_horizons and use_nbody are then ignored.
+        """
+        super().__init__()
+        self.title("ASTROINFO Orbital Simulation")
+        self.tk_setPalette(activeBackground='#4b4b4b', foreground='white', activeForeground='white', background='#3b3b3b')
+        self.build_view(engine if engine is not None else SimulationEngine(time=time, use_horizons=use_horizons, use_nbody=use_nbody))
+class TOPLEVELORBITALSIM(OrbitalSimView, ctk.CTkToplevel):
+    def __init__(self, time: None | str = None, use_horizons: bool = False, use_nbody: bool = False,
+                 engine: SimulationEngine | None = None):
         """
         The new and improved orbital simulation class, but for a toplevel window.
         :param time: The time of the simulation at the start. If nothing is entered, then it automatically becomes
         the current date and time of the initialization. If it is an invalid string, it is reset to the default.
+        :param use_horizons: If True, every position comes from JPL Horizons instead of being computed locally (see SimulationEngine).
+        :param use_nbody: If True, asteroids are integrated under the gravity of the Sun and planets instead of following
+        fixed Kepler orbits (see SimulationEngine).
+        :param engine: An existing simulation to display instead of creating one; time, use_horizons and use_nbody are then ignored.
         """
-        # <editor-fold desc="Super Call and Root Settings">
         super().__init__()
         self.title("ASTROINFO Orbital Simulation")
         self.tk_setPalette(activeBackground='#4b4b4b', foreground='white', activeForeground='white', background='#3b3b3b')
-        filterwarnings(action='ignore')  # Ignore erfa warnings
-        # </editor-fold>
-        # <editor-fold desc="Fig and Ax settings"
-        plt.style.use('dark_background')
-        self.fig, self.ax = plt.subplots(figsize=(5, 5))
-        self.fig.patch.set_facecolor('#2b2b2b')
-        self.ax.set_facecolor('#2b2b2b')
-        self.fig.patch.set_alpha(0)
-        self.ax.patch.set_alpha(0)
-        self.ax.set_aspect('equal')
-        self.ax.axes.format_coord = lambda x, y: ""
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        plt.subplots_adjust(left=0.01, right=0.99, top=0.99, bottom=0.01)
-        self.ax.set_xlim(-2, 2)
-        self.ax.set_ylim(-2, 2)
-        # </editor-fold>
-        # <editor-fold desc="Canvas and Toolbar Settings">
-        self.canvas_frame = ctk.CTkFrame(self, border_width=1)
-        self.canvas_frame.grid(row=0, column=0, sticky='nsew', padx=6, pady=6, rowspan=20)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.canvas_frame)
-        self.canvas.get_tk_widget().config(bg='#2b2b2b', relief='flat', borderwidth=0)
-        self.canvas.get_tk_widget().grid(row=0, column=0, sticky='nsew', padx=6, pady=6)
-        self.toolbarframe = ctk.CTkFrame(self.canvas_frame, fg_color='#3b3b3b', corner_radius=8, bg_color='#2b2b2b')
-        self.toolbarframe.grid(row=1, column=0, sticky='nsew', padx=6, pady=6)
-        self.nested_frame = ctk.CTkFrame(self.toolbarframe, fg_color='#3b3b3b')
-        self.nested_frame.grid(row=0, column=0, sticky='nsew', pady=0, padx=(110, 0))
-        self.toolbar = NavigationToolbar2Tk(self.canvas, self.nested_frame)
-        self.toolbar.config(bg='#3b3b3b')
-        for button in self.toolbar.winfo_children():
-            button.config(background='#3b3b3b')
-        self.toolbar.update()
-        # </editor-fold>
-        # <editor-fold desc="Widgets">
-        # <editor-fold desc="Date Entries">
-        self.date_entries = dict()
-        self.date_entries['frame'] = ctk.CTkFrame(self, height=40)
-        self.date_entries['frame'].grid(row=0, column=1, columnspan=11, padx=6, sticky='new', pady=6)
-        self.date_entries['year'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="YYYY", font=('Roboto', 30), width=90)
-        self.date_entries['year'].grid(row=0, column=1, sticky='nsew', pady=6, padx=(6, 0))
-        self.date_entries['month'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="MM", font=('Roboto', 30), width=70)
-        self.date_entries['month'].grid(row=0, column=3, sticky='nsew', pady=6)
-        self.date_entries['day'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="DD", font=('Roboto', 30), width=55)
-        self.date_entries['day'].grid(row=0, column=5, padx=(0, 3), sticky='nsew', pady=6)
-
-        self.date_entries['hour'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="HH", font=('Roboto', 30), width=58)
-        self.date_entries['hour'].grid(row=0, column=6, padx=(3, 0), sticky='nsew', pady=6)
-        self.date_entries['minute'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="MM", font=('Roboto', 30), width=70)
-        self.date_entries['minute'].grid(row=0, column=8, sticky='nsew', pady=6)
-        self.date_entries['second'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="SS", font=('Roboto', 30), width=55)
-        self.date_entries['second'].grid(row=0, column=10, padx=(0, 3), sticky='nsew', pady=6)
-        self.date_entries['submit'] = ctk.CTkButton(self.date_entries['frame'], text='GO', font=('Roboto', 30), command=lambda: self.set_date_time())
-        self.date_entries['submit'].grid(row=0, column=11, padx=(3, 6), sticky='nsew', columnspan=2, pady=6)
-        # </editor-fold>
-        # <editor-fold desc="Object Input">
-        self.object_input = PlaceholderText(self, font=('Roboto', 20), placeholder='Enter object identifiers here, line by line...')
-        self.object_input.grid(row=1, column=1, rowspan=17, columnspan=11, sticky='nsew', padx=6, pady=6)
-        self.object_set = ctk.CTkButton(self, font=('Roboto', 30), text='ADD OBJECTS', command=lambda: self.add_inputted_objects())
-        self.object_set.grid(row=18, column=1, columnspan=11, sticky='nsew', padx=6, pady=6)
-        # </editor-fold>
-        # <editor-fold desc="Time Travel"
-        self.time_travel_frame = ctk.CTkFrame(self)
-        self.time_travel_frame.grid(row=19, column=1, sticky='sew', columnspan=11, padx=6, pady=6)
-        self.backward_button = ctk.CTkButton(self.time_travel_frame, text='<<', font=('Roboto', 20), command=lambda: self.time_backward())
-        self.backward_button.grid(row=0, column=0, sticky='nsew', columnspan=3, padx=6, pady=6)
-        self.step_entry = ctk.CTkEntry(self.time_travel_frame, font=('Roboto', 20), placeholder_text='Enter step length (hrs)...', width=250)
-        self.step_entry.grid(row=0, column=4, sticky='nsew', padx=6, pady=6)
-        self.forward_button = ctk.CTkButton(self.time_travel_frame, text='>>', font=('Roboto', 20), command=lambda: self.time_forward())
-        self.forward_button.grid(row=0, column=5, sticky='nsew', columnspan=3, padx=6, pady=6)
-        # </editor-fold>
-        # </editor-fold>
-        # <editor-fold desc="Global Variables">
-        if time is not None:
-            try:
-                self.time = (datetime.strptime(time, "%Y-%m-%d %H:%M:%S")).strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                self.time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            self.time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.bodies = list()
-        # </editor-fold>
-        self.create_defaults()
-    def update_sim(self, hours=0):
-        """Updates the simulation."""
-        # Save zoom
-        xlim = self.ax.get_xlim()
-        ylim = self.ax.get_ylim()
-        # Clear ax
-        self.ax.cla()
-        # Restore ax settings
-        self.ax.set_aspect('equal')
-        self.ax.axes.format_coord = lambda x, y: ""
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.ax.set_xlim(-2, 2)
-        self.ax.set_ylim(-2, 2)
-        self.ax.set_xlim(xlim)
-        self.ax.set_ylim(ylim)
-        if hours > 0:
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S") + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        elif hours < 0:
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S") - timedelta(hours=(hours * -1))).strftime("%Y-%m-%d %H:%M:%S")
-        for text in self.ax.texts:  # First, remove the texts.
-            text.set_visible(False)
-            del text
-        for body in self.bodies:  # Then, update the bodies accordingly.
-            body.upd(self.time)
-        self.canvas.draw()
-    def add_body(self, horizons_id: str, color: str, name: str, radius_km: float, id_type: str | None = None):
-        """Adds a celestial body to the simulation."""
-        if CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, id_type=id_type, start_time=self.time) in self.bodies:
-            # This means the object already exists
-            del obj
-            return None
-        else:  # This means the object doesn't exist
-            obj = CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, id_type=id_type, start_time=self.time)
-            self.bodies.append(obj)
-            self.update_sim()
-    def remove_body(self, horizons_id: str, color: str, name: str, radius_km: float):
-        """Removes an object from the simulation."""
-        if obj := CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, start_time=self.time) in self.bodies:
-            # This means the object exists
-            self.bodies.remove(self.bodies.index(obj))
-            del obj
-            self.update_sim()
-        else:
-            pass
-    def create_defaults(self):
-        """Creates the default bodies (the inner solar system + Jupiter, more planets coming soon)"""
-        self.add_body(horizons_id='10', color='orange', name='Sun', radius_km=695700)  # The sun
-        self.add_body(horizons_id='199', radius_km=2440, color='grey', name='Mercury')  # Mercury
-        self.add_body(horizons_id='299', radius_km=6052, color='orange', name='Venus')  # Venus
-        self.add_body(horizons_id='399', radius_km=6378, color='blue', name='Earth')  # Earth
-        self.add_body(horizons_id='301', radius_km=1737.5, color='silver', name='Moon')  # The moon
-        self.add_body(horizons_id='499', radius_km=2110.29, color='red', name='Mars')  # Mars
-        self.add_body(horizons_id='599', radius_km=69911, color='navajowhite', name='Jupiter')  # Jupiter
-        self.canvas.draw()
-    def set_date_time(self):
-        """Sets the date and time according to the user's input."""
-        initial_time = self.time
-        try:
-            self.time = (
-            (f"{self.date_entries['year'].get()}-{self.date_entries['month'].get()}-{self.date_entries['day'].get()} {self.date_entries['hour'].get()}:{self.date_entries['minute'].get()}:"
-             f"{self.date_entries['second'].get()}").replace("Jan", '01').replace("Feb", '02').replace("Mar", '03').replace("Apr", '04').replace(
-                "May", '05').replace("Jun", '06').replace("Jul", '07').replace("Aug", '08').replace("Sep", '09').replace(
-                "Oct", "10").replace("Nov", "11").replace("Dec", "12").replace("SS", f"{datetime.now().second}").replace(
-                ":MM:", f":{datetime.now().minute}:").replace("HH", f"{datetime.now().hour}").replace("DD", f"{datetime.now().date().day}").replace(
-                "-MM-", f"-{datetime.now().date().month}-").replace("YYYY", f"{datetime.now().date().year}"))
-            formatted_time = sub(r'(....)-(\d{1, 2})-(\d{1, 2})', r'\1-0\2-0\3', self.time)
-            formatted_time = sub(r' (\d):', r' 0\1:', formatted_time)
-            self.time = sub(r':(\d):', r':0\1:', formatted_time)
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S")).strftime("%Y-%m-%d %H:%M:%S")  # Check if the time string is valid
-            self.update_sim()
-        except ValueError:
-            self.time = initial_time
-            self.update_sim()
-    def time_forward(self):
-        """Moves the time forward according to the step set by the user."""
-        try:
-            step = round(float(self.step_entry.get()))
-            self.update_sim(hours=step)
-        except (ValueError, AttributeError, KeyError):
-            pass
-    def time_backward(self):
-        """Moves the time backward according to the step set by the user."""
-        try:
-            step = round(float(self.step_entry.get()))
-            self.update_sim(hours=-step)
-        except (ValueError, AttributeError, KeyError):
-            pass
-    def add_inputted_objects(self):
-        """Adds the objects that were put into the text box by the user."""
-        obj_str = self.object_input.get("1.0", ctk.END)
-        object_data = dict()
-        invalid_objs = list()
-        self.bodies.clear()
-        self.create_defaults()
-        for id in obj_str.splitlines():
-            try:
-                if id == "" or id.isspace():
-                    pass
-                else:
-                    asteroid = Asteroid(id)
-                    # Assume the asteroid has a nickname (e.g. 4 VESTA, or 99942 APOPHIS)
-                    IAU = asteroid.identifiers['SPKID']
-                    full_name = asteroid.identifiers['full name']
-                    first_space_index = full_name.index(' ')
-                    if int(IAU) <= 4_000_000:
-                        try:
-                            second_space_index = full_name.index(' ', first_space_index + 1)
-                            third_space_index = full_name.index(' ', second_space_index + 1)
-                        except Exception:
-                            second_space_index = None
-
-                        if second_space_index is not None:
-                            name = full_name[first_space_index + 1:second_space_index]
-                        else:
-                            name = full_name[:first_space_index]
-                    else:
-                        name = asteroid.identifiers['full name']
-                    try:
-                        if asteroid.physical_properties['diameter']['km'] != 'Unavailable':
-                            radius_km = float(asteroid.physical_properties['diameter']['km']) / 2
-                        else:
-                            radius_km = 1  # Average
-                    except KeyError:
-                        radius_km = 1  # Average
-
-                    if radius_km is not None:
-                        object_data[str(IAU)] = {'radius': float(radius_km), 'name': name, 'fullname': full_name}
-                    else:
-                        object_data[str(IAU)] = {'radius': None, 'name': name, 'fullname': full_name}
-
-            except (AttributeError, KeyError, ValueError):
-                pass
-
-        for iau, dictionary in object_data.items():
-            if dictionary['radius'] is not None:
-                try:
-                    self.add_body(horizons_id=dictionary['name'], color='grey', name=dictionary['fullname'], radius_km=dictionary['radius'], id_type='smallbody')
-                except ValueError:
-                    try:
-                        self.add_body(horizons_id=iau, color='grey', name=dictionary['fullname'], radius_km=dictionary['radius'], id_type='smallbody')
-                    except ValueError:
-                        pass
-class FRAMEORBITALSIM(ctk.CTkFrame):
-    def __init__(self, master: ctk.CTk, time: None | str = None):
+        self.build_view(engine if engine is not None else SimulationEngine(time=time, use_horizons=use_horizons, use_nbody=use_nbody))
+class FRAMEORBITALSIM(OrbitalSimView, ctk.CTkFrame):
+    def __init__(self, master: ctk.CTk, time: None | str = None, use_horizons: bool = False, use_nbody: bool = False,
+                 engine: SimulationEngine | None = None):
         """
         The new and improved orbital simulation class, except it's for a frame.
+        :param master: The widget the frame is placed in.
         :param time: The time of the simulation at the start. If nothing is entered, then it automatically becomes
         the current date and time of the initialization. If it is an invalid string, it is reset to the default.
+        :param use_horizons: If True, every position comes from JPL Horizons instead of being computed locally (see SimulationEngine).
+        :param use_nbody: If True, asteroids are integrated under the gravity of the Sun and planets instead of following
+        fixed Kepler orbits (see SimulationEngine).
+        :param engine: An existing simulation to display instead of creating one; time, use_horizons and use_nbody are then ignored.
         """
-        # <editor-fold desc="Super Call and Root Settings">
         super().__init__(master=master)
-        self.title("ASTROINFO Orbital Simulation")
         self.tk_setPalette(activeBackground='#4b4b4b', foreground='white', activeForeground='white', background='#3b3b3b')
-        filterwarnings(action='ignore')  # Ignore erfa warnings
-        # </editor-fold>
-        # <editor-fold desc="Fig and Ax settings"
-        plt.style.use('dark_background')
-        self.fig, self.ax = plt.subplots(figsize=(5, 5))
-        self.fig.patch.set_facecolor('#2b2b2b')
-        self.ax.set_facecolor('#2b2b2b')
-        self.fig.patch.set_alpha(0)
-        self.ax.patch.set_alpha(0)
-        self.ax.set_aspect('equal')
-        self.ax.axes.format_coord = lambda x, y: ""
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        plt.subplots_adjust(left=0.01, right=0.99, top=0.99, bottom=0.01)
-        self.ax.set_xlim(-2, 2)
-        self.ax.set_ylim(-2, 2)
-        # </editor-fold>
-        # <editor-fold desc="Canvas and Toolbar Settings">
-        self.canvas_frame = ctk.CTkFrame(self, border_width=1)
-        self.canvas_frame.grid(row=0, column=0, sticky='nsew', padx=6, pady=6, rowspan=20)
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.canvas_frame)
-        self.canvas.get_tk_widget().config(bg='#2b2b2b', relief='flat', borderwidth=0)
-        self.canvas.get_tk_widget().grid(row=0, column=0, sticky='nsew', padx=6, pady=6)
-        self.toolbarframe = ctk.CTkFrame(self.canvas_frame, fg_color='#3b3b3b', corner_radius=8, bg_color='#2b2b2b')
-        self.toolbarframe.grid(row=1, column=0, sticky='nsew', padx=6, pady=6)
-        self.nested_frame = ctk.CTkFrame(self.toolbarframe, fg_color='#3b3b3b')
-        self.nested_frame.grid(row=0, column=0, sticky='nsew', pady=0, padx=(110, 0))
-        self.toolbar = NavigationToolbar2Tk(self.canvas, self.nested_frame)
-        self.toolbar.config(bg='#3b3b3b')
-        for button in self.toolbar.winfo_children():
-            button.config(background='#3b3b3b')
-        self.toolbar.update()
-        # </editor-fold>
-        # <editor-fold desc="Widgets">
-        # <editor-fold desc="Date Entries">
-        self.date_entries = dict()
-        self.date_entries['frame'] = ctk.CTkFrame(self, height=40)
-        self.date_entries['frame'].grid(row=0, column=1, columnspan=11, padx=6, sticky='new', pady=6)
-        self.date_entries['year'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="YYYY", font=('Roboto', 30), width=90)
-        self.date_entries['year'].grid(row=0, column=1, sticky='nsew', pady=6, padx=(6, 0))
-        self.date_entries['month'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="MM", font=('Roboto', 30), width=70)
-        self.date_entries['month'].grid(row=0, column=3, sticky='nsew', pady=6)
-        self.date_entries['day'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="DD", font=('Roboto', 30), width=55)
-        self.date_entries['day'].grid(row=0, column=5, padx=(0, 3), sticky='nsew', pady=6)
-
-        self.date_entries['hour'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="HH", font=('Roboto', 30), width=58)
-        self.date_entries['hour'].grid(row=0, column=6, padx=(3, 0), sticky='nsew', pady=6)
-        self.date_entries['minute'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="MM", font=('Roboto', 30), width=70)
-        self.date_entries['minute'].grid(row=0, column=8, sticky='nsew', pady=6)
-        self.date_entries['second'] = ctk.CTkEntry(self.date_entries['frame'], placeholder_text="SS", font=('Roboto', 30), width=55)
-        self.date_entries['second'].grid(row=0, column=10, padx=(0, 3), sticky='nsew', pady=6)
-        self.date_entries['submit'] = ctk.CTkButton(self.date_entries['frame'], text='GO', font=('Roboto', 30), command=lambda: self.set_date_time())
-        self.date_entries['submit'].grid(row=0, column=11, padx=(3, 6), sticky='nsew', columnspan=2, pady=6)
-        # </editor-fold>
-        # <editor-fold desc="Object Input">
-        self.object_input = PlaceholderText(self, font=('Roboto', 20), placeholder='Enter object identifiers here, line by line...')
-        self.object_input.grid(row=1, column=1, rowspan=17, columnspan=11, sticky='nsew', padx=6, pady=6)
-        self.object_set = ctk.CTkButton(self, font=('Roboto', 30), text='ADD OBJECTS', command=lambda: self.add_inputted_objects())
-        self.object_set.grid(row=18, column=1, columnspan=11, sticky='nsew', padx=6, pady=6)
-        # </editor-fold>
-        # <editor-fold desc="Time Travel"
-        self.time_travel_frame = ctk.CTkFrame(self)
-        self.time_travel_frame.grid(row=19, column=1, sticky='sew', columnspan=11, padx=6, pady=6)
-        self.backward_button = ctk.CTkButton(self.time_travel_frame, text='<<', font=('Roboto', 20), command=lambda: self.time_backward())
-        self.backward_button.grid(row=0, column=0, sticky='nsew', columnspan=3, padx=6, pady=6)
-        self.step_entry = ctk.CTkEntry(self.time_travel_frame, font=('Roboto', 20), placeholder_text='Enter step length (hrs)...', width=250)
-        self.step_entry.grid(row=0, column=4, sticky='nsew', padx=6, pady=6)
-        self.forward_button = ctk.CTkButton(self.time_travel_frame, text='>>', font=('Roboto', 20), command=lambda: self.time_forward())
-        self.forward_button.grid(row=0, column=5, sticky='nsew', columnspan=3, padx=6, pady=6)
-        # </editor-fold>
-        # </editor-fold>
-        # <editor-fold desc="Global Variables">
-        if time is not None:
-            try:
-                self.time = (datetime.strptime(time, "%Y-%m-%d %H:%M:%S")).strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                self.time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            self.time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.bodies = list()
-        # </editor-fold>
-        self.create_defaults()
-    def update_sim(self, hours=0):
-        """
-        Updates the simulation. Can move time forward or backward a certain number of hours.
-        :param hours: An integer; representing the number of hours the simulation should be forwarded or reversed by. If the number
-        is negative, then time goes backwards.
-        """
-        # Save zoom
-        xlim = self.ax.get_xlim()
-        ylim = self.ax.get_ylim()
-        # Clear ax
-        self.ax.cla()
-        # Restore ax settings
-        self.ax.set_aspect('equal')
-        self.ax.axes.format_coord = lambda x, y: ""
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.ax.set_xlim(-2, 2)
-        self.ax.set_ylim(-2, 2)
-        self.ax.set_xlim(xlim)
-        self.ax.set_ylim(ylim)
-        if hours > 0:
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S") + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        elif hours < 0:
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S") - timedelta(hours=(hours * -1))).strftime("%Y-%m-%d %H:%M:%S")
-        for text in self.ax.texts:  # First, remove the texts.
-            text.set_visible(False)
-            del text
-        for body in self.bodies:  # Then, update the bodies accordingly.
-            body.upd(self.time)
-        self.canvas.draw()
-    def add_body(self, horizons_id: str, color: str, name: str, radius_km: float, id_type: str | None = None):
-        """Adds a celestial body to the simulation."""
-        if CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, id_type=id_type, start_time=self.time) in self.bodies:
-            # This means the object already exists
-            del obj
-            return None
-        else:  # This means the object doesn't exist
-            obj = CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, id_type=id_type, start_time=self.time)
-            self.bodies.append(obj)
-            self.update_sim()
-    def remove_body(self, horizons_id: str, color: str, name: str, radius_km: float):
-        """Removes an object from the simulation."""
-        if obj := CelestialBody(horizons_id=horizons_id, name=name, fig_canvas=self.canvas, radius_km=radius_km, color=color, plot=self.ax, start_time=self.time) in self.bodies:
-            # This means the object exists
-            self.bodies.remove(self.bodies.index(obj))
-            del obj
-            self.update_sim()
-        else:
-            pass
-    def create_defaults(self):
-        """Creates the default bodies (the inner solar system + Jupiter, more planets coming soon)"""
-        self.add_body(horizons_id='10', color='orange', name='Sun', radius_km=695700)  # The sun
-        self.add_body(horizons_id='199', radius_km=2440, color='grey', name='Mercury')  # Mercury
-        self.add_body(horizons_id='299', radius_km=6052, color='orange', name='Venus')  # Venus
-        self.add_body(horizons_id='399', radius_km=6378, color='blue', name='Earth')  # Earth
-        self.add_body(horizons_id='301', radius_km=1737.5, color='silver', name='Moon')  # The moon
-        self.add_body(horizons_id='499', radius_km=2110.29, color='red', name='Mars')  # Mars
-        self.add_body(horizons_id='599', radius_km=69911, color='navajowhite', name='Jupiter')  # Jupiter
-        self.canvas.draw()
-    def set_date_time(self):
-        """Sets the date and time according to the user's input."""
-        initial_time = self.time
-        try:
-            self.time = (
-            (f"{self.date_entries['year'].get()}-{self.date_entries['month'].get()}-{self.date_entries['day'].get()} {self.date_entries['hour'].get()}:{self.date_entries['minute'].get()}:"
-             f"{self.date_entries['second'].get()}").replace("Jan", '01').replace("Feb", '02').replace("Mar", '03').replace("Apr", '04').replace(
-                "May", '05').replace("Jun", '06').replace("Jul", '07').replace("Aug", '08').replace("Sep", '09').replace(
-                "Oct", "10").replace("Nov", "11").replace("Dec", "12").replace("SS", f"{datetime.now().second}").replace(
-                ":MM:", f":{datetime.now().minute}:").replace("HH", f"{datetime.now().hour}").replace("DD", f"{datetime.now().date().day}").replace(
-                "-MM-", f"-{datetime.now().date().month}-").replace("YYYY", f"{datetime.now().date().year}"))
-            formatted_time = sub(r'(....)-(\d{1, 2})-(\d{1, 2})', r'\1-0\2-0\3', self.time)
-            formatted_time = sub(r' (\d):', r' 0\1:', formatted_time)
-            self.time = sub(r':(\d):', r':0\1:', formatted_time)
-            self.time = (datetime.strptime(self.time, "%Y-%m-%d %H:%M:%S")).strftime("%Y-%m-%d %H:%M:%S")  # Check if the time string is valid
-            self.update_sim()
-        except ValueError:
-            self.time = initial_time
-            self.update_sim()
-    def time_forward(self):
-        """Moves the time forward according to the step set by the user."""
-        try:
-            step = round(float(self.step_entry.get()))
-            self.update_sim(hours=step)
-        except (ValueError, AttributeError, KeyError):
-            pass
-    def time_backward(self):
-        """Moves the time backward according to the step set by the user."""
-        try:
-            step = round(float(self.step_entry.get()))
-            self.update_sim(hours=-step)
-        except (ValueError, AttributeError, KeyError):
-            pass
-    def add_inputted_objects(self):
-        """Adds the objects that were put into the text box by the user."""
-        obj_str = self.object_input.get("1.0", ctk.END)
-        object_data = dict()
-        invalid_objs = list()
-        self.bodies.clear()
-        self.create_defaults()
-        for id in obj_str.splitlines():
-            try:
-                if id == "" or id.isspace():
-                    pass
-                else:
-                    asteroid = Asteroid(id)
-                    # Assume the asteroid has a nickname (e.g. 4 VESTA, or 99942 APOPHIS)
-                    IAU = asteroid.identifiers['SPKID']
-                    full_name = asteroid.identifiers['full name']
-                    first_space_index = full_name.index(' ')
-                    if int(IAU) <= 4_000_000:
-                        try:
-                            second_space_index = full_name.index(' ', first_space_index + 1)
-                            third_space_index = full_name.index(' ', second_space_index + 1)
-                        except Exception:
-                            second_space_index = None
-
-                        if second_space_index is not None:
-                            name = full_name[first_space_index + 1:second_space_index]
-                        else:
-                            name = full_name[:first_space_index]
-                    else:
-                        name = asteroid.identifiers['full name']
-                    try:
-                        if asteroid.physical_properties['diameter']['km'] != 'Unavailable':
-                            radius_km = float(asteroid.physical_properties['diameter']['km']) / 2
-                        else:
-                            radius_km = 1  # Average
-                    except KeyError:
-                        radius_km = 1  # Average
-
-                    if radius_km is not None:
-                        object_data[str(IAU)] = {'radius': float(radius_km), 'name': name, 'fullname': full_name}
-                    else:
-                        object_data[str(IAU)] = {'radius': None, 'name': name, 'fullname': full_name}
-
-            except (AttributeError, KeyError, ValueError):
-                pass
-
-        for iau, dictionary in object_data.items():
-            if dictionary['radius'] is not None:
-                try:
-                    self.add_body(horizons_id=dictionary['name'], color='grey', name=dictionary['fullname'], radius_km=dictionary['radius'], id_type='smallbody')
-                except ValueError:
-                    try:
-                        self.add_body(horizons_id=iau, color='grey', name=dictionary['fullname'], radius_km=dictionary['radius'], id_type='smallbody')
-                    except ValueError:
-                        pass
+        self.build_view(engine if engine is not None else SimulationEngine(time=time, use_horizons=use_horizons, use_nbody=use_nbody))
 
 if __name__ == '__main__':
+    plt.switch_backend('TkAgg')  # Chosen here rather than on import, so AOS can be imported without a display
     main = ORBITALSIM()
     main.mainloop()
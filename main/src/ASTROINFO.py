@@ -1,6 +1,9 @@
 import customtkinter as ctk
 
-from classes import Asteroid, search_by_date
+from classes import Asteroid, CloseApproachList, search_by_date
+from worker import BackgroundWorker
+
+SEARCH_DIST_MAX = 0.5  # The largest approach distance (AU) of a date range search when none is entered
 
 class AStROINFO(ctk.CTk):
     def __init__(self):
@@ -31,6 +34,11 @@ class AStROINFO(ctk.CTk):
             self.identifier_labels[identifier] = ctk.CTkLabel(self, text=identifier, font=('Roboto', 15), fg_color='#3b3b3b', corner_radius=8)
             self.identifier_labels[identifier].grid(row=2, column=0+identifiers.index(identifier), sticky='nsw', padx=6, pady=6)
         self.bind('<Return>', lambda e: self.submit_asteroid(self.asteroid_entry.get()))
+        # Shown while an asteroid or a search is being fetched
+        self.progress_bar = ctk.CTkProgressBar(self, mode='indeterminate')
+        self.progress_bar.grid(row=2, column=2, sticky='ew', padx=6, pady=6)
+        self.progress_bar.grid_remove()
+        self.worker = BackgroundWorker(self, on_busy=self.show_progress)  # Runs network requests without freezing the window
         # </editor-fold>
         # <editor-fold desc="Physical Properties">
         pp_keys = ['rotational period', 'spectral type', 'absolute magnitude', 'diameter', 'density', 'surface gravity', 'escape velocity', 'mass', 'albedo', 'volume']
@@ -82,12 +90,14 @@ class AStROINFO(ctk.CTk):
         self.date_frame = ctk.CTkFrame(self)
         self.date_frame.grid(row=10, column=3, columnspan=4, rowspan=16, sticky='nsew', padx=6, pady=6)
         ctk.CTkLabel(self.date_frame, text='Find Close Approaches by Date Range', font=('Roboto', 20), fg_color='#3b3b3b', corner_radius=8).grid(
-            row=0, column=0, columnspan=4, padx=6, pady=6, sticky='nsew')
+            row=0, column=0, columnspan=5, padx=6, pady=6, sticky='nsew')
         ctk.CTkLabel(self.date_frame, text='-', font=('Roboto', 20)).grid(row=1, column=1, padx=6, pady=6, sticky='nsew')
+        self.dist_max_entry = ctk.CTkEntry(self.date_frame, placeholder_text=f'Max AU ({SEARCH_DIST_MAX})', font=('Roboto', 20), height=33, width=130)
+        self.dist_max_entry.grid(row=1, column=3, sticky='nsew', padx=6, pady=6)
         self.date_search = ctk.CTkButton(self.date_frame, text='SEARCH', font=('Roboto', 20), command=lambda: self.search_approach())
-        self.date_search.grid(row=1, column=3, sticky='nsew', padx=6, pady=6)
+        self.date_search.grid(row=1, column=4, sticky='nsew', padx=6, pady=6)
         self.approach_results = ctk.CTkScrollableFrame(self.date_frame)
-        self.approach_results.grid(row=2, column=0, columnspan=4, sticky='nsew', padx=6, pady=6)
+        self.approach_results.grid(row=2, column=0, columnspan=5, sticky='nsew', padx=6, pady=6)
         placeholder2 = ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text='Enter a start date and end date to get approaches.')
         placeholder2.grid(row=0, column=0, sticky='nsew', padx=6, pady=6)
         # </editor-fold>
@@ -112,22 +122,38 @@ class AStROINFO(ctk.CTk):
         self.end_date_d.grid(row=0, column=2, sticky='nsew', padx=6, pady=6)
         # </editor-fold>
 
+    def show_progress(self, busy: bool):
+        """Shows the progress bar while the worker is busy."""
+        if busy:
+            self.progress_bar.grid()
+            self.progress_bar.start()
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.grid_remove()
+
+    @staticmethod
+    def load_asteroid(id):
+        """Fetches an asteroid and everything the window shows about it. Runs on a worker thread; returns None if the identifier is invalid."""
+        try:
+            asteroid = Asteroid(id)
+            asteroid.physical_properties, asteroid.orbital_properties
+            asteroid.close_approach_data  # The close approaches are fetched once and kept by the asteroid
+        except AttributeError:
+            return None
+        return asteroid
+
     def submit_asteroid(self, id):
-        """Whenever the 'go' button is pressed, an asteroid is submitted, and label values change accordingly."""
+        """Whenever the 'go' button is pressed, an asteroid is fetched in the background, and label values change once it arrives.
+        Pressing it again before then replaces the request."""
+        self.worker.submit('asteroid', self.load_asteroid, id, on_done=lambda asteroid: self.show_asteroid(id, asteroid))
+
+    def show_asteroid(self, id, asteroid):
+        """Changes the label values to an asteroid fetched by load_asteroid."""
         # initial asteroid change
         try:
-            self.asteroid = Asteroid(id)
-            try:
-                physical_properties = self.asteroid.physical_properties
-                orbital_properties = self.asteroid.orbital_properties
-            except AttributeError:
-                try:
-                    physical_properties = self.asteroid.physical_properties
-                    orbital_properties = self.asteroid.orbital_properties
-                except AttributeError:
-                    physical_properties = self.asteroid.physical_properties
-                    orbital_properties = self.asteroid.orbital_properties
-
+            self.asteroid = asteroid
+            physical_properties = self.asteroid.physical_properties
+            orbital_properties = self.asteroid.orbital_properties
             approaches = self.asteroid.close_approach_data
             identifiers = self.asteroid.identifiers
             # physical properties
@@ -213,9 +239,9 @@ class AStROINFO(ctk.CTk):
                 Distance: ...
                 """
                 counter = 0
-                for date, data in approaches.items():
-                    distance = data['distance']
-                    velocity = data['velocity']
+                for approach in approaches:
+                    distance = {'au': round(approach.distance_au, 3), 'km': round(approach.distance_km, 3), 'mi': round(approach.distance_mi, 3)}
+                    velocity = {'km/s': round(approach.velocity_kms, 3), 'mi/s': round(approach.velocity_mis, 3)}
                     for unit, dist in distance.items():
                         if len(f'{dist:,}') >= 7:
                             distance[unit] = f'{float(dist):.1e}'
@@ -229,7 +255,7 @@ class AStROINFO(ctk.CTk):
 
                     dist_str = f"{distance['au']} au / {distance['km']} km / {distance['mi']} mi"  # Create a string for the approach distance.
                     vel_str = f"{velocity['km/s']} km/s / {velocity['mi/s']} mi/s"  # Create a string for the approach velocity.
-                    ctk.CTkLabel(self.approaches_frame, font=('Roboto', 25), text=date).grid(row=counter, column=0, sticky='nsw')
+                    ctk.CTkLabel(self.approaches_frame, font=('Roboto', 25), text=approach.date_string).grid(row=counter, column=0, sticky='nsw')
                     ctk.CTkLabel(self.approaches_frame, font=('Roboto', 20), text=dist_str).grid(row=counter+1, column=0, sticky='nsw')
                     ctk.CTkLabel(self.approaches_frame, font=('Roboto', 20), text=vel_str).grid(row=counter+2, column=0, sticky='nsw')
                     ctk.CTkLabel(self.approaches_frame, font=('Roboto', 25), text="---------------------------------------------------------------------------------").grid(
@@ -245,9 +271,7 @@ class AStROINFO(ctk.CTk):
         except AttributeError:
             self.asteroid_name.configure(text=f'Invalid asteroid identifier: {id}')
     def search_approach(self):
-        """Searches for close approaches of asteroids between two dates."""
-        for widget in self.approach_results.winfo_children():
-            widget.destroy()
+        """Searches for close approaches of asteroids between two dates in the background. A new search replaces one still running."""
         start_date_str = f"{self.start_date_y.get()}-{self.start_date_m.get()}-{self.start_date_d.get()}".replace('-1-', '-01-').replace(
             '-2-', '-02-').replace('-3-', '-03-').replace('-4-', '-04-').replace(
             '-5-', '-05-').replace('-6-', '-06-').replace('-7-', '-07-').replace(
@@ -256,18 +280,38 @@ class AStROINFO(ctk.CTk):
             '-2-', '-02-').replace('-3-', '-03-').replace('-4-', '-04-').replace(
             '-5-', '-05-').replace('-6-', '-06-').replace('-7-', '-07-').replace(
             '-8-', '-08-').replace('-9-', '-09-')
+        dist_max_str = self.dist_max_entry.get().strip()
         try:
-            approaches = search_by_date(start_date=start_date_str, end_date=end_date_str)
-            if approaches is not None:
+            dist_max = float(dist_max_str) if dist_max_str else SEARCH_DIST_MAX
+            if not dist_max > 0:
+                raise ValueError(dist_max_str)
+        except ValueError:
+            for widget in self.approach_results.winfo_children():
+                widget.destroy()
+            ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text=f'Invalid maximum distance given: {dist_max_str}').grid(row=0, column=0, sticky='nsw')
+            return
+        # search_by_date streams its results, so collect them on the worker thread
+        self.worker.submit('search', lambda: CloseApproachList(search_by_date(start_date=start_date_str, end_date=end_date_str, dist_max=dist_max)),
+                           on_done=lambda approaches: self.show_approaches(start_date_str, end_date_str, approaches),
+                           on_error=lambda error: self.show_approaches(start_date_str, end_date_str, error))
+
+    def show_approaches(self, start_date_str, end_date_str, approaches):
+        """Shows the results of search_approach, or an error if the search failed."""
+        for widget in self.approach_results.winfo_children():
+            widget.destroy()
+        try:
+            if isinstance(approaches, Exception):
+                raise approaches
+            if approaches:
                 """
                 Designation: YYYY-MM-DD HH:MM
                 Relative Velocity: ...
                 Distance: ...
                 """
                 counter = 0
-                for date, data in approaches.items():
-                    distance = data['distance']
-                    velocity = data['velocity']
+                for approach in approaches:
+                    distance = {'au': round(approach.distance_au, 3), 'km': round(approach.distance_km, 3), 'mi': round(approach.distance_mi, 3)}
+                    velocity = {'km/s': round(approach.velocity_kms, 3), 'mi/s': round(approach.velocity_mis, 3)}
                     for unit, dist in distance.items():
                         if len(f'{dist:,}') >= 7:
                             distance[unit] = f'{float(dist):.1e}'
@@ -281,7 +325,7 @@ class AStROINFO(ctk.CTk):
 
                     dist_str = f"{distance['au']} au / {distance['km']} km / {distance['mi']} mi"  # Create a string for the approach distance.
                     vel_str = f"{velocity['km/s']} km/s / {velocity['mi/s']} mi/s"  # Create a string for the approach velocity.
-                    ctk.CTkLabel(self.approach_results, font=('Roboto', 25), text=f'{data["designation"]} - {date}').grid(row=counter, column=0, sticky='nsw')
+                    ctk.CTkLabel(self.approach_results, font=('Roboto', 25), text=f'{approach.designation} - {approach.date_string}').grid(row=counter, column=0, sticky='nsw')
                     ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text=dist_str).grid(row=counter + 1, column=0, sticky='nsw')
                     ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text=vel_str).grid(row=counter + 2, column=0, sticky='nsw')
                     ctk.CTkLabel(self.approach_results, font=('Roboto', 25), text="---------------------------------------------------------------------------------").grid(
@@ -291,6 +335,8 @@ class AStROINFO(ctk.CTk):
             else:
                 ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text='No close approaches found within the date range.').grid(row=0, column=0, sticky='nsw')
         except ConnectionError:
+            ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text="Couldn't reach NASA's close approach data (offline?). Try again later.").grid(row=0, column=0, sticky='nsw')
+        except ValueError:
             ctk.CTkLabel(self.approach_results, font=('Roboto', 20), text=f'Invalid date range given: {start_date_str} - {end_date_str}').grid(row=0, column=0, sticky='nsw')
 if __name__ == '__main__':
     main = AStROINFO()
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from os import makedirs, path
+
+from cache import DEFAULT_TTLS
+
+DEFAULT_APPROACH_DB_PATH = path.join(path.expanduser('~'), '.astroinfo', 'approaches.sqlite3')
+PAGE_SIZE = 5000  # Rows read from the database at a time when streaming a query
+
+
+class ApproachStore:
+    def __init__(self, db_path: str = DEFAULT_APPROACH_DB_PATH, refresh_seconds: float = DEFAULT_TTLS['cad']):
+        """
+        A local database of close approaches synced from the CAD API, indexed by (date, distance) and by designation, so range
+        queries are answered without the network. It remembers which date windows and asteroids were synced, so only new or
+        stale ones have to be fetched again.
+        Rows are (designation, date as YYYY-MM-DD HH:MM, distance in AU, relative velocity in km/s) tuples.
+        :param db_path: The path of the SQLite file. Use ':memory:' for a store that isn't persisted.
+        :param refresh_seconds: How long synced data that reaches past the time it was fetched stays fresh (new approaches are
+        still being found for the future). Windows that were entirely in the past when fetched never go stale.
+        """
+        self.db_path = db_path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        if db_path != ':memory:':
+            makedirs(path.dirname(path.abspath(db_path)), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS approaches (designation TEXT, date TEXT, dist REAL, v_rel REAL, PRIMARY KEY (designation, date));
+            CREATE INDEX IF NOT EXISTS approaches_date_dist ON approaches (date, dist);
+            CREATE TABLE IF NOT EXISTS windows (start TEXT PRIMARY KEY, stop TEXT, dist_max REAL, synced REAL);
+            CREATE TABLE IF NOT EXISTS designations (designation TEXT PRIMARY KEY, dist_max REAL, synced REAL);
+        """)  # The primary key of approaches doubles as the designation index
+        self._connection.commit()
+
+    def _fresh(self, stop: str | None, dist_max: float, synced: float, requested_dist_max: float) -> bool:
+        """Returns True if synced data covers a distance limit and doesn't need to be fetched again."""
+        if dist_max < requested_dist_max:
+            return False
+        if stop is not None and stop <= datetime.fromtimestamp(synced).date().isoformat():
+            return True  # The whole window was in the past when it was fetched
+        return time.time() - synced < self.refresh_seconds
+
+    def missing_windows(self, windows, dist_max: float) -> list:
+        """
+        Returns the (start, stop) date windows that haven't been synced up to dist_max AU, or have gone stale. A window synced
+        before only counts if it reached at least as far as the requested one (windows are stored by their start).
+        """
+        with self._lock:
+            synced = {start: row for start, *row in self._connection.execute("SELECT start, stop, dist_max, synced FROM windows")}
+        missing = list()
+        for start, stop in windows:
+            row = synced.get(start.isoformat())
+            if row is None or row[0] < stop.isoformat() or not self._fresh(*row, requested_dist_max=dist_max):
+                missing.append((start, stop))
+        return missing
+
+    def has_window(self, start: date, stop: date, dist_max: float) -> bool:
+        """Returns True if a window reaching at least to stop was ever synced up to dist_max AU, even if it's stale."""
+        with self._lock:
+            row = self._connection.execute("SELECT stop, dist_max FROM windows WHERE start = ?", (start.isoformat(),)).fetchone()
+        return row is not None and row[0] >= stop.isoformat() and row[1] >= dist_max
+
+    def store_window(self, start: date, stop: date, dist_max: float, rows):
+        """
+        Stores the approaches of a date window and marks the window as synced. The approaches stored for the window before are
+        replaced, so approaches CAD dropped or re-timed since don't linger.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM approaches WHERE date >= ? AND date < ? AND dist <= ?", (start.isoformat(), stop.isoformat(), dist_max))
+            self._connection.executemany("INSERT OR REPLACE INTO approaches VALUES (?, ?, ?, ?)", rows)
+            self._connection.execute("INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?)", (start.isoformat(), stop.isoformat(), dist_max, time.time()))
+
+    def designation_synced(self, designation: str, dist_max: float) -> bool:
+        """Returns True if every approach of an asteroid up to dist_max AU was synced recently."""
+        with self._lock:
+            row = self._connection.execute("SELECT dist_max, synced FROM designations WHERE designation = ?", (designation,)).fetchone()
+        return row is not None and self._fresh(None, *row, requested_dist_max=dist_max)
+
+    def store_designation(self, designation: str, start: str, stop: str, dist_max: float, rows):
+        """
+        Stores every approach of an asteroid from start up to (but not including) stop and marks the asteroid as synced. The
+        approaches stored for it in that range before are replaced.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM approaches WHERE designation = ? AND date >= ? AND date < ? AND dist <= ?",
+                                     (designation, start, stop, dist_max))
+            self._connection.executemany("INSERT OR REPLACE INTO approaches VALUES (?, ?, ?, ?)", rows)
+            self._connection.execute("INSERT OR REPLACE INTO designations VALUES (?, ?, ?)", (designation, dist_max, time.time()))
+
+    def approaches(self, start: str, stop: str, dist_max: float):
+        """
+        Yields the stored approaches from start up to (but not including) stop within dist_max AU, in chronological order.
+        Rows are read a page at a time, so large ranges don't have to fit in memory.
+        :param start: The first date, as YYYY-MM-DD[ HH:MM].
+        :param stop: The end date, as YYYY-MM-DD[ HH:MM].
+        """
+        last = (start, '')
+        while True:
+            with self._lock:
+                page = self._connection.execute(
+                    "SELECT designation, date, dist, v_rel FROM approaches WHERE date >= ? AND (date, designation) > (?, ?) AND date < ? "
+                    "AND dist <= ? ORDER BY date, designation LIMIT ?", (last[0], *last, stop, dist_max, PAGE_SIZE)).fetchall()
+            yield from page
+            if len(page) < PAGE_SIZE:
+                return
+            last = (page[-1][1], page[-1][0])
+
+    def approaches_of(self, designation: str, start: str, stop: str, dist_max: float) -> list:
+        """Returns the stored approaches of one asteroid from start up to (but not including) stop within dist_max AU, by date."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT designation, date, dist, v_rel FROM approaches WHERE designation = ? AND date >= ? AND date < ? AND dist <= ? "
+                "ORDER BY date", (designation, start, stop, dist_max)).fetchall()
+
+    def clear(self):
+        """Removes every stored approach and forgets what was synced."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM approaches")
+            self._connection.execute("DELETE FROM windows")
+            self._connection.execute("DELETE FROM designations")
@@ -0,0 +1,105 @@
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from os import makedirs, path
+
+DEFAULT_CACHE_PATH = path.join(path.expanduser('~'), '.astroinfo', 'cache.sqlite3')
+# How long (in seconds) a response from each source stays fresh
+DEFAULT_TTLS = {
+    'sbdb': 7 * 24 * 3600,  # Orbit solutions and physical parameters rarely change
+    'neows': 24 * 3600,
+    'cad': 24 * 3600,
+}
+
+
+class CacheMiss(LookupError):
+    """Raised when the cache is in offline mode and a response isn't stored."""
+
+
+class ResponseCache:
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttls: dict | None = None, max_entries: int = 5000, offline: bool = False):
+        """
+        An on-disk cache for API responses, backed by SQLite.
+        :param db_path: The path of the SQLite file. Use ':memory:' for a cache that isn't persisted.
+        :param ttls: Time-to-live in seconds per source (e.g. {'sbdb': 3600}); merged over DEFAULT_TTLS.
+        :param max_entries: The maximum number of stored responses; the least recently used ones are evicted first.
+        :param offline: If True, the network is never used and a missing response raises CacheMiss.
+        """
+        self.db_path = db_path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.offline = offline
+        self._lock = threading.Lock()
+        if db_path != ':memory:':
+            makedirs(path.dirname(path.abspath(db_path)), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, source TEXT, stored REAL, accessed REAL, value BLOB)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(source: str, params: dict) -> str:
+        """Builds a cache key from a source name and its request parameters, independent of parameter order and case."""
+        normalized = {str(k).lower(): ' '.join(str(v).split()).lower() for k, v in params.items()}
+        return f"{source}:{json.dumps(normalized, sort_keys=True)}"
+
+    def get(self, source: str, params: dict):
+        """
+        Returns a stored response, or None if it's missing or expired.
+        :param source: The source the response came from ('sbdb', 'neows' or 'cad').
+        :param params: The parameters of the request.
+        """
+        key = self.make_key(source, params)
+        with self._lock:
+            row = self._connection.execute("SELECT stored, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            stored, value = row
+            if not self.offline and time.time() - stored > self.ttls.get(source, 0):
+                return None  # Expired; offline mode keeps serving stale data since there's nothing better.
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+        return pickle.loads(value)
+
+    def put(self, source: str, params: dict, value):
+        """Stores a response, evicting the least recently used responses if the cache is full."""
+        key = self.make_key(source, params)
+        now = time.time()
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                     (key, source, now, now, pickle.dumps(value)))
+            count = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,))
+            self._connection.commit()
+
+    def fetch(self, source: str, params: dict, loader):
+        """
+        Returns the stored response if there is a fresh one; otherwise calls the loader and stores its result.
+        :param source: The source the response comes from ('sbdb', 'neows' or 'cad').
+        :param params: The parameters of the request, used as the cache key.
+        :param loader: A function with no arguments that performs the request. If it returns None, nothing is stored.
+        """
+        value = self.get(source, params)
+        if value is not None:
+            return value
+        if self.offline:
+            raise CacheMiss(f"No cached {source} response for {params}")
+        value = loader()
+        if value is not None:
+            self.put(source, params, value)
+        return value
+
+    def clear(self, source: str | None = None):
+        """Removes every stored response, or only the ones from a single source."""
+        with self._lock:
+            if source is None:
+                self._connection.execute("DELETE FROM responses")
+            else:
+                self._connection.execute("DELETE FROM responses WHERE source = ?", (source,))
+            self._connection.commit()
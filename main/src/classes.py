@@ -1,44 +1,282 @@
+import bisect
 import math
-from datetime import datetime, timedelta
-from os import getenv
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
 
-import requests
+import numpy as np
 from astroquery.jplsbdb import SBDB
-from dotenv import load_dotenv, find_dotenv
+
+import kepler
+from approaches import ApproachStore
+from cache import CacheMiss, ResponseCache
+from client import RateLimiter, http_client
+from config import config
+from resolver import Resolution, ResolverIndex, canonical_spkid, normalize
+from schema import extract_neows, extract_sbdb
+
+response_cache = ResponseCache(config.cache_path, offline=config.offline)  # Shared on-disk cache for SBDB and NeoWs responses
+approach_store = ApproachStore(config.approach_db_path)  # Local database of close approaches from CAD
+resolver_index = ResolverIndex(config.resolver_db_path)  # Maps the names, designations and SPK-IDs of known asteroids to each other
+nasa_rate_limiter = RateLimiter(requests_per_second=config.nasa_requests_per_second, burst=config.nasa_burst)  # Limits requests made with the NASA API key
+_thread_limits = threading.local()  # A stricter limiter for the NASA API key on the threads of an Asteroid.bulk() call
+
+
+class instance_cached_property:
+    def __init__(self, function):
+        """
+        Like functools.cached_property, but locked per instance: before Python 3.12, cached_property holds one lock for
+        every instance, so lazy asteroids loading on different threads would wait on each other. The value is kept in the
+        instance's __dict__, so popping it from there (see Asteroid.invalidate_properties) makes it computed again.
+        """
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Reentrant, since properties use each other (e.g. physical_properties uses record)
+        with instance.__dict__.setdefault('_properties_lock', threading.RLock()):
+            if self.name not in instance.__dict__:  # Another thread may have computed it while this one waited
+                instance.__dict__[self.name] = self.function(instance)
+            return instance.__dict__[self.name]
+
+
+def query_sbdb(identifier, phys: bool = True):
+    """
+    Queries SBDB through the response cache. Identifiers the resolver index knows are cached under the asteroid's primary
+    designation, so 'Apophis', '99942' and '2004 MN4' share one response; unknown ones are added to the index once found.
+    :param identifier: Any identifier SBDB understands.
+    :param phys: If True, the physical parameters are included. If False, a cached response with them is still used if there is one.
+    """
+    def load():
+        result = SBDB.query(identifier, phys=phys)
+        return result if 'object' in result else None  # Don't cache failed lookups
+    known = resolver_index.resolve(identifier)
+    sstr = known.designation if known is not None else identifier
+    if not phys and (cached := response_cache.get('sbdb', {'sstr': sstr, 'phys': True})) is not None:
+        return cached
+    result = response_cache.fetch('sbdb', {'sstr': sstr, 'phys': phys}, load)
+    if known is None and result is not None:
+        resolution = resolver_index.add_sbdb(identifier, result)
+        if normalize(resolution.designation) != normalize(identifier):
+            response_cache.put('sbdb', {'sstr': resolution.designation, 'phys': phys}, result)
+    return result
+
+
+def get_json(source, url, params=None, cache_params=None, limiter=None):
+    """
+    Performs a GET request through the response cache and returns the decoded JSON, or None if the request failed.
+    :param source: The source of the request (e.g. 'neows'); selects the time-to-live.
+    :param url: The URL of the request.
+    :param params: The query parameters of the request.
+    :param cache_params: The parameters used as the cache key, if they differ from params (e.g. to leave out API keys).
+    :param limiter: An optional RateLimiter that is waited on before a request goes over the network.
+    """
+    def load():
+        return http_client.get_json(url, params=params, limiter=limiter)
+    try:
+        return response_cache.fetch(source, cache_params if cache_params is not None else dict(params or {}, url=url), load)
+    except CacheMiss:
+        return None  # Offline and never fetched before
+
+
+AU_KM = 149597871  # Kilometers in an astronomical unit
+KM_MI = 0.62137119  # Miles in a kilometer
+CAD_FIELDS = ['des', 'orbit_id', 'jd', 'cd', 'dist', 'dist_min', 'dist_max', 'v_rel', 'v_inf', 't_sigma_f', 'h']
+CAD_WINDOW_EPOCH = date(2000, 1, 1)  # search_by_date windows start a whole number of windows after this date, so each is synced once
+CAD_MONTHS = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+              'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'}
+
+
+CATALOG_STRING_FIELDS = ('spkid', 'designation', 'full_name', 'orbit_class')
+CATALOG_BOOL_FIELDS = ('neo', 'pha')
+CATALOG_FLOAT_FIELDS = ('H', 'diameter', 'albedo', 'epoch', 'e', 'a', 'q', 'Q', 'i', 'om', 'w', 'M', 'period', 'moid')
+CATALOG_FIELDS = CATALOG_STRING_FIELDS + CATALOG_BOOL_FIELDS + CATALOG_FLOAT_FIELDS
+# The SBDB query API name of each AsteroidCatalog column that is named differently
+SBDB_QUERY_FIELDS = {'designation': 'pdes', 'orbit_class': 'class', 'Q': 'ad', 'M': 'ma', 'period': 'per'}
+# The SBDB query API gives orbit classes as codes; SBDB lookups give their names
+ORBIT_CLASSES = {'IEO': 'Atira', 'ATE': 'Aten', 'APO': 'Apollo', 'AMO': 'Amor', 'MCA': 'Mars-crossing Asteroid',
+                 'IMB': 'Inner Main-belt Asteroid', 'MBA': 'Main-belt Asteroid', 'OMB': 'Outer Main-belt Asteroid',
+                 'TJN': 'Jupiter Trojan', 'CEN': 'Centaur', 'TNO': 'TransNeptunian Object', 'PAA': 'Parabolic Asteroid',
+                 'HYA': 'Hyperbolic Asteroid', 'AST': 'Asteroid'}
+
+
+def distance_units(distance_au: float | None) -> dict:
+    """Returns a distance in AU, miles and kilometers (rounded to 3 decimals), or 'Unavailable' in each if it's None."""
+    if distance_au is None:
+        return {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
+    distance_km = distance_au * AU_KM
+    return {'AU': round(distance_au, 3), 'mi': round(distance_km * KM_MI, 3), 'km': round(distance_km, 3)}
+
+
+class CloseApproachTable:
+    def __init__(self, cad_response: dict):
+        """
+        Close approach data from the CAD API, stored as NumPy columns. Unit conversions are done for every row at once.
+        :param cad_response: The decoded JSON of a CAD API response.
+        """
+        fields = cad_response.get('fields', CAD_FIELDS)
+        rows = cad_response.get('data') or []
+        columns = dict(zip(fields, zip(*rows))) if rows else dict.fromkeys(fields, ())
+        self.designation = np.array(columns['des'], dtype=str)
+        self.date = self.parse_dates(columns['cd'])  # datetime64[m]
+        self.distance_au = np.array(columns['dist'], dtype=float)
+        self.distance_km = self.distance_au * AU_KM
+        self.distance_mi = self.distance_km * KM_MI
+        self.velocity_kms = np.array(columns['v_rel'], dtype=float)
+        self.velocity_mis = self.velocity_kms * KM_MI
+
+    @classmethod
+    def from_store(cls, rows):
+        """Creates a table from ApproachStore rows of (designation, date as YYYY-MM-DD HH:MM, distance in AU, velocity in km/s)."""
+        designations, dates, distances, velocities = zip(*rows) if rows else ((), (), (), ())
+        table = object.__new__(cls)
+        table.designation = np.array(designations, dtype=str)
+        table.date = np.char.replace(np.array(dates, dtype=str), ' ', 'T').astype('datetime64[m]')
+        table.distance_au = np.array(distances, dtype=float)
+        table.distance_km = table.distance_au * AU_KM
+        table.distance_mi = table.distance_km * KM_MI
+        table.velocity_kms = np.array(velocities, dtype=float)
+        table.velocity_mis = table.velocity_kms * KM_MI
+        return table
+
+    @staticmethod
+    def parse_dates(dates) -> np.ndarray:
+        """Converts CAD dates (YYYY-Mon-DD HH:MM) to a datetime64 array."""
+        dates = np.array(dates, dtype=str)
+        if not dates.size:
+            return np.array([], dtype='datetime64[m]')
+        for month, number in CAD_MONTHS.items():
+            dates = np.char.replace(dates, f'-{month}-', f'-{number}-')
+        return np.char.replace(dates, ' ', 'T').astype('datetime64[m]')
+
+    def __len__(self):
+        return len(self.designation)
+
+    def date_strings(self) -> np.ndarray:
+        """Returns the approach dates as YYYY-MM-DD HH:MM strings."""
+        strings = np.datetime_as_string(self.date, unit='m')
+        return np.char.replace(strings, 'T', ' ') if strings.size else strings
+
+    def take(self, indices):
+        """Returns a new table with only the rows at some indices (or where a boolean mask is True)."""
+        table = object.__new__(CloseApproachTable)
+        for name in ('designation', 'date', 'distance_au', 'distance_km', 'distance_mi', 'velocity_kms', 'velocity_mis'):
+            setattr(table, name, getattr(self, name)[indices])
+        return table
+
+    def store_rows(self) -> list:
+        """Returns every row as a (designation, date, distance in AU, velocity in km/s) tuple for the ApproachStore."""
+        return list(zip(self.designation.tolist(), self.date_strings().tolist(), self.distance_au.tolist(), self.velocity_kms.tolist()))
+
+    def records(self) -> list:
+        """Returns every row as a CloseApproach, in the order of the table."""
+        return list(map(CloseApproach, self.designation.tolist(), self.date.astype(object).tolist(),
+                        self.distance_au.tolist(), self.velocity_kms.tolist()))
+
+    def rounded_columns(self, decimals: int = 3) -> dict:
+        """Returns the converted distance and velocity columns rounded to a number of decimals, as lists of floats."""
+        return {name: np.round(getattr(self, name), decimals).tolist() for name in
+                ('distance_au', 'distance_km', 'distance_mi', 'velocity_kms', 'velocity_mis')}
+
+
+class CloseApproach(NamedTuple):
+    """One close approach to Earth. Other units are computed when they are asked for."""
+    designation: str
+    date: datetime
+    distance_au: float
+    velocity_kms: float  # Relative velocity
+
+    @classmethod
+    def from_store(cls, row):
+        """Creates a record from an ApproachStore row."""
+        designation, date_string, distance_au, velocity_kms = row
+        return cls(designation, datetime.fromisoformat(date_string), distance_au, velocity_kms)
+
+    @property
+    def date_string(self) -> str:
+        """The date as YYYY-MM-DD HH:MM."""
+        return self.date.strftime("%Y-%m-%d %H:%M")
+
+    @property
+    def distance_km(self) -> float:
+        return self.distance_au * AU_KM
+
+    @property
+    def distance_mi(self) -> float:
+        return self.distance_au * AU_KM * KM_MI
+
+    @property
+    def velocity_mis(self) -> float:
+        return self.velocity_kms * KM_MI
+
+
+class CloseApproachList(Sequence):
+    def __init__(self, approaches=()):
+        """
+        A read-only list of CloseApproach records sorted by date, with indexes by designation and by distance.
+        Approaches at the same time are all kept.
+        :param approaches: An iterable of CloseApproach records, in any order.
+        """
+        self._approaches = sorted(approaches, key=lambda approach: approach.date)
+        self._dates = [approach.date for approach in self._approaches]
+        self._by_designation = None
+        self._by_distance, self._distances = None, None
+
+    def __getitem__(self, index):
+        return self._approaches[index]
+
+    def __len__(self):
+        return len(self._approaches)
+
+    def between(self, start: datetime, end: datetime) -> list:
+        """Returns the approaches from start up to (but not including) end."""
+        return self._approaches[bisect.bisect_left(self._dates, start):bisect.bisect_left(self._dates, end)]
+
+    def by_designation(self, designation: str) -> list:
+        """Returns the approaches of one asteroid, sorted by date."""
+        if self._by_designation is None:
+            self._by_designation = dict()
+            for approach in self._approaches:
+                self._by_designation.setdefault(approach.designation, []).append(approach)
+        return list(self._by_designation.get(designation, ()))
+
+    def within(self, distance_au: float) -> list:
+        """Returns the approaches closer than or as close as a distance in AU, sorted from closest to farthest."""
+        if self._by_distance is None:
+            self._by_distance = sorted(self._approaches, key=lambda approach: approach.distance_au)
+            self._distances = [approach.distance_au for approach in self._by_distance]
+        return self._by_distance[:bisect.bisect_right(self._distances, distance_au)]
+
 
 class Asteroid:
-    def __new__(cls, identifier):
-        """Detects if the asteroid is a NEO and changes the class to NearEarthObject if it is."""
+    def __new__(cls, identifier, lazy: bool = False):
+        """
+        Detects if the asteroid is a NEO and changes the class to NearEarthObject if it is.
+        :param identifier: Any identifier SBDB understands (a name, designation, number or SPK-ID).
+        :param lazy: If True, only the identifiers and orbit are fetched now; the physical parameters (and NeoWs, for NEOs)
+        are fetched the first time physical_properties or orbital_properties is used.
+        """
         instance = super().__new__(cls)
         try:
-            instance.SBDB = SBDB.query(identifier, phys=True)  # Main data source
-            instance.IAU = instance.SBDB['object']['des']
-            spkid = instance.SBDB['object']['spkid']
-            try:
-                if int(spkid) - int(instance.IAU) == 20_000_000:  # This means the SPK-ID is represented inaccurately.
-                    spkid = str(int(instance.IAU) + 2_000_000)
-            except ValueError:
-                pass
-
-            if int(spkid) > 3_000_000:  # Temporary-designated asteroids follow different SPKID patterns
-                instance.SPKID = spkid
-            else:
-                instance.SPKID = str(int(instance.IAU) + 2_000_000)  # Adjust SPKID
+            instance.identifier = identifier
+            instance.SBDB = query_sbdb(identifier, phys=not lazy)  # Main data source
+            instance.details_loaded = not lazy
+            resolution = Resolution.from_sbdb(instance.SBDB)  # Also corrects the SPK-IDs SBDB gives some numbered asteroids
+            instance.IAU = resolution.designation
+            instance.SPKID = resolution.spkid
 
             if instance.SBDB['object']['neo']:
-                try:
-                    dotenv_path = find_dotenv('priv_api_key.env', raise_error_if_not_found=True)
-                except Exception:
-                    try:
-                        dotenv_path = find_dotenv('api_key.env', raise_error_if_not_found=True)
-                    except Exception:
-                        print("No api_key.env file found; please visit https://github.com/chengezahmad/ASTROINFO to see where to replace it")
-                load_dotenv(dotenv_path)
-                url = f"https://api.nasa.gov/neo/rest/v1/neo/{instance.SPKID}?api_key{getenv('api_key')}"
-                main_response = requests.get(url)
-                if main_response.status_code == 200:
-                    instance.NEOWS = main_response.json()  # Define the NEOWS database before moving to the next class
-                    instance.__class__ = NearEarthObject  # Change the class dynamically
+                # SBDB decides the class, so lazy and eager asteroids agree; NEOWS stays empty if NeoWs has no record
+                if not lazy:  # Otherwise, NEOWS is fetched with the other details
+                    instance.NEOWS = instance.query_neows() or dict()  # Define the NEOWS database before moving to the next class
+                instance.__class__ = NearEarthObject  # Change the class dynamically
             return instance
         except ValueError:
             pass
@@ -47,122 +285,135 @@ class Asteroid:
         except Exception as e:
             pass
 
-    def __init__(self, identifier):
+    def __init__(self, identifier, lazy: bool = False):
         """Represents any asteroid. If it is a NEO, move it to the NearEarthObject class."""
         pass
 
-    @property
-    def physical_properties(self):
-        """Retrieves the asteroid's physical properties. The only possible source is JPL's SBDB database."""
+    def query_neows(self):
+        """Fetches the asteroid's NeoWs record (through the response cache), or returns None if NeoWs doesn't have it."""
+        url = http_client.url('neows', f"neo/{self.SPKID}")
+        return get_json('neows', url, params={'api_key': config.api_key}, cache_params={'spkid': self.SPKID}, limiter=getattr(_thread_limits, 'limiter', nasa_rate_limiter))
+
+    def load_details(self):
+        """Fetches the physical parameters (and NeoWs, for NEOs) of an asteroid created with lazy=True. Does nothing otherwise."""
+        if self.__dict__.get('details_loaded', True):
+            return
         try:
-            rotational_period = {'hrs': round(self.SBDB['phys_par']['rot_per'].value, 3)}
-        except KeyError:
-            rotational_period = 'Unavailable'
-        except AttributeError:
+            self.SBDB = query_sbdb(self.identifier) or self.SBDB  # Keep the orbit-only response if the lookup fails now
+        except CacheMiss:
+            pass  # Offline; the properties are computed from what's known
+        if isinstance(self, NearEarthObject):
+            self.NEOWS = self.query_neows() or dict()
+        self.__dict__.pop('record', None)  # Extracted from what was known before
+        self.details_loaded = True
+
+    def invalidate_properties(self):
+        """Forgets the extracted record, the computed physical and orbital properties and close approaches, so they are rebuilt on next access."""
+        self.__dict__.pop('record', None)
+        self.__dict__.pop('physical_properties', None)
+        self.__dict__.pop('orbital_properties', None)
+        self.__dict__.pop('close_approach_table', None)
+
+    @classmethod
+    def bulk(cls, identifiers, max_workers: int = 8, requests_per_second: float | None = None, lazy: bool = False):
+        """
+        Creates many asteroids at once, fetching them on a pool of threads.
+        Identifiers that resolve to an asteroid that was already returned (same SPK-ID) are skipped; identifiers the resolver
+        index knows are deduplicated before anything is fetched.
+        :param identifiers: An iterable of asteroid identifiers.
+        :param max_workers: The maximum number of asteroids fetched at the same time.
+        :param requests_per_second: If given, a limit for this call's requests made with the NASA API key, on top of the
+        shared one (nasa_rate_limiter), which stays as it is for every other request.
+        :param lazy: If True, the asteroids are created with lazy=True (see Asteroid).
+        :return: A generator of (identifier, asteroid) tuples in the order they finish; the asteroid is None if the identifier is invalid.
+        """
+        limiter = RateLimiter(requests_per_second, parent=nasa_rate_limiter) if requests_per_second is not None else nasa_rate_limiter
+
+        def create(identifier):
+            _thread_limits.limiter = limiter
             try:
-                rotational_period = {'hrs': round(self.SBDB['phys_par']['rot_per'], 3)}
-            except KeyError:
-                rotational_period = 'Unavailable'
+                return cls(identifier, lazy)
+            finally:
+                del _thread_limits.limiter
+
+        unique_ids = dict()  # SPK-ID, or normalized identifier if it isn't in the resolver index -> identifier as given
+        identifiers = [identifier for identifier in map(str, identifiers) if identifier.strip()]
+        for identifier, known in resolver_index.resolve_many(identifiers).items():
+            unique_ids.setdefault(known.spkid if known is not None else normalize(identifier), identifier.strip())
+        seen_spkids = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(create, identifier): identifier for identifier in unique_ids.values()}
+            try:
+                for future in as_completed(futures):
+                    asteroid = future.result()
+                    if asteroid is not None:
+                        if asteroid.SPKID in seen_spkids:
+                            continue
+                        seen_spkids.add(asteroid.SPKID)
+                    yield futures[future], asteroid
+            finally:
+                for future in futures:  # Don't keep fetching if the caller stops early
+                    future.cancel()
+
+    @instance_cached_property
+    def record(self):
+        """The asteroid's SBDB payload as a flat SBDBRecord (see schema.py), extracted once."""
+        return extract_sbdb(self.SBDB)
+
+    @instance_cached_property
+    def physical_properties(self):
+        """Retrieves the asteroid's physical properties. The only possible source is JPL's SBDB database. Computed once per asteroid."""
+        self.load_details()
+        record = self.record
+        rotational_period = {'hrs': round(record.rot_per, 3)} if record.rot_per is not None else 'Unavailable'
 
         # albedo
-        try:
-            albedo = float(self.SBDB['phys_par']['albedo'].value)
-        except KeyError:
-            albedo = 'Unavailable'
-        except AttributeError:
-            try:
-                albedo = float(self.SBDB['phys_par']['albedo'])
-            except KeyError:
-                albedo = 'Unavailable'
+        albedo = record.albedo if record.albedo is not None else 'Unavailable'
 
         # spectral type (can be estimated with albedo)
-        try:
-            spectral_type = self.SBDB['phys_par']['spec_B']
-        except KeyError:
-            try:
-                spectral_type = self.SBDB['phys_par']['spec_T']
-            except KeyError:
-                if albedo != 'Unavailable':
-                    if albedo < 0.1:
-                        spectral_type = 'C'
-                    elif 0.1 < albedo < 0.2:
-                        spectral_type = "M"
-                    elif 0.2 < albedo:
-                        spectral_type = "S"
-                else:
-                    spectral_type = 'Unavailable'
+        spectral_type = record.spec_B if record.spec_B is not None else record.spec_T
+        if spectral_type is None:
+            if albedo == 'Unavailable':
+                spectral_type = 'Unavailable'
+            elif albedo < 0.1:
+                spectral_type = 'C'
+            elif albedo < 0.2:
+                spectral_type = "M"
+            else:
+                spectral_type = "S"
 
         # absolute magnitude
-        try:
-            absolute_magnitude = round(self.SBDB['phys_par']['H'], 3)
-        except KeyError:
-            absolute_magnitude = 'Unavailable'
-        except AttributeError:
-            try:
-                absolute_magnitude = round(self.SBDB['phys_par']['H'].value, 3)
-            except KeyError:
-                absolute_magnitude = 'Unavailable'
+        absolute_magnitude = round(record.H, 3) if record.H is not None else 'Unavailable'
 
         # diameter (can be estimated with albedo and absolute magnitude)
-        try:
-            diameter_km = self.SBDB['phys_par']['diameter'].value
+        if record.diameter is not None:
+            diameter_km = record.diameter
+        elif albedo != 'Unavailable' and absolute_magnitude != 'Unavailable':
+            diameter_km = (1.329 * (10 ** 6) * (albedo ** -1 / 2) * (10 ** (-0.2 * absolute_magnitude))) / 1000
+        else:
+            diameter_km = 'Unavailable'
+        if diameter_km != 'Unavailable':
             diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
                         'mi': round(diameter_km * 0.62137119, 3)}
-        except KeyError:
-            if albedo != 'Unavailable' and absolute_magnitude != 'Unavailable':
-                diameter_km = (1.329 * (10 ** 6) * (albedo ** -1 / 2) * (10 ** (-0.2 * absolute_magnitude))) / 1000
-                diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
-                            'mi': round(diameter_km * 0.62137119, 3)}
-            else:
-                diameter_km = 'Unavailable'
-                diameter = {'km': 'Unavailable', 'm': 'Unavailable', 'mi': 'Unavailable'}
-        except AttributeError:
-            try:
-                diameter_km = float(self.SBDB['phys_par']['diameter'])
-                diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
-                            'mi': round(diameter_km * 0.62137119, 3)}
-            except KeyError:
-                if albedo != 'Unavailable' and absolute_magnitude != 'Unavailable':
-                    diameter_km = (1.329 * (10 ** 6) * (albedo ** -1 / 2) * (10 ** (-0.2 * absolute_magnitude))) / 1000
-                    diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
-                                'mi': round(diameter_km * 0.62137119, 3)}
-                else:
-                    diameter_km = 'Unavailable'
-                    diameter = {'km': 'Unavailable', 'm': 'Unavailable', 'mi': 'Unavailable'}
+        else:
+            diameter = {'km': 'Unavailable', 'm': 'Unavailable', 'mi': 'Unavailable'}
 
         # density (can be estimated with spectral type)
-        try:
-            density_g = float(self.SBDB['phys_par']['density'].value)
-            density = {'g/cm^3': density_g,
-                       'kg/m^3': density_g / 1000}
-        except KeyError:
-            if spectral_type != 'Unavailable':
-                if spectral_type == 'C':
-                    density = {'g/cm^3': 1.7, 'kg/m^3': 0.0017}
-                elif spectral_type == 'M':
-                    density = {'g/cm^3': 5.32, 'kg/m^3': 0.00532}
-                else:
-                    density = {'g/cm^3': 6.71, 'kg/m^3': 0.00671}
+        if record.density is not None:
+            density = {'g/cm^3': record.density,
+                       'kg/m^3': record.density / 1000}
+        elif spectral_type != 'Unavailable':
+            if spectral_type == 'C':
+                density = {'g/cm^3': 1.7, 'kg/m^3': 0.0017}
+            elif spectral_type == 'M':
+                density = {'g/cm^3': 5.32, 'kg/m^3': 0.00532}
             else:
-                density = {'g/cm^3': 'Unavailable', 'kg/m^3': 'Unavailable'}
-        except AttributeError:
-            try:
-                density_g = float(self.SBDB['phys_par']['density'])
-                density = {'g/cm^3': density_g,
-                           'kg/m^3': density_g / 1000}
-            except KeyError:
-                if spectral_type != 'Unavailable':
-                    if spectral_type == 'C':
-                        density = {'g/cm^3': 1.7, 'kg/m^3': 0.0017}
-                    elif spectral_type == 'M':
-                        density = {'g/cm^3': 5.32, 'kg/m^3': 0.00532}
-                    else:
-                        density = {'g/cm^3': 6.71, 'kg/m^3': 0.00671}
-                else:
-                    density = {'g/cm^3': 'Unavailable', 'kg/m^3': 'Unavailable'}
+                density = {'g/cm^3': 6.71, 'kg/m^3': 0.00671}
+        else:
+            density = {'g/cm^3': 'Unavailable', 'kg/m^3': 'Unavailable'}
 
         # mass
-        if density['kg/m^3'] != 'Unavailable' and diameter_km != 'Unavailable':
+        if diameter_km != 'Unavailable':
             radius = diameter_km * 2000
             volume = (4 / 3 * math.pi) * (radius ** 3) / 1000
             mass = {'kg': round(radius * volume, 3),
@@ -198,177 +449,44 @@ class Asteroid:
             absolute_magnitude, 'diameter': diameter, 'density': density, 'surface gravity': surface_gravity,
                 'escape velocity': escape_velocity, 'mass': mass, 'albedo': albedo, 'volume': volume}
 
-    @property
+    @instance_cached_property
     def orbital_properties(self):
-        """Gets the orbital properties of the asteroid."""
-        # Note: Some orbital properties have multiple keys that can be used.
-        try:
-            perihelion_distance_AU = self.SBDB['orbit']['elements']['q'].value
-        except KeyError:
-            perihelion_distance_AU = 'Unavailable'
-        except AttributeError:
-            try:
-                perihelion_distance_AU = self.SBDB['orbit']['elements']['q']
-            except KeyError:
-                perihelion_distance_AU = 'Unavailable'
-
-        if perihelion_distance_AU != 'Unavailable':
-            perihelion_distance_km = perihelion_distance_AU * 149597871
-            perihelion_distance_mi = perihelion_distance_km * 0.62137119
-            perihelion_distance = {'AU': round(perihelion_distance_AU, 3), 'mi': round(perihelion_distance_mi, 3),
-                                   'km': round(perihelion_distance_km, 3)}
-        else:
-            perihelion_distance = {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
+        """Gets the orbital properties of the asteroid. Computed once per asteroid."""
+        self.load_details()
+        record = self.record
+        perihelion_distance = distance_units(record.q)
 
         # aphelion distance
-        try:
-            aphelion_distance_AU = self.SBDB['orbit']['elements']['Q'].value
-        except KeyError:
-            try:
-                aphelion_distance_AU = self.SBDB['orbit']['elements']['ad'].value
-            except KeyError:
-                aphelion_distance_AU = 'Unavailable'
-        except AttributeError:
-            try:
-                aphelion_distance_AU = float(self.SBDB['orbit']['elements']['Q'])
-            except KeyError:
-                try:
-                    aphelion_distance_AU = self.SBDB['orbit']['elements']['ad'].value
-                except KeyError:
-                    aphelion_distance_AU = 'Unavailable'
-                except AttributeError:
-                    try:
-                        aphelion_distance_AU = float(self.SBDB['orbit']['elements']['ad'])
-                    except KeyError:
-                        aphelion_distance_AU = 'Unavailable'
-        if aphelion_distance_AU != 'Unavailable':
-            aphelion_distance_km = aphelion_distance_AU * 149597871
-            aphelion_distance_mi = aphelion_distance_km * 0.62137119
-            aphelion_distance = {'AU': round(aphelion_distance_AU, 3), 'mi': round(aphelion_distance_mi, 3),
-                                 'km': round(aphelion_distance_km, 3)}
-        else:
-            aphelion_distance = {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
+        aphelion_distance = distance_units(record.Q)
 
         # semi-major axis (can be estimated with perihelion and aphelion distance)
-        try:
-            semi_major_axis_AU = float(self.SBDB['orbit']['elements']['a'].value)
-        except KeyError:
-            if perihelion_distance_AU != 'Unavailable' and aphelion_distance_AU != 'Unavailable':
-                semi_major_axis_AU = (perihelion_distance_AU + aphelion_distance_AU) / 2
-            else:
-                semi_major_axis_AU = 'Unavailable'
-        except AttributeError:
-            try:
-                semi_major_axis_AU = float(self.SBDB['orbit']['elements']['a'])
-            except KeyError:
-                if perihelion_distance_AU != 'Unavailable' and aphelion_distance_AU != 'Unavailable':
-                    semi_major_axis_AU = (perihelion_distance_AU + aphelion_distance_AU) / 2
-                else:
-                    semi_major_axis_AU = 'Unavailable'
-
-        if semi_major_axis_AU != 'Unavailable':
-            semi_major_axis_km = semi_major_axis_AU * 149597871
-            semi_major_axis_mi = semi_major_axis_km * 0.62137119
-            semi_major_axis = {'AU': round(semi_major_axis_AU, 3), 'mi': round(semi_major_axis_mi, 3),
-                               'km': round(semi_major_axis_km, 3)}
-        else:
-            semi_major_axis = {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
+        semi_major_axis_AU = record.a
+        if semi_major_axis_AU is None and record.q is not None and record.Q is not None:
+            semi_major_axis_AU = (record.q + record.Q) / 2
+        semi_major_axis = distance_units(semi_major_axis_AU)
 
         # eccentricity
-        try:
-            eccentricity = round(float(self.SBDB['orbit']['elements']['e']), 3)
-        except KeyError:
-            eccentricity = 'Unavailable'
-        except AttributeError:
-            try:
-                eccentricity = round(float(self.SBDB['orbit']['elements']['e'].value), 3)
-            except KeyError:
-                eccentricity = 'Unavailable'
+        eccentricity = round(record.e, 3) if record.e is not None else 'Unavailable'
 
         # mean anomaly
-        try:
-            mean_anomaly_deg = float(self.SBDB['orbit']['elements']['M'].value)
-        except KeyError:
-            try:
-                mean_anomaly_deg = float(self.SBDB['orbit']['elements']['ma'].value)
-            except KeyError:
-                mean_anomaly_deg = 'Unavailable'
-            except AttributeError:
-                try:
-                    mean_anomaly_deg = float(self.SBDB['orbit']['elements']['ma'])
-                except KeyError:
-                    mean_anomaly_deg = 'Unavailable'
-        except AttributeError:
-            try:
-                mean_anomaly_deg = float(self.SBDB['orbit']['elements']['M'])
-            except KeyError:
-                try:
-                    mean_anomaly_deg = float(self.SBDB['orbit']['elements']['ma'].value)
-                except KeyError:
-                    mean_anomaly_deg = 'Unavailable'
-                except AttributeError:
-                    try:
-                        mean_anomaly_deg = float(self.SBDB['orbit']['elements']['ma'])
-                    except KeyError:
-                        mean_anomaly_deg = 'Unavailable'
-
-        if mean_anomaly_deg != 'Unavailable':
-            mean_anomaly_rad = math.radians(mean_anomaly_deg)
-            mean_anomaly = {'deg': round(mean_anomaly_deg, 3), 'rad': round(mean_anomaly_rad, 3)}
+        if record.M is not None:
+            mean_anomaly = {'deg': round(record.M, 3), 'rad': round(math.radians(record.M), 3)}
         else:
             mean_anomaly = {'deg': 'Unavailable', 'rad': 'Unavailable'}
 
         # orbital period
-        try:
-            orbital_period_days = float(self.SBDB['orbit']['elements']['period'].value)
-        except KeyError:
-            try:
-                orbital_period_days = float(self.SBDB['orbit']['elements']['per'].value)
-            except KeyError:
-                orbital_period_days = 'Unavailable'
-            except AttributeError:
-                try:
-                    orbital_period_days = float(self.SBDB['orbit']['elements']['per'])
-                except KeyError:
-                    orbital_period_days = 'Unavailable'
-        except AttributeError:
-            try:
-                orbital_period_days = float(self.SBDB['orbit']['elements']['period'])
-            except KeyError:
-                try:
-                    orbital_period_days = float(self.SBDB['orbit']['elements']['per'].value)
-                except KeyError:
-                    orbital_period_days = 'Unavailable'
-                except AttributeError:
-                    try:
-                        orbital_period_days = float(self.SBDB['orbit']['elements']['per'])
-                    except KeyError:
-                        orbital_period_days = 'Unavailable'
-
-        if orbital_period_days != 'Unavailable':
-            orbital_period_hours = orbital_period_days * 24
-            orbital_period = {'hrs': round(orbital_period_hours, 3), 'days': round(orbital_period_days, 3)}
+        if record.period is not None:
+            orbital_period = {'hrs': round(record.period * 24, 3), 'days': round(record.period, 3)}
         else:
             orbital_period = {'hrs': 'Unavailable', 'days': 'Unavailable'}
 
         # orbit class
-        try:
-            orbit_class = self.SBDB['object']['orbit_class']['name']
-            if orbit_class == 'Aten':
-                orbit_class = 'Near Earth Object'
-        except KeyError:
-            orbit_class = 'Unavailable'
+        orbit_class = record.orbit_class if record.orbit_class is not None else 'Unavailable'
+        if orbit_class == 'Aten':
+            orbit_class = 'Near Earth Object'
 
         # orbit ID
-        try:
-            orbit_ID = str(self.SBDB['object']['orbit_id'])
-        except KeyError:
-            orbit_ID = 'Unavailable'
-        except AttributeError:
-            try:
-                orbit_ID = str(self.SBDB['object']['orbit_id'].value)
-            except KeyError:
-                orbit_ID = 'Unavailable'
+        orbit_ID = record.orbit_id if record.orbit_id is not None else 'Unavailable'
 
         # return statement
         return {'perihelion distance': perihelion_distance, 'aphelion distance': aphelion_distance,
@@ -380,316 +498,273 @@ class Asteroid:
         """Returns the identifiers of the asteroid."""
         return {'full name': self.SBDB['object']['fullname'], 'SPKID': self.SPKID, 'IAU': self.IAU}
 
+    @instance_cached_property
+    def close_approach_table(self):
+        """
+        Returns close approach data for the asteroid, starting 100 years ago and ending 100 years in the future, as a CloseApproachTable.
+        Approaches come from the local ApproachStore, which is only synced with CAD if the asteroid wasn't synced recently.
+        """
+        start = (datetime.today() - timedelta(days=36525)).strftime('%Y-%m-%d')
+        stop = (datetime.today() + timedelta(days=36525)).strftime('%Y-%m-%d')
+        if not response_cache.offline and not approach_store.designation_synced(self.IAU, 0.5):
+            params = {
+                "des": self.IAU,
+                "date-min": start,
+                "date-max": stop,
+                "dist-max": 0.5
+            }
+            data = http_client.get_json(http_client.url('cad', 'cad.api'), params=params)
+            if data is not None:
+                approach_store.store_designation(self.IAU, start, stop, 0.5, CloseApproachTable(data).store_rows())
+        rows = approach_store.approaches_of(self.IAU, start, stop, 0.5)
+        return CloseApproachTable.from_store(rows) if rows else None
+
     @property
     def close_approach_data(self):
-        """Returns close approach data for the asteroid, starting 100 years ago and ending 100 years in the future."""
-        base_url = "https://ssd-api.jpl.nasa.gov/cad.api"
-        params = {
-            "des": self.IAU,
-            "date-min": (datetime.today() - timedelta(days=36525)).strftime('%Y-%m-%d'),
-            "date-max": (datetime.today() + timedelta(days=36525)).strftime('%Y-%m-%d'),
-            "dist-max": 0.5
-        }
-        approaches = {}
-        response = requests.get(base_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            try:
-                if data['data']:
-                    for approach in data['data']:
-                        approach_date = datetime.strptime(approach[3], "%Y-%b-%d %H:%M").strftime("%Y-%m-%d %H:%M")
-                        dist_au = float(approach[4])
-                        dist_km = dist_au * 149597871
-                        dist_mi = dist_km * 0.62137119
-                        vel_km = float(approach[7])
-                        vel_mi = vel_km * 0.62137119
-                        approaches[approach_date] = {'distance': {'mi': round(dist_mi, 3), 'km': round(dist_km, 3), 'au': round(dist_au, 3)},
-                                                     'velocity': {'km/s': round(vel_km, 3), 'mi/s': round(vel_mi, 3)}}
-                    return approaches
-                else:
-                    return None
-            except KeyError:
-                return None
-        else:
+        """Returns close approach data for the asteroid (see close_approach_table) as a CloseApproachList."""
+        table = self.close_approach_table
+        if table is None:
             return None
+        return CloseApproachList(table.records())
 
 
 class NearEarthObject(Asteroid):
-    def __init__(self, identifier):
+    def __init__(self, identifier, lazy: bool = False):
         """Initializes a new database source for any asteroid that is a NEO."""
-        super().__init__(identifier)
-
-    @property
-    def physical_properties(self):
-        """With the added NeoWs capability, there is now a new data source, which is used in case the SBDB info is not available."""
-        try:
-            rotational_period = {'hrs': round(float(self.SBDB['phys_par']['rot_per'].value), 3)}
-        except KeyError:
-            rotational_period = 'Unavailable'
-
-        # albedo
-        try:
-            albedo = float(self.SBDB['phys_par']['albedo'])
-        except KeyError:
-            albedo = 'Unavailable'
-
-        # spectral type (can be estimated with albedo)
-        try:
-            spectral_type = self.SBDB['phys_par']['spec_B']
-        except KeyError:
-            try:
-                spectral_type = self.SBDB['phys_par']['spec_T']
-            except KeyError:
-                if albedo != 'Unavailable':
-                    if albedo < 0.1:
-                        spectral_type = 'C'
-                    elif 0.1 < albedo < 0.2:
-                        spectral_type = "M"
-                    elif 0.2 < albedo:
-                        spectral_type = "S"
-                else:
-                    spectral_type = 'Unavailable'
-
-        # absolute magnitude
-        try:
-            absolute_magnitude = round(float(self.SBDB['phys_par']['H']), 3)
-        except KeyError:
-            try:
-                absolute_magnitude = round(float(self.NEOWS['absolute_magnitude_h']), 3)
-            except KeyError:
-                absolute_magnitude = 'Unavailable'
-
-        # diameter (can be estimated with albedo and absolute magnitude)
-        try:
-            diameter_km = float(self.SBDB['phys_par']['diameter'].value)
-            diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
-                        'mi': round(diameter_km * 0.62137119, 3)}
-        except KeyError:
-            try:
-                diameter_km = float(self.NEOWS['estimated_diameter']['kilometers']['estimated_diameter_min'])
-                diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
-                            'mi': round(diameter_km * 0.62137119, 3)}
-            except KeyError:
-                if albedo != 'Unavailable' and absolute_magnitude != 'Unavailable':
-                    diameter_km = (1.329 * (10 ** 6) * (albedo ** -1 / 2) * (10 ** (-0.2 * absolute_magnitude))) / 1000
-                    diameter = {'km': round(diameter_km, 3), 'm': round(diameter_km * 1000, 3),
-                                'mi': round(diameter_km * 0.62137119, 3)}
-                else:
-                    diameter_km = 'Unavailable'
-                    diameter = {'km': 'Unavailable', 'm': 'Unavailable', 'mi': 'Unavailable'}
-
-        # density (can be estimated with spectral type)
-        try:
-            density_g = float(self.SBDB['phys_par']['density'].value)
-            density = {'g/cm^3': density_g,
-                       'kg/m^3': density_g / 1000}
-        except KeyError:
-            if spectral_type != 'Unavailable':
-                if spectral_type == 'C':
-                    density = {'g/cm^3': 1.7, 'kg/m^3': 0.0017}
-                elif spectral_type == 'M':
-                    density = {'g/cm^3': 5.32, 'kg/m^3': 0.00532}
-                else:
-                    density = {'g/cm^3': 6.71, 'kg/m^3': 0.00671}
+        super().__init__(identifier, lazy)
+
+    @instance_cached_property
+    def record(self):
+        """With the added NeoWs capability, there is now a new data source, which fills in what the SBDB info doesn't have."""
+        return extract_sbdb(self.SBDB).fill(extract_neows(self.__dict__.get('NEOWS')))
+
+
+class AsteroidCatalog:
+    # The unit each column is stored in; convert() turns them into the others in UNIT_FACTORS
+    COLUMN_UNITS = {'a': 'AU', 'q': 'AU', 'Q': 'AU', 'moid': 'AU', 'diameter': 'km', 'period': 'days',
+                    'i': 'deg', 'om': 'deg', 'w': 'deg', 'M': 'deg'}
+    UNIT_FACTORS = {('AU', 'km'): AU_KM, ('AU', 'mi'): AU_KM * KM_MI, ('km', 'm'): 1000, ('km', 'mi'): KM_MI,
+                    ('days', 'hrs'): 24, ('days', 'years'): 1 / 365.25, ('deg', 'rad'): math.pi / 180}
+
+    def __init__(self, columns: dict):
+        """
+        Many asteroids stored as NumPy columns, so they are filtered, sorted and converted all at once instead of one
+        Asteroid at a time. Missing numbers are NaN, which never passes a filter.
+        Build one with from_asteroids, from_records or from_sbdb_query (see fetch_catalog).
+        :param columns: A sequence of values for every name in CATALOG_FIELDS that is known; the others are left empty.
+        """
+        count = len(next((column for column in columns.values() if column is not None), ()))
+        for name in CATALOG_FIELDS:
+            values = columns.get(name)
+            if name in CATALOG_STRING_FIELDS:
+                values = ['' if value is None else value for value in values] if values is not None else [''] * count
+                setattr(self, name, np.array(values, dtype=str))
+            elif name in CATALOG_BOOL_FIELDS:
+                setattr(self, name, np.array([bool(value) for value in values] if values is not None else [False] * count, dtype=bool))
             else:
-                density = {'g/cm^3': 'Unavailable', 'kg/m^3': 'Unavailable'}
-
-        # mass
-        if density['kg/m^3'] and diameter_km != 'Unavailable':
-            radius = diameter_km * 2000
-            volume = (4 / 3 * math.pi) * (radius ** 3) / 1000
-            mass = {'kg': round(radius * volume, 3),
-                    'g': round(radius * volume * 1000, 3)}
-        else:
-            mass = {'kg': 'Unavailable', 'g': 'Unavailable'}
-
-        # surface gravity
-        if mass['kg'] != 'Unavailable' and diameter_km != 'Unavailable':
-            surface_gravity = {'m/s^2': round(6.67430e-11 * (float(mass['kg']) / (diameter_km * 500) ** 2), 3)}
-        else:
-            surface_gravity = 'Unavailable'
-
-        # escape velocity
-        if mass['kg'] != 'Unavailable' and diameter_km != 'Unavailable':
-            radius = diameter_km * 500
-            escape_vel_km = round(math.sqrt(2 * 6.67430e-11 * float(mass['kg']) / radius), 3)
-            escape_velocity = {'m/s': escape_vel_km * 1000, 'km/s': escape_vel_km,
-                               'mi/s': round(escape_vel_km * 0.62137119, 3)}
-        else:
-            escape_velocity = 'Unavailable'
-
-        # volume
-        if diameter_km != 'Unavailable':
-            radius = diameter_km * 500
-            volume_m = (4 / 3 * math.pi) * (radius ** 3)
-            volume = {'m^3': round(volume_m, 3), 'km^3': round(volume_m / 1_000_000, 3)}
-        else:
-            volume = 'Unavailable'
-
-        # return statement
-        return {'rotational period': rotational_period, 'spectral type': spectral_type, 'absolute magnitude':
-            absolute_magnitude, 'diameter': diameter, 'density': density, 'surface gravity': surface_gravity,
-                'escape velocity': escape_velocity, 'mass': mass, 'albedo': albedo, 'volume': volume}
-
-    @property
-    def orbital_properties(self):
-        try:
-            perihelion_distance_AU = float(self.SBDB['orbit']['elements']['q'].value)
-        except KeyError:
-            try:
-                perihelion_distance_AU = float(self.NEOWS['orbital_data']['perihelion_distance'])
-            except KeyError:
-                perihelion_distance_AU = 'Unavailable'
-
-        if perihelion_distance_AU != 'Unavailable':
-            perihelion_distance_km = perihelion_distance_AU * 149597871
-            perihelion_distance_mi = perihelion_distance_km * 0.62137119
-            perihelion_distance = {'AU': round(perihelion_distance_AU, 3), 'mi': round(perihelion_distance_mi, 3),
-                                   'km': round(perihelion_distance_km, 3)}
-        else:
-            perihelion_distance = {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
-
-        # aphelion distance
-        try:
-            aphelion_distance_AU = float(self.SBDB['orbit']['elements']['Q'].value)
-        except KeyError:
-            try:
-                aphelion_distance_AU = float(self.SBDB['orbit']['elements']['ad'].value)
-            except KeyError:
-                try:
-                    aphelion_distance_AU = float(self.NEOWS['orbital_data']['aphelion_distance'])
-                except KeyError:
-                    aphelion_distance_AU = 'Unavailable'
-
-        if aphelion_distance_AU != 'Unavailable':
-            aphelion_distance_km = aphelion_distance_AU * 149597871
-            aphelion_distance_mi = aphelion_distance_km * 0.62137119
-            aphelion_distance = {'AU': round(aphelion_distance_AU, 3), 'mi': round(aphelion_distance_mi, 3),
-                                 'km': round(aphelion_distance_km, 3)}
-        else:
-            aphelion_distance = {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
-
-        # semi-major axis (can be estimated with perihelion and aphelion distance)
-        try:
-            semi_major_axis_AU = float(self.SBDB['orbit']['elements']['a'].value)
-        except KeyError:
-            try:
-                semi_major_axis_AU = float(self.SBDB['orbit']['elements']['ad'].value)
-            except KeyError:
-                try:
-                    semi_major_axis_AU = float(self.NEOWS['orbital_data']['semi_major_axis'])
-                except KeyError:
-                    if perihelion_distance_AU and aphelion_distance_AU != 'Unavailable':
-                        semi_major_axis_AU = (perihelion_distance_AU + aphelion_distance_AU) / 2
-                    else:
-                        semi_major_axis_AU = 'Unavailable'
-
-        if semi_major_axis_AU != 'Unavailable':
-            semi_major_axis_km = semi_major_axis_AU * 149597871
-            semi_major_axis_mi = semi_major_axis_km * 0.62137119
-            semi_major_axis = {'AU': round(semi_major_axis_AU, 3), 'mi': round(semi_major_axis_mi, 3),
-                               'km': round(semi_major_axis_km, 3)}
-        else:
-            semi_major_axis = {'AU': 'Unavailable', 'mi': 'Unavailable', 'km': 'Unavailable'}
-
-        # eccentricity
-        try:
-            eccentricity = round(float(self.SBDB['orbit']['elements']['e']), 3)
-        except KeyError:
-            try:
-                eccentricity = round(float(self.NEOWS['orbital_data']['eccentricity']), 3)
-            except KeyError:
-                eccentricity = 'Unavailable'
-
-        # mean anomaly
-        try:
-            mean_anomaly_deg = float(self.SBDB['orbit']['elements']['M'].value)
-        except KeyError:
-            try:
-                mean_anomaly_deg = float(self.SBDB['orbit']['elements']['ma'].value)
-            except KeyError:
-                try:
-                    mean_anomaly_deg = float(self.NEOWS['orbital_data']['mean_anomaly'])
-                except KeyError:
-                    mean_anomaly_deg = 'Unavailable'
-
-        if mean_anomaly_deg != 'Unavailable':
-            mean_anomaly_rad = math.radians(mean_anomaly_deg)
-            mean_anomaly = {'deg': round(mean_anomaly_deg, 3), 'rad': round(mean_anomaly_rad, 3)}
+                values = [np.nan if value is None else value for value in values] if values is not None else [np.nan] * count
+                setattr(self, name, np.array(values, dtype=float))
+
+    @classmethod
+    def from_records(cls, records, spkids=None):
+        """
+        Builds a catalog from SBDBRecords (see schema.py).
+        :param spkids: The SPK-ID of each record, if known.
+        """
+        records = list(records)
+        columns = {name: [getattr(record, name) for record in records] for name in CATALOG_FIELDS if name != 'spkid'}
+        columns['spkid'] = list(spkids) if spkids is not None else None
+        return cls(columns)
+
+    @classmethod
+    def from_asteroids(cls, asteroids):
+        """Builds a catalog from Asteroid objects (None entries, e.g. from Asteroid.bulk, are skipped)."""
+        asteroids = [asteroid for asteroid in asteroids if asteroid is not None]
+        return cls.from_records([asteroid.record for asteroid in asteroids], spkids=[asteroid.SPKID for asteroid in asteroids])
+
+    @classmethod
+    def from_sbdb_query(cls, response: dict):
+        """Builds a catalog from an SBDB query API response, mapping its field names (pdes, ad, ma, per, class...) to the columns."""
+        fields = response['fields']
+        rows = response.get('data') or []
+        data = dict(zip(fields, zip(*rows))) if rows else dict.fromkeys(fields, ())
+        columns = {name: data.get(SBDB_QUERY_FIELDS.get(name, name)) for name in CATALOG_FIELDS}
+        if columns['neo'] is not None:
+            columns['neo'] = [value == 'Y' for value in columns['neo']]
+        if columns['pha'] is not None:
+            columns['pha'] = [value == 'Y' for value in columns['pha']]
+        if columns['full_name'] is not None:
+            columns['full_name'] = [name.strip() for name in columns['full_name']]
+        if columns['orbit_class'] is not None:
+            columns['orbit_class'] = [ORBIT_CLASSES.get(code, code) for code in columns['orbit_class']]
+        if columns['spkid'] is not None and columns['designation'] is not None:
+            columns['spkid'] = list(map(canonical_spkid, columns['designation'], columns['spkid']))
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.spkid)
+
+    def take(self, indices):
+        """Returns a new catalog with only the rows at some indices (or where a boolean mask is True)."""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)  # Once, instead of once per column
+        catalog = object.__new__(AsteroidCatalog)
+        for name in CATALOG_FIELDS:
+            setattr(catalog, name, getattr(self, name).take(indices))
+        return catalog
+
+    def filter(self, **conditions):
+        """
+        Returns the rows that meet every condition. A column name selects the rows equal to a value, and a column name
+        ending in _min or _max selects the rows above or below a value.
+        For example, filter(neo=True, diameter_min=0.14, q_max=1.3) returns the NEOs larger than 140 m with q under 1.3 AU.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for condition, value in conditions.items():
+            if condition.endswith('_min') and condition[:-4] in CATALOG_FIELDS:
+                mask &= getattr(self, condition[:-4]) > value
+            elif condition.endswith('_max') and condition[:-4] in CATALOG_FIELDS:
+                mask &= getattr(self, condition[:-4]) < value
+            elif condition in CATALOG_FIELDS:
+                mask &= getattr(self, condition) == value
+            else:
+                raise ValueError(f"Unknown catalog condition: {condition}")
+        return self.take(mask)
+
+    def sort(self, column: str, descending: bool = False):
+        """Returns the catalog sorted by a column; rows without a value (NaN) come last either way."""
+        values = getattr(self, column)
+        if descending:
+            order = np.argsort(-values, kind='stable') if values.dtype.kind == 'f' else np.argsort(values, kind='stable')[::-1]
         else:
-            mean_anomaly = {'deg': 'Unavailable', 'rad': 'Unavailable'}
-
-        # orbital period
+            order = np.argsort(values, kind='stable')
+        return self.take(order)
+
+    def convert(self, column: str, unit: str) -> np.ndarray:
+        """
+        Returns a column in another unit, e.g. convert('q', 'km') or convert('diameter', 'm').
+        Columns are stored in AU (a, q, Q, moid), km (diameter), days (period) and degrees (i, om, w, M).
+        """
+        stored = self.COLUMN_UNITS.get(column)
+        if stored == unit:
+            return getattr(self, column)
+        if (stored, unit) not in self.UNIT_FACTORS:
+            raise ValueError(f"Can't convert {column} from {stored} to {unit}")
+        return getattr(self, column) * self.UNIT_FACTORS[stored, unit]
+
+    def earth_moid(self, jd: float = kepler.J2000) -> np.ndarray:
+        """Computes the Earth MOID of every asteroid from its elements, in AU (see kepler.earth_moid); the moid column is SBDB's."""
+        return kepler.earth_moid(self.q, self.e, self.i, self.om, self.w, jd=jd)
+
+    def tisserand(self, planet: str = '599') -> np.ndarray:
+        """Returns the Tisserand parameter of every asteroid with respect to a planet (Jupiter by default)."""
+        return kepler.tisserand(self.a, self.e, self.i, planet=planet)
+
+    def synodic_period(self, planet: str = '399') -> np.ndarray:
+        """Returns the synodic period of every asteroid with respect to a planet (the Earth by default), in days."""
+        return kepler.synodic_period(self.a, planet=planet)
+
+    def perihelion_velocity(self) -> np.ndarray:
+        """Returns the speed of every asteroid at perihelion, in km/s."""
+        return kepler.perihelion_velocity(self.a, self.e)
+
+    def aphelion_velocity(self) -> np.ndarray:
+        """Returns the speed of every asteroid at aphelion, in km/s."""
+        return kepler.aphelion_velocity(self.a, self.e)
+
+
+def cad_windows(start: date, end: date, window_days: int):
+    """Yields the (first day, last day) of every fixed window of window_days days that overlaps the dates from start to end."""
+    first = (start - CAD_WINDOW_EPOCH).days // window_days
+    last = (end - CAD_WINDOW_EPOCH).days // window_days
+    for number in range(first, last + 1):
+        window_start = CAD_WINDOW_EPOCH + timedelta(days=number * window_days)
+        yield window_start, window_start + timedelta(days=window_days)
+
+
+def fetch_cad_window(window_start: date, window_end: date, dist_max: float) -> CloseApproachTable:
+    """Fetches every close approach within dist_max AU between two dates. Raises ConnectionError if the request fails."""
+    data = http_client.get_json(http_client.url('cad', 'cad.api'),
+                                params={'date-min': window_start.isoformat(), 'date-max': window_end.isoformat(), 'dist-max': dist_max})
+    if data is None:
+        raise ConnectionError(f"Couldn't get close approaches between {window_start} and {window_end}")
+    return CloseApproachTable(data)
+
+
+def sync_approaches(start: date, end: date, dist_max: float = 0.05, window_days: int = 30, max_workers: int = 4):
+    """
+    Syncs the close approaches between two dates into the local ApproachStore. Only the fixed windows of window_days days that
+    weren't synced before (or went stale) are fetched, concurrently. Does nothing in offline mode.
+    Raises ConnectionError if a window that was never synced can't be fetched; stale windows that fail are kept as they are.
+    """
+    if response_cache.offline:
+        return
+    missing = approach_store.missing_windows(cad_windows(start, end, window_days), dist_max)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_cad_window, *window, dist_max): window for window in missing}
         try:
-            orbital_period_days = float(self.SBDB['orbit']['elements']['period'].value)
-        except KeyError:
-            try:
-                orbital_period_days = float(self.SBDB['orbit']['elements']['per'].value)
-            except KeyError:
+            for future in as_completed(futures):
+                window = futures.pop(future)
                 try:
-                    orbital_period_days = float(self.NEOWS['orbital_data']['orbital_period'])
-                except KeyError:
-                    orbital_period_days = 'Unavailable'
+                    approach_store.store_window(*window, dist_max, future.result().store_rows())
+                except ConnectionError:
+                    if not approach_store.has_window(*window, dist_max):
+                        raise
+        finally:
+            for future in futures:
+                future.cancel()
 
-        if orbital_period_days != 'Unavailable':
-            orbital_period_hours = orbital_period_days * 24
-            orbital_period = {'hrs': round(orbital_period_hours, 3), 'days': round(orbital_period_days, 3)}
-        else:
-            orbital_period = {'hrs': 'Unavailable', 'days': 'Unavailable'}
 
-        # orbit class
-        try:
-            orbit_class = self.SBDB['object']['orbit_class']['name']
-            if orbit_class == 'Aten':
-                orbit_class = 'Near Earth Object'
-        except KeyError:
-            orbit_class = 'Unavailable'
+def search_by_date(start_date, end_date, dist_max: float = 0.05, window_days: int = 30, max_workers: int = 4):
+    """
+    Searches for asteroids that have a close approach to Earth in a provided date range. Approaches are answered from the local
+    ApproachStore, after syncing the parts of the range it doesn't have yet (see sync_approaches), so repeated searches don't
+    use the network and searches work offline for ranges that were synced before.
+    :param start_date: The start date, in YYYY-MM-DD.
+    :param end_date: The end date (included), in YYYY-MM-DD.
+    :param dist_max: The largest approach distance in AU.
+    :param window_days: The number of days fetched per request.
+    :param max_workers: The maximum number of windows fetched at the same time.
+    :return: A generator of CloseApproach records in chronological order (pass it to CloseApproachList to index them).
+    Raises ConnectionError if part of the range was never synced and can't be fetched.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date() + timedelta(days=1)
+    if end <= start:
+        return
+    sync_approaches(start, end - timedelta(days=1), dist_max=dist_max, window_days=window_days, max_workers=max_workers)
+    for row in approach_store.approaches(start.isoformat(), end.isoformat(), dist_max):
+        yield CloseApproach.from_store(row)
 
-        try:
-            orbit_ID = self.SBDB['object']['orbit_id']
-        except KeyError:
-            try:
-                orbit_ID = self.NEOWS['orbital_data']['orbit_id']
-            except KeyError:
-                orbit_ID = 'Unavailable'
 
-        # return statement
-        return {'perihelion distance': perihelion_distance, 'aphelion distance': aphelion_distance,
-                'semi-major axis': semi_major_axis, 'eccentricity': eccentricity, 'mean anomaly': mean_anomaly,
-                'orbital period': orbital_period, 'orbit class': orbit_class, 'orbit id': orbit_ID}
+def build_resolver_index(neo_only: bool = True) -> int:
+    """
+    Fills the resolver index from the SBDB query API in one request, so every asteroid in it is resolved without the network.
+    :param neo_only: If True, only near-Earth asteroids are fetched (about 35,000); otherwise every asteroid (over a million).
+    :return: The number of asteroids stored. Raises ConnectionError if the request fails.
+    """
+    params = {'fields': 'spkid,full_name,pdes,neo', 'sb-kind': 'a'}
+    if neo_only:
+        params['sb-group'] = 'neo'
+    data = http_client.get_json(http_client.url('sbdb', 'sbdb_query.api'), params=params)
+    if data is None:
+        raise ConnectionError("Couldn't get the asteroid list from the SBDB query API")
+    return resolver_index.add_sbdb_query(data)
 
 
-def search_by_date(start_date, end_date):
+def fetch_catalog(neo_only: bool = True) -> AsteroidCatalog:
     """
-    Searches for asteroids that have a close approach to Earth in a provided date range.
-    :param start_date: The start date, in YYYY-MM-DD.
-    :param end_date: The end date, in YYYY-MM-DD.
-    :return: A dictionary containing IDs and approach info of each asteroid mentioned.
+    Fetches an AsteroidCatalog from the SBDB query API in one request, and adds every asteroid in it to the resolver index.
+    :param neo_only: If True, only near-Earth asteroids are fetched (about 35,000); otherwise every asteroid (over a million).
+    Raises ConnectionError if the request fails.
     """
-    start_date = datetime.strptime(start_date, "%Y-%m-%d").date().strftime("%Y-%m-%d")
-    end_date = datetime.strptime(end_date, "%Y-%m-%d").date().strftime("%Y-%m-%d")
-    timedelta = (datetime.strptime(end_date, "%Y-%m-%d").date() - datetime.strptime(start_date, "%Y-%m-%d").date()).days
-    if 60 > timedelta >= 0:
-        url = f"https://ssd-api.jpl.nasa.gov/cad.api?date-min={start_date}&date-max={end_date}&dist-max=0.5"
-    elif 90 > timedelta >= 60:
-        url = f"https://ssd-api.jpl.nasa.gov/cad.api?date-min={start_date}&date-max={end_date}&dist-max=0.25"
-    elif 120 > timedelta >= 90:
-        url = f"https://ssd-api.jpl.nasa.gov/cad.api?date-min={start_date}&date-max={end_date}&dist-max=0.1"
-    elif 200 > timedelta > 120:
-        url = f"https://ssd-api.jpl.nasa.gov/cad.api?date-min={start_date}&date-max={end_date}&dist-max=0.05"
-    else:
-        url = f"https://ssd-api.jpl.nasa.gov/cad.api?date-min={start_date}&date-max={end_date}&dist-max=0.025"
-    main_response = requests.get(url)
-    if main_response.status_code == 200:
-        data = main_response.json()
-        approaches = dict()
-        for approach_data in data['data']:
-            approaches[approach_data[3]] = {'designation': approach_data[0], 'distance': {'au': round(float(approach_data[4]), 3), 'km': round(float(approach_data[4]) * 1.460e+8, 3),
-                                                                                          'mi': round(float(approach_data[4]) * 9.2956e+07, 3)}, 'velocity': {'km/s': round(float(approach_data[
-                                                                                                                                                                                      7]), 3),
-                                                                                                                                                              'mi/s': round(
-                                                                                                                                                                  float(approach_data[7]) * 0.621371192,
-                                                                                                                                                                  3)}}
-        return approaches
-    else:
-        return None
+    fields = [SBDB_QUERY_FIELDS.get(name, name) for name in CATALOG_FIELDS]
+    params = {'fields': ','.join(fields), 'sb-kind': 'a'}
+    if neo_only:
+        params['sb-group'] = 'neo'
+    data = http_client.get_json(http_client.url('sbdb', 'sbdb_query.api'), params=params)
+    if data is None:
+        raise ConnectionError("Couldn't get the asteroid catalog from the SBDB query API")
+    resolver_index.add_sbdb_query(data)
+    return AsteroidCatalog.from_sbdb_query(data)
@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import DEFAULT_BASE_URLS, config
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float, burst: int = 1, parent: 'RateLimiter | None' = None):
+        """
+        A thread-safe token bucket that spaces out requests.
+        :param requests_per_second: The average number of requests allowed per second. None disables the limit.
+        :param burst: The number of requests that can be made back-to-back before the limit kicks in.
+        :param parent: An optional limiter that is also waited on and told the server's remaining quota, so a stricter limit
+        for some requests can be added without changing the one shared by all of them.
+        """
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.parent = parent
+        self.remaining = None  # The number of requests the server last said were left (X-RateLimit-Remaining)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request is allowed (by the parent too, if there is one)."""
+        self._acquire()
+        if self.parent is not None:
+            self.parent.acquire()
+
+    def _acquire(self):
+        while self.requests_per_second:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.requests_per_second)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.requests_per_second
+            time.sleep(wait)
+
+    def update(self, remaining: int):
+        """Records the server's X-RateLimit-Remaining; the bucket never holds more tokens than the server has left."""
+        with self._lock:
+            self.remaining = remaining
+            self._tokens = min(self._tokens, max(remaining, 0))
+        if self.parent is not None:
+            self.parent.update(remaining)
+
+
+class HttpClient:
+    def __init__(self, base_urls: dict | None = None, connect_timeout: float = 5, read_timeout: float = 30, max_retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 30, pool_size: int = 16):
+        """
+        A pooled HTTP client shared by every NASA/JPL API call, so connections are kept alive and reused.
+        Requests time out instead of hanging, and 429 and 5xx responses (and dropped connections) are retried with exponential backoff.
+        :param base_urls: The base URL of each API (see DEFAULT_BASE_URLS), merged over the defaults.
+        :param connect_timeout: Seconds to wait for a connection.
+        :param read_timeout: Seconds to wait for a response once connected.
+        :param max_retries: The number of times a failed request is retried before giving up.
+        :param backoff: The wait in seconds before the first retry; it doubles with every retry.
+        :param max_backoff: The longest wait between retries, in seconds.
+        :param pool_size: The number of connections kept open per host (should be at least the number of threads making requests).
+        """
+        self.base_urls = dict(DEFAULT_BASE_URLS, **(base_urls or {}))
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def url(self, api: str, path: str) -> str:
+        """Builds the URL of an endpoint, e.g. url('cad', 'cad.api')."""
+        return f"{self.base_urls[api].rstrip('/')}/{path.lstrip('/')}"
+
+    def _wait(self, attempt: int, response=None) -> float:
+        """Returns how long to wait before a retry: the server's Retry-After if it sent one, otherwise exponential backoff with jitter."""
+        try:
+            return min(float(response.headers['Retry-After']), self.max_backoff)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1)
+
+    def get(self, url: str, params=None, limiter: RateLimiter | None = None):
+        """
+        Performs a GET request, retrying on 429, 5xx, timeouts and connection errors.
+        :param url: The URL of the request.
+        :param params: The query parameters of the request.
+        :param limiter: An optional RateLimiter that is waited on before every attempt, and told the server's remaining quota.
+        :return: The last response, or None if the server couldn't be reached.
+        """
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                response = None
+            else:
+                remaining = response.headers.get('X-RateLimit-Remaining')
+                if limiter is not None and remaining is not None and remaining.isdigit():
+                    limiter.update(int(remaining))
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+            if attempt < self.max_retries:
+                time.sleep(self._wait(attempt, response))
+        return response
+
+    def get_json(self, url: str, params=None, limiter: RateLimiter | None = None):
+        """Performs a GET request (see get) and returns the decoded JSON, or None if it failed."""
+        response = self.get(url, params=params, limiter=limiter)
+        if response is None or response.status_code != 200:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+
+# Shared by every module so connections are reused
+http_client = HttpClient(base_urls=config.base_urls, connect_timeout=config.connect_timeout, read_timeout=config.read_timeout,
+                         max_retries=config.max_retries)
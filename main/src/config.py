@@ -0,0 +1,62 @@
+from os import cpu_count, environ, path
+
+from dotenv import dotenv_values, find_dotenv
+
+from approaches import DEFAULT_APPROACH_DB_PATH
+from cache import DEFAULT_CACHE_PATH
+from resolver import DEFAULT_RESOLVER_PATH
+
+# Where each API lives; point these at a local server to test without the network
+DEFAULT_BASE_URLS = {
+    'neows': "https://api.nasa.gov/neo/rest/v1",
+    'cad': "https://ssd-api.jpl.nasa.gov",
+    'sbdb': "https://ssd-api.jpl.nasa.gov",
+}
+
+
+def find_key_file() -> str:
+    """Returns the path of priv_api_key.env, or api_key.env if there is no private one, or '' if neither exists."""
+    return find_dotenv('priv_api_key.env') or find_dotenv('api_key.env')
+
+
+def _number(name: str, default, kind=float):
+    """Reads a number from an environment variable, falling back to a default if it's missing or invalid."""
+    try:
+        return kind(environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+class Config:
+    def __init__(self):
+        """
+        Settings for every module, resolved once when the program starts. Each can be overridden with an environment variable:
+        ASTROINFO_API_KEY (or api_key), ASTROINFO_NEOWS_URL, ASTROINFO_CAD_URL, ASTROINFO_SBDB_URL, ASTROINFO_CACHE_PATH,
+        ASTROINFO_APPROACH_DB, ASTROINFO_RESOLVER_DB, ASTROINFO_OFFLINE, ASTROINFO_NASA_RPS, ASTROINFO_NASA_BURST,
+        ASTROINFO_CONNECT_TIMEOUT, ASTROINFO_READ_TIMEOUT, ASTROINFO_MAX_RETRIES, ASTROINFO_WORKERS and
+        ASTROINFO_PARALLEL_MIN_BODIES.
+        """
+        self.key_file = find_key_file()
+        file_values = dotenv_values(self.key_file) if self.key_file else dict()
+        # The NASA API key: environment variables win over the key file
+        self.api_key = environ.get('ASTROINFO_API_KEY') or environ.get('api_key') or file_values.get('api_key')
+        if not self.api_key:
+            print("No api_key.env file found; please visit https://github.com/chengezahmad/ASTROINFO to see where to replace it")
+            self.api_key = 'DEMO_KEY'
+        self.base_urls = {api: environ.get(f'ASTROINFO_{api.upper()}_URL', url) for api, url in DEFAULT_BASE_URLS.items()}
+        self.cache_path = path.expanduser(environ.get('ASTROINFO_CACHE_PATH', DEFAULT_CACHE_PATH))
+        self.approach_db_path = path.expanduser(environ.get('ASTROINFO_APPROACH_DB', DEFAULT_APPROACH_DB_PATH))
+        self.resolver_db_path = path.expanduser(environ.get('ASTROINFO_RESOLVER_DB', DEFAULT_RESOLVER_PATH))
+        self.offline = environ.get('ASTROINFO_OFFLINE', '').lower() in ('1', 'true', 'yes')
+        # Requests made with the API key aren't spaced out unless a rate is set
+        self.nasa_requests_per_second = _number('ASTROINFO_NASA_RPS', None)
+        self.nasa_burst = _number('ASTROINFO_NASA_BURST', 10, int)
+        self.connect_timeout = _number('ASTROINFO_CONNECT_TIMEOUT', 5)
+        self.read_timeout = _number('ASTROINFO_READ_TIMEOUT', 30)
+        self.max_retries = _number('ASTROINFO_MAX_RETRIES', 4, int)
+        # Simulations with at least parallel_min_bodies bodies are propagated on this many processes (1 turns it off)
+        self.workers = _number('ASTROINFO_WORKERS', cpu_count() or 1, int)
+        self.parallel_min_bodies = _number('ASTROINFO_PARALLEL_MIN_BODIES', 10_000, int)
+
+
+config = Config()  # Resolved once at import; nothing is read from disk when asteroids are created
@@ -0,0 +1,430 @@
+import threading
+from datetime import datetime, timedelta
+
+import astropy.units as u
+import numpy as np
+import requests
+from astropy.time import Time
+from astroquery.jplhorizons import Horizons
+
+from classes import Asteroid, AsteroidCatalog, resolver_index
+from config import config
+from ephemeris import EphemerisCache
+from kepler import KeplerPropagator, julian_date
+from nbody import NBodyIntegrator
+from parallel import ParallelPropagator
+
+# The bodies every simulation starts with (the inner solar system + Jupiter)
+DEFAULT_BODIES = [
+    dict(horizons_id='10', color='orange', name='Sun', radius_km=695700),  # The sun
+    dict(horizons_id='199', radius_km=2440, color='grey', name='Mercury'),  # Mercury
+    dict(horizons_id='299', radius_km=6052, color='orange', name='Venus'),  # Venus
+    dict(horizons_id='399', radius_km=6378, color='blue', name='Earth'),  # Earth
+    dict(horizons_id='301', radius_km=1737.5, color='silver', name='Moon'),  # The moon
+    dict(horizons_id='499', radius_km=2110.29, color='red', name='Mars'),  # Mars
+    dict(horizons_id='599', radius_km=69911, color='navajowhite', name='Jupiter'),  # Jupiter
+]
+
+
+# Create a coords function to get heliocentric coordinates of an object
+def coords(horizons_id, time, id_type=None):
+    """
+    Returns the heliocentric coordinates of an object from JPL Horizons.
+    :param time: The time of the calculation in YYYY-MM-DD HH:MM:SS
+    :param horizons_id: The Horizons ID of the object in question.
+    :param id_type: Optional id-type for JPL Horizons.
+    :return: Tuple (X, Y) coordinates in AU.
+    """
+    result = Horizons(id=horizons_id, location='500@10', epochs=Time(time).tdb.jd, id_type=id_type).vectors(refplane='ecliptic')
+    x_coord, y_coord = result['x'].quantity.to(u.AU).value[0], result['y'].quantity.to(u.AU).value[0]
+    return float(x_coord), float(y_coord)
+
+
+def short_name(asteroid: Asteroid) -> str:
+    """Returns the name JPL Horizons knows an asteroid by (e.g. APOPHIS for '99942 Apophis (2004 MN4)')."""
+    # Assume the asteroid has a nickname (e.g. 4 VESTA, or 99942 APOPHIS)
+    full_name = asteroid.identifiers['full name']
+    first_space_index = full_name.index(' ')
+    if int(asteroid.identifiers['SPKID']) <= 4_000_000:
+        try:
+            second_space_index = full_name.index(' ', first_space_index + 1)
+            full_name.index(' ', second_space_index + 1)
+        except ValueError:
+            second_space_index = None
+        if second_space_index is not None:
+            return full_name[first_space_index + 1:second_space_index]
+        return full_name[:first_space_index]
+    return full_name
+
+
+class SimulationEngine:
+    def __init__(self, time: None | str = None, use_horizons: bool = False, use_nbody: bool = False, workers: int | None = None):
+        """
+        The state of an orbital simulation, independent of any user interface: the time, the bodies and their positions.
+        Views subscribe to it to be told when bodies are added or removed, or when they move.
+        :param time: The time of the simulation at the start, in YYYY-MM-DD HH:MM:SS. If nothing (or an invalid string) is
+        entered, it becomes the current date and time.
+        :param use_horizons: If True, every position comes from JPL Horizons (accurate, but needs the network). Horizons
+        vectors are prefetched for a range of dates and interpolated, so stepping only queries Horizons near the edge of that
+        range. Otherwise, positions are computed locally from orbital elements, and only bodies without known elements use Horizons.
+        :param use_nbody: If True (and use_horizons is False), bodies with known elements are integrated together under the
+        gravity of the Sun and planets (see nbody.py), starting from their two-body states at the simulation's time, so
+        asteroids feel the planets they pass. Long jumps in time take a moment, since every step in between is integrated.
+        :param workers: The number of processes bodies are propagated on once there are at least config.parallel_min_bodies
+        of them (see parallel.py). If None, config.workers (one per CPU core by default); 1 keeps everything in this process.
+        """
+        try:
+            self.time = datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            self.time = datetime.now().replace(microsecond=0)
+        self.use_horizons = use_horizons
+        self.use_nbody = use_nbody
+        self.propagator = KeplerPropagator()  # Computes positions for bodies with known orbital elements
+        self.ephemeris = EphemerisCache()  # Prefetched Horizons vectors, used when use_horizons is True
+        self.integrator = None  # Seeded from the propagator the first time positions are computed, when use_nbody is True
+        workers = config.workers if workers is None else workers
+        self.parallel = ParallelPropagator(workers) if workers > 1 else None  # Its processes only start once they're needed
+        self.ids = list()  # Horizons IDs, in the order of the rows of self.positions
+        self.bodies = dict()  # Horizons ID -> the body's arguments (name, color, radius_km, id_type, elements)
+        self.positions = np.empty((0, 2))  # (X, Y) of every body in AU
+        self._rows = None  # Which rows of self.positions the propagator (or integrator) computes, and their rows in it
+        self._paths = None  # The orbit paths of the propagator's bodies and the arrays they were computed from
+        self._lock = threading.RLock()  # Held while the bodies change, so positions can be computed on another thread
+        self._propagation_lock = threading.Lock()  # Held while the integrator (or the processes' shared memory) is changed in place
+        self._subscribers = list()
+
+    @property
+    def time_string(self) -> str:
+        """The current time in YYYY-MM-DD HH:MM:SS."""
+        return self.time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def subscribe(self, callback):
+        """
+        Registers a function that is called whenever the simulation changes.
+        :param callback: A function taking the engine, the event ('added', 'removed' or 'moved') and the affected Horizons IDs.
+        """
+        self._subscribers.append(callback)
+
+    def _notify(self, event: str, ids):
+        for callback in self._subscribers:
+            callback(self, event, ids)
+
+    def position(self, horizons_id) -> tuple[float, float]:
+        """Returns the (X, Y) coordinates of a body in AU."""
+        x, y = self.positions[self.ids.index(str(horizons_id))]
+        return float(x), float(y)
+
+    def _horizons_positions(self, id_types: dict, time: datetime) -> dict:
+        """
+        Returns the (X, Y) coordinates of bodies from JPL Horizons; bodies Horizons doesn't know are left out, as are the
+        remaining ones if Horizons can't be reached.
+        :param id_types: A dictionary of Horizons ID to id-type.
+        :param time: The time of the positions.
+        """
+        if self.use_horizons:
+            positions = self.ephemeris.positions(id_types.items(), Time(time).tdb.jd)
+        else:
+            positions = dict()
+        for horizons_id, id_type in id_types.items():
+            if horizons_id not in positions:
+                try:
+                    positions[horizons_id] = coords(horizons_id, id_type=id_type, time=time.strftime("%Y-%m-%d %H:%M:%S"))
+                except ValueError:  # Horizons doesn't know the object
+                    pass
+                except (requests.ConnectionError, requests.Timeout):  # Horizons can't be reached, so don't wait on it for every body
+                    break
+        return positions
+
+    def add_bodies(self, bodies):
+        """
+        Adds many bodies at once, computing their positions together. Bodies that are already in the simulation are skipped.
+        :param bodies: An iterable of dictionaries with horizons_id, name, color and radius_km, and optionally id_type and
+        elements (the orbit section of the body's SBDB payload, used to compute its position locally).
+        :return: A list of the dictionaries of the bodies that couldn't be added because Horizons doesn't know them.
+        """
+        return self.place_bodies(*self.locate_bodies([body for body in bodies if str(body['horizons_id']) not in self.bodies]))
+
+    def locate_bodies(self, bodies, time: datetime | None = None):
+        """
+        Computes the positions of bodies without changing the simulation, so it can run on a worker thread (bodies without
+        usable elements, or every body if use_horizons is True, are looked up on Horizons).
+        :param bodies: An iterable of body dictionaries, as for add_bodies.
+        :param time: The time of the positions, if not the simulation's current time.
+        :return: A tuple of (time, bodies, positions) to pass to place_bodies; bodies Horizons doesn't know have no position.
+        """
+        with self._lock:
+            time = self.time if time is None else time
+        new_bodies = dict()
+        for body in bodies:
+            new_bodies.setdefault(str(body['horizons_id']), body)
+        positions = dict()
+        if not self.use_horizons:
+            propagator = KeplerPropagator()  # Only the new bodies, so the simulation's propagator isn't touched
+            for horizons_id, body in new_bodies.items():
+                if body.get('elements') is not None:
+                    propagator.add_sbdb(horizons_id, body['elements'])
+                else:
+                    propagator.add_planet(horizons_id)
+            if len(propagator):
+                all_positions = propagator.positions(julian_date(time))[:, :2].tolist()
+                positions = {body_id: tuple(position) for body_id, position in zip(propagator.ids, all_positions) if body_id in new_bodies}
+        positions.update(self._horizons_positions({horizons_id: body.get('id_type') for horizons_id, body in new_bodies.items()
+                                                   if horizons_id not in positions}, time))
+        return time, list(new_bodies.values()), positions
+
+    def place_bodies(self, time: datetime, bodies, positions):
+        """
+        Adds bodies located by locate_bodies. Bodies that are already in the simulation are skipped. If the simulation moved
+        since they were located, the ones with known elements are moved to its current time; the others catch up with the
+        next update.
+        :return: A list of the dictionaries of the bodies that couldn't be added because Horizons doesn't know them.
+        """
+        new_bodies, failed = dict(), list()
+        for body in bodies:
+            horizons_id = str(body['horizons_id'])
+            if horizons_id in self.bodies or horizons_id in new_bodies:
+                continue
+            if horizons_id in positions:
+                new_bodies[horizons_id] = body
+            else:
+                failed.append(body)
+        if not new_bodies:
+            return failed
+        with self._lock:
+            self.bodies.update(new_bodies)
+            if not self.use_horizons:
+                for horizons_id, body in new_bodies.items():
+                    if body.get('elements') is not None:
+                        self.propagator.add_sbdb(horizons_id, body['elements'])
+                    else:
+                        self.propagator.add_planet(horizons_id)
+            if self.integrator is not None:  # Join the integration at its current time
+                seeded = [horizons_id for horizons_id in new_bodies if horizons_id in self.propagator and horizons_id not in self.integrator]
+                propagator_rows = {body_id: row for row, body_id in enumerate(self.propagator.ids)}
+                rows = [propagator_rows[horizons_id] for horizons_id in seeded]
+                with self._propagation_lock:
+                    states = self.propagator.states(self.integrator.jd)
+                    self.integrator.add(seeded, states[0][rows], states[1][rows], self.integrator.jd)
+            added = list(new_bodies)
+            located = np.array([positions[horizons_id] for horizons_id in added], dtype=float).reshape(-1, 2)
+            if time != self.time and not self.use_horizons:
+                propagator_rows = {body_id: row for row, body_id in enumerate(self.propagator.ids)}
+                local = [(row, propagator_rows[horizons_id]) for row, horizons_id in enumerate(added) if horizons_id in propagator_rows]
+                if local:
+                    rows, source_rows = np.array(local).T
+                    located[rows] = self.propagator.positions(julian_date(self.time))[source_rows, :2]
+            self._rows = None
+            self.ids.extend(added)
+            self.positions = np.vstack([self.positions, located])
+        self._notify('added', added)
+        return failed
+
+    def add_defaults(self):
+        """Adds the default bodies (the inner solar system + Jupiter)."""
+        self.add_bodies(DEFAULT_BODIES)
+
+    @staticmethod
+    def lookup_asteroids(identifiers, color: str = 'grey'):
+        """
+        Looks up asteroids concurrently without changing any simulation, so it can run on a worker thread.
+        :param identifiers: An iterable of asteroid identifiers.
+        :param color: The color of the asteroids.
+        :return: A tuple of the bodies to pass to add_asteroid_bodies and a list of the identifiers that couldn't be found.
+        """
+        invalid, bodies = list(), list()
+        # Asteroids are created lazily: only their identifiers and orbits are needed, so physical parameters and NeoWs aren't fetched
+        for identifier, asteroid in Asteroid.bulk(identifiers, lazy=True):
+            try:
+                if asteroid is None:
+                    invalid.append(identifier)
+                    continue
+                diameter = asteroid.record.diameter  # Only there if the physical parameters were cached
+                radius_km = diameter / 2 if diameter is not None else 1  # 1 km is average
+                bodies.append(dict(horizons_id=short_name(asteroid), color=color, name=asteroid.identifiers['full name'], radius_km=float(radius_km),
+                                   id_type='smallbody', elements=asteroid.SBDB.get('orbit'), spkid=asteroid.identifiers['SPKID'], identifier=identifier))
+            except (AttributeError, KeyError, ValueError):
+                invalid.append(identifier)
+        return bodies, invalid
+
+    @staticmethod
+    def unresolved_identifiers(identifiers) -> list:
+        """
+        Returns the identifiers the local resolver index doesn't know, without using the network. They may still exist in
+        SBDB (lookup_asteroids will tell), but known ones are certain to be found.
+        """
+        return [identifier for identifier, known in resolver_index.resolve_many(identifiers).items() if known is None]
+
+    def locate_asteroid_bodies(self, bodies):
+        """
+        Locates asteroids found by lookup_asteroids like locate_bodies, so it can run on a worker thread. Horizons is asked for
+        each one by name, then by SPK-ID.
+        :return: A tuple of (time, bodies, positions) to pass to place_bodies.
+        """
+        time, located, positions = self.locate_bodies(bodies)
+        missing = [dict(body, horizons_id=body['spkid']) for body in located if str(body['horizons_id']) not in positions]
+        if missing:
+            _, retried, retried_positions = self.locate_bodies(missing, time)
+            located = [body for body in located if str(body['horizons_id']) in positions] + retried
+            positions.update(retried_positions)
+        return time, located, positions
+
+    def add_asteroid_bodies(self, bodies):
+        """
+        Adds asteroids found by lookup_asteroids. Horizons is asked for each one by name, then by SPK-ID.
+        :return: A list of the identifiers of the asteroids that couldn't be added.
+        """
+        return [body['identifier'] for body in self.place_bodies(*self.locate_asteroid_bodies(bodies))]
+
+    def add_asteroids(self, identifiers, color: str = 'grey'):
+        """
+        Looks up asteroids concurrently and adds them. Horizons is asked for each one by name, then by SPK-ID.
+        :param identifiers: An iterable of asteroid identifiers.
+        :param color: The color of the asteroids.
+        :return: A list of the identifiers that couldn't be added.
+        """
+        bodies, invalid = self.lookup_asteroids(identifiers, color=color)
+        return invalid + self.add_asteroid_bodies(bodies)
+
+    def add_catalog(self, catalog: AsteroidCatalog, color: str = 'grey') -> int:
+        """
+        Adds every asteroid of an AsteroidCatalog (e.g. the ~35k known NEOs from fetch_catalog()) from its elements, without
+        looking any of them up. Asteroids without complete elliptical elements are left out, since they would each need Horizons
+        (as would every asteroid if use_horizons is True, so that is best avoided here).
+        :param catalog: The asteroids; their SPK-IDs become their Horizons IDs.
+        :param color: The color of the asteroids.
+        :return: The number of asteroids that were in the catalog and are in the simulation now.
+        """
+        complete = np.all([np.isfinite(column) for column in (catalog.a, catalog.e, catalog.i, catalog.om, catalog.w,
+                                                               catalog.M, catalog.epoch)], axis=0) & (catalog.e < 1)
+        catalog = catalog.take(complete)
+        names = np.where(catalog.full_name != '', catalog.full_name, catalog.designation).tolist()
+        radii = np.where(np.isfinite(catalog.diameter), catalog.diameter / 2, 1).tolist()  # 1 km is average
+        columns = zip(catalog.spkid.tolist(), names, radii, catalog.epoch.tolist(), catalog.a.tolist(), catalog.e.tolist(),
+                      catalog.i.tolist(), catalog.om.tolist(), catalog.w.tolist(), catalog.M.tolist())
+        self.add_bodies(dict(horizons_id=spkid, color=color, name=name, radius_km=radius_km, id_type='smallbody',
+                             elements=dict(epoch=epoch, elements=dict(a=a, e=e, i=i, om=om, w=w, ma=ma)))
+                        for spkid, name, radius_km, epoch, a, e, i, om, w, ma in columns)
+        return len(catalog)
+
+    def remove_body(self, horizons_id):
+        """Removes a body from the simulation, if it's in it."""
+        horizons_id = str(horizons_id)
+        if horizons_id not in self.bodies:
+            return
+        with self._lock:
+            index = self.ids.index(horizons_id)
+            del self.bodies[horizons_id]
+            del self.ids[index]
+            self.positions = np.delete(self.positions, index, axis=0)
+            self.propagator.remove(horizons_id)
+            self.integrator = None  # Reseeded without the body (and anything orbiting it) on the next update
+            self._rows = None
+        self._notify('removed', [horizons_id])
+
+    def clear(self):
+        """Removes every body from the simulation."""
+        with self._lock:
+            removed = self.ids
+            self.ids, self.bodies, self.positions = list(), dict(), np.empty((0, 2))
+            self.propagator = KeplerPropagator()
+            self.integrator = None
+            self._rows = None
+        if removed:
+            self._notify('removed', removed)
+
+    def orbit_paths(self, samples: int = 181, ids=None):
+        """
+        Returns the orbits of the bodies with known elements that go around the Sun (not the Sun itself or the Moon), as
+        closed polylines. They are computed once for every body at the same time and reused until bodies are added or removed.
+        :param samples: The number of points of each orbit.
+        :param ids: The Horizons IDs of the bodies whose orbits are wanted, if not all of them.
+        :return: A list of the bodies' Horizons IDs and an (N, samples, 2) array of the (X, Y) points of their orbits in AU.
+        """
+        with self._lock:
+            arrays = self.propagator.arrays()
+            key = (samples, None if ids is None else tuple(ids))
+            if self._paths is None or self._paths[0] is not arrays or self._paths[1] != key:
+                elements, _, parents = arrays
+                wanted = None if ids is None else set(map(str, ids))
+                rows = [row for row, horizons_id in enumerate(self.propagator.ids) if parents[row] < 0 and elements[row, 0] > 0
+                        and (wanted is None or horizons_id in wanted)]
+                paths = self.propagator.orbit_paths(julian_date(self.time), samples, rows=rows)[:, :, :2]
+                self._paths = (arrays, key, [self.propagator.ids[row] for row in rows], paths)
+            return list(self._paths[2]), self._paths[3]
+
+    def close(self):
+        """Stops the processes bodies are propagated on, if any were started. They are started again if needed."""
+        if self.parallel is not None:
+            self.parallel.close()
+
+    def positions_at(self, time: datetime):
+        """
+        Computes every body's position at a time without changing the simulation, so it can run on a worker thread.
+        Bodies whose position can't be found keep their current one.
+        :return: A tuple of (time, ids, positions) to pass to apply_positions.
+        """
+        source = None
+        with self._lock:  # Only the bodies are copied here; the Tk thread applies positions while they're propagated
+            ids = list(self.ids)
+            positions = self.positions.copy()
+            remaining = ids
+            if not self.use_horizons and len(self.propagator):
+                if self.use_nbody:
+                    if self.integrator is None:
+                        self.integrator = NBodyIntegrator.from_propagator(self.propagator, julian_date(self.time))
+                        self._rows = None
+                    source, arrays = self.integrator, None
+                else:
+                    source, arrays = self.propagator, self.propagator.arrays()
+                if self._rows is None:
+                    source_rows = {body_id: row for row, body_id in enumerate(source.ids)}
+                    rows = [(row, source_rows[horizons_id]) for row, horizons_id in enumerate(ids) if horizons_id in source_rows]
+                    self._rows = np.array(rows, dtype=int).reshape(-1, 2).T
+                rows = self._rows
+                remaining = [horizons_id for horizons_id in ids if horizons_id not in source]
+            id_types = {horizons_id: self.bodies[horizons_id].get('id_type') for horizons_id in remaining}
+        if source is not None:
+            jd = julian_date(time)
+            parallel = self.parallel is not None and len(source) >= config.parallel_min_bodies
+            with self._propagation_lock:
+                if arrays is None:  # Bodies added to the integrator meanwhile get rows after the ones used here
+                    if parallel:
+                        self.parallel.integrate(source, jd)
+                        source_positions = source.positions()
+                    else:
+                        source_positions = source.positions(jd)
+                elif parallel:
+                    source_positions = self.parallel.positions(source, jd, arrays=arrays)
+                else:
+                    source_positions = source.positions(jd, arrays=arrays)
+            positions[rows[0]] = source_positions[rows[1], :2]
+        if id_types:  # Horizons is slow, so it's queried without holding the lock
+            rows = {horizons_id: row for row, horizons_id in enumerate(ids)}
+            for horizons_id, position in self._horizons_positions(id_types, time).items():
+                positions[rows[horizons_id]] = position
+        return time, ids, positions
+
+    def apply_positions(self, time: datetime, ids, positions):
+        """Moves the simulation to a time with positions computed by positions_at. Bodies added since then keep their position."""
+        with self._lock:
+            self.time = time
+            if ids == self.ids:
+                self.positions = positions
+            else:
+                rows = {horizons_id: row for row, horizons_id in enumerate(ids)}
+                for index, horizons_id in enumerate(self.ids):
+                    if horizons_id in rows:
+                        self.positions[index] = positions[rows[horizons_id]]
+        self._notify('moved', self.ids)
+
+    def update(self):
+        """Recomputes every body's position at the current time."""
+        self.apply_positions(*self.positions_at(self.time))
+
+    def step(self, hours: float):
+        """Moves time forward (or backward, if hours is negative) and updates the positions."""
+        self.set_time(self.time + timedelta(hours=hours))
+
+    def set_time(self, time: str | datetime):
+        """Sets the time (a datetime or a string in YYYY-MM-DD HH:MM:SS) and updates the positions."""
+        self.apply_positions(*self.positions_at(datetime.strptime(time, "%Y-%m-%d %H:%M:%S") if isinstance(time, str) else time))
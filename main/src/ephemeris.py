@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import astropy.units as u
+import numpy as np
+from astropy.time import Time
+from astroquery.jplhorizons import Horizons
+
+
+class EphemerisWindow:
+    def __init__(self, horizons_id: str, start_jd: float, stop_jd: float, step_hours: float = 6, id_type=None):
+        """
+        Heliocentric state vectors of one body over a range of epochs, fetched from JPL Horizons in a single query.
+        Positions between samples are interpolated with cubic Hermite splines using the returned velocities.
+        :param horizons_id: The Horizons ID of the body.
+        :param start_jd: The first epoch of the window (Julian date, TDB).
+        :param stop_jd: The last epoch of the window (Julian date, TDB).
+        :param step_hours: The time between samples in hours.
+        :param id_type: Optional id-type for JPL Horizons.
+        """
+        epochs = {'start': Time(start_jd, format='jd', scale='tdb').iso[:16], 'stop': Time(stop_jd, format='jd', scale='tdb').iso[:16],
+                  'step': f'{max(1, round(step_hours))}h'}
+        result = Horizons(id=horizons_id, location='500@10', epochs=epochs, id_type=id_type).vectors(refplane='ecliptic')
+        self.horizons_id = horizons_id
+        self.jd = np.asarray(result['datetime_jd'], dtype=float)
+        self.positions = np.column_stack([result['x'].quantity.to(u.AU).value, result['y'].quantity.to(u.AU).value])
+        self.velocities = np.column_stack([result['vx'].quantity.to(u.AU / u.d).value, result['vy'].quantity.to(u.AU / u.d).value])
+
+    @property
+    def start(self):
+        return self.jd[0]
+
+    @property
+    def stop(self):
+        return self.jd[-1]
+
+    def covers(self, jd: float) -> bool:
+        """Returns True if the window can interpolate the position at a Julian date."""
+        return self.start <= jd <= self.stop
+
+    def position(self, jd: float) -> tuple[float, float]:
+        """Returns the interpolated (X, Y) coordinates at a Julian date inside the window, in AU."""
+        index = int(np.clip(np.searchsorted(self.jd, jd) - 1, 0, len(self.jd) - 2))
+        h = self.jd[index + 1] - self.jd[index]
+        s = (jd - self.jd[index]) / h
+        # Cubic Hermite basis functions
+        h00, h10, h01, h11 = 2 * s ** 3 - 3 * s ** 2 + 1, s ** 3 - 2 * s ** 2 + s, -2 * s ** 3 + 3 * s ** 2, s ** 3 - s ** 2
+        x, y = (h00 * self.positions[index] + h10 * h * self.velocities[index]
+                + h01 * self.positions[index + 1] + h11 * h * self.velocities[index + 1])
+        return float(x), float(y)
+
+
+class EphemerisCache:
+    def __init__(self, span_days: float = 60, step_hours: float = 6, refill_margin: float = 0.25, max_workers: int = 4):
+        """
+        Keeps an EphemerisWindow around the current time for every body, so stepping through time only needs array lookups.
+        Windows are refilled in the background once the time gets close to their edge.
+        :param span_days: The length of each window in days, centered on the time it was requested for.
+        :param step_hours: The time between samples in hours.
+        :param refill_margin: The fraction of the window at each edge where a background refill starts.
+        :param max_workers: The maximum number of Horizons queries running at the same time.
+        """
+        self.span_days = span_days
+        self.step_hours = step_hours
+        self.refill_margin = refill_margin
+        self._windows = dict()
+        self._refills = dict()
+        self._lock = threading.Lock()  # positions() may be called from a worker thread
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _fetch(self, horizons_id, id_type, jd):
+        """Fetches a window centered on a Julian date, returning None if Horizons doesn't know the body."""
+        try:
+            return EphemerisWindow(horizons_id, jd - self.span_days / 2, jd + self.span_days / 2, step_hours=self.step_hours, id_type=id_type)
+        except Exception:
+            return None
+
+    def positions(self, bodies, jd: float) -> dict:
+        """
+        Returns the (X, Y) coordinates of bodies at a Julian date (TDB).
+        :param bodies: An iterable of (horizons_id, id_type) tuples.
+        :return: A dictionary of Horizons ID to coordinates; bodies Horizons couldn't find are left out.
+        """
+        bodies = [(str(horizons_id), id_type) for horizons_id, id_type in bodies]
+        with self._lock:
+            return self._positions(bodies, jd)
+
+    def _positions(self, bodies, jd: float) -> dict:
+        # Swap in refills that finished in the background
+        for horizons_id, future in list(self._refills.items()):
+            if future.done():
+                del self._refills[horizons_id]
+                if future.result() is not None:
+                    self._windows[horizons_id] = future.result()
+        # Fetch missing windows (concurrently) and wait for them
+        missing = {horizons_id: self._executor.submit(self._fetch, horizons_id, id_type, jd) for horizons_id, id_type in bodies
+                   if horizons_id not in self._windows or not self._windows[horizons_id].covers(jd)}
+        for horizons_id, future in missing.items():
+            self._refills.pop(horizons_id, None)
+            if (window := future.result()) is not None:
+                self._windows[horizons_id] = window
+            else:
+                self._windows.pop(horizons_id, None)
+        positions = dict()
+        for horizons_id, id_type in bodies:
+            window = self._windows.get(horizons_id)
+            if window is None or not window.covers(jd):
+                continue
+            positions[horizons_id] = window.position(jd)
+            margin = (window.stop - window.start) * self.refill_margin
+            if (jd < window.start + margin or jd > window.stop - margin) and horizons_id not in self._refills:
+                self._refills[horizons_id] = self._executor.submit(self._fetch, horizons_id, id_type, jd)
+        return positions
@@ -0,0 +1,404 @@
+from datetime import datetime
+
+import numpy as np
+
+GAUSS_K = 0.01720209895  # Gaussian gravitational constant (rad/day, with distances in AU)
+AU_KM = 149597871  # Kilometers in an astronomical unit
+J2000 = 2451545.0  # Julian date of the J2000 epoch
+# Mean orbital elements of the planets (J2000 ecliptic, valid 1800-2050), from JPL's "Approximate Positions of the Planets".
+# Each entry holds (a [AU], e, I [deg], L [deg], longitude of perihelion [deg], longitude of node [deg]) and their rates per century.
+PLANET_ELEMENTS = {
+    '199': ((0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+            (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081)),  # Mercury
+    '299': ((0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+            (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418)),  # Venus
+    '399': ((1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+            (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0)),  # Earth (Earth-Moon barycenter)
+    '499': ((1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+            (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343)),  # Mars
+    '599': ((5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+            (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106)),  # Jupiter
+    '699': ((9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+            (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794)),  # Saturn
+    '799': ((19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503),
+            (-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589)),  # Uranus
+    '899': ((30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574),
+            (0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.00508664)),  # Neptune
+}
+# The Moon is approximated by a circular orbit around the Earth: (a [AU], mean longitude at J2000 [deg], rate [deg/day])
+MOON_ELEMENTS = (0.00256955529, 218.3164477, 13.17639648)
+
+
+def julian_date(time: str | datetime) -> float:
+    """
+    Converts a time to a Julian date.
+    :param time: A datetime or a string in YYYY-MM-DD HH:MM:SS.
+    """
+    if isinstance(time, str):
+        time = datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+    return J2000 + (time - datetime(2000, 1, 1, 12)).total_seconds() / 86400
+
+
+def solve_kepler(mean_anomaly: np.ndarray, eccentricity: np.ndarray, tolerance: float = 1e-12, max_iterations: int = 30) -> np.ndarray:
+    """Solves Kepler's equation (M = E - e sin E) for the eccentric anomaly of every element with Newton's method."""
+    eccentric_anomaly = mean_anomaly + eccentricity * np.sin(mean_anomaly)
+    for _ in range(max_iterations):
+        step = (eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly) - mean_anomaly) / (1 - eccentricity * np.cos(eccentric_anomaly))
+        eccentric_anomaly -= step
+        if not step.size or np.max(np.abs(step)) < tolerance:
+            break
+    return eccentric_anomaly
+
+
+def to_ecliptic(x_orbit: np.ndarray, y_orbit: np.ndarray, i: np.ndarray, node: np.ndarray, peri: np.ndarray) -> np.ndarray:
+    """Rotates vectors from the orbital planes (x towards perihelion) into the ecliptic frame; returns an (N, 3) array."""
+    cos_peri, sin_peri = np.cos(peri), np.sin(peri)
+    cos_node, sin_node = np.cos(node), np.sin(node)
+    cos_i, sin_i = np.cos(i), np.sin(i)
+    x_peri = cos_peri * x_orbit - sin_peri * y_orbit
+    y_peri = sin_peri * x_orbit + cos_peri * y_orbit
+    return np.column_stack([cos_node * x_peri - sin_node * cos_i * y_peri,
+                            sin_node * x_peri + cos_node * cos_i * y_peri,
+                            sin_i * y_peri])
+
+
+def orbit_positions(elements: np.ndarray, rates: np.ndarray, jd: float) -> np.ndarray:
+    """
+    Returns the (N, 3) positions at a Julian date of bodies relative to what they orbit, from rows of elements and rates
+    (see KeplerPropagator.arrays). Every row is independent, so any slice of the rows can be computed on its own.
+    """
+    dt = jd - elements[:, 6]
+    a, e, i, node, peri = (elements[:, :5] + rates * dt[:, None]).T
+    mean_anomaly = np.remainder(elements[:, 5] + elements[:, 7] * dt, 2 * np.pi)
+    eccentric_anomaly = solve_kepler(mean_anomaly, e)
+    # Position in the orbital plane
+    x_orbit = a * (np.cos(eccentric_anomaly) - e)
+    y_orbit = a * np.sqrt(1 - e ** 2) * np.sin(eccentric_anomaly)
+    return to_ecliptic(x_orbit, y_orbit, i, node, peri)
+
+
+class KeplerPropagator:
+    def __init__(self):
+        """
+        A two-body propagator that computes the positions of many bodies at once from their orbital elements.
+        Positions are heliocentric, in AU, on the J2000 ecliptic plane.
+        """
+        self.ids = list()
+        self._index = dict()
+        # Rows are kept in lists so adding many bodies is cheap; the arrays are rebuilt on the next propagation.
+        # Columns: a [AU], e, i, node, argument of perihelion, mean anomaly at epoch [rad], epoch [JD], mean motion [rad/day]
+        self._element_rows = list()
+        # Rates of a, e, i, node and argument of perihelion per day (only planets have them)
+        self._rate_rows = list()
+        self._parent_rows = list()  # Index of the body each orbit is around, or -1 for the Sun
+        self._arrays = None
+
+    def __contains__(self, body_id):
+        return str(body_id) in self._index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, body_id: str, a: float, e: float, i: float, node: float, peri: float, mean_anomaly: float, epoch: float,
+            mean_motion: float | None = None, rates=(0, 0, 0, 0, 0), parent: str | None = None):
+        """
+        Adds a body from its osculating elements. Angles are in degrees. Replaces the body if it already exists.
+        :param body_id: The ID of the body (usually its Horizons ID).
+        :param a: The semi-major axis in AU.
+        :param e: The eccentricity (only elliptical orbits are supported).
+        :param i: The inclination.
+        :param node: The longitude of the ascending node.
+        :param peri: The argument of perihelion.
+        :param mean_anomaly: The mean anomaly at the epoch.
+        :param epoch: The Julian date of the elements.
+        :param mean_motion: The mean motion in degrees per day. If None, it is computed from the semi-major axis.
+        :param rates: Rates of a, e, i, node and peri per day.
+        :param parent: The ID of the body the orbit is around, if it isn't the Sun. The parent must orbit the Sun.
+        """
+        body_id = str(body_id)
+        if mean_motion is None:
+            mean_motion = np.degrees(GAUSS_K / a ** 1.5)
+        row = [a, e, np.radians(i), np.radians(node), np.radians(peri), np.radians(mean_anomaly), epoch, np.radians(mean_motion)]
+        rate_row = [rates[0], rates[1], np.radians(rates[2]), np.radians(rates[3]), np.radians(rates[4])]
+        parent_index = self._index[str(parent)] if parent is not None else -1
+        if body_id in self._index:
+            index = self._index[body_id]
+            self._element_rows[index], self._rate_rows[index], self._parent_rows[index] = row, rate_row, parent_index
+        else:
+            self._index[body_id] = len(self.ids)
+            self.ids.append(body_id)
+            self._element_rows.append(row)
+            self._rate_rows.append(rate_row)
+            self._parent_rows.append(parent_index)
+        self._arrays = None
+
+    def add_planet(self, horizons_id: str) -> bool:
+        """Adds a planet (or the Sun or Moon) from its mean elements. Returns False if the Horizons ID isn't known."""
+        horizons_id = str(horizons_id)
+        if horizons_id == '10':  # The Sun sits at the origin
+            self.add(horizons_id, 0, 0, 0, 0, 0, 0, J2000, mean_motion=0)
+        elif horizons_id == '301':
+            if '399' not in self:
+                self.add_planet('399')
+            a, longitude, rate = MOON_ELEMENTS
+            self.add(horizons_id, a, 0, 0, 0, 0, longitude, J2000, mean_motion=rate, parent='399')
+        elif horizons_id in PLANET_ELEMENTS:
+            (a, e, i, longitude, perihelion, node), rates = PLANET_ELEMENTS[horizons_id]
+            per_day = [rate / 36525 for rate in rates]
+            self.add(horizons_id, a, e, i, node, perihelion - node, longitude - perihelion, J2000,
+                     mean_motion=per_day[3] - per_day[4],
+                     rates=(per_day[0], per_day[1], per_day[2], per_day[5], per_day[4] - per_day[5]))
+        else:
+            return False
+        return True
+
+    def add_sbdb(self, body_id: str, orbit) -> bool:
+        """
+        Adds a small body from the orbit section of an SBDB payload (Asteroid.SBDB['orbit']).
+        Returns False if the orbit is missing elements or isn't elliptical.
+        """
+        try:
+            elements = orbit['elements']
+            value = lambda quantity: float(getattr(quantity, 'value', quantity))
+            a, e = value(elements['a']), value(elements['e'])
+            if not 0 <= e < 1:
+                return False
+            self.add(body_id, a, e, value(elements['i']), value(elements['om']), value(elements['w']), value(elements['ma']),
+                     value(orbit['epoch']))
+            return True
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def remove(self, body_id: str):
+        """Removes a body (and any bodies orbiting it)."""
+        index = self._index.get(str(body_id))
+        if index is None:
+            return
+        parents = np.array(self._parent_rows, dtype=int)
+        keep = (np.arange(len(self.ids)) != index) & (parents != index)
+        remap = np.cumsum(keep) - 1
+        self.ids = [body for body, kept in zip(self.ids, keep) if kept]
+        self._index = {body: position for position, body in enumerate(self.ids)}
+        self._element_rows = [row for row, kept in zip(self._element_rows, keep) if kept]
+        self._rate_rows = [row for row, kept in zip(self._rate_rows, keep) if kept]
+        self._parent_rows = [int(remap[parent]) if parent >= 0 else -1 for parent in parents[keep]]
+        self._arrays = None
+
+    def arrays(self):
+        """Returns the (elements, rates, parents) arrays of every body, rebuilding them if bodies changed."""
+        if self._arrays is None:
+            self._arrays = (np.array(self._element_rows, dtype=float).reshape(-1, 8), np.array(self._rate_rows, dtype=float).reshape(-1, 5),
+                            np.array(self._parent_rows, dtype=int))
+        return self._arrays
+
+    def positions(self, jd: float, arrays: tuple | None = None) -> np.ndarray:
+        """
+        Returns an (N, 3) array of the bodies' positions at a Julian date, in the order of self.ids.
+        :param arrays: The (elements, rates, parents) returned by arrays() earlier, to compute the positions of the bodies
+        as they were then (e.g. on another thread while bodies are added), or None for the current ones.
+        """
+        elements, rates, parents = self.arrays() if arrays is None else arrays
+        positions = orbit_positions(elements, rates, jd)
+        satellites = parents >= 0
+        positions[satellites] += positions[parents[satellites]]
+        return positions
+
+    def states(self, jd: float):
+        """
+        Returns (N, 3) arrays of the bodies' positions (AU) and velocities (AU/day) at a Julian date, in the order of self.ids.
+        The slow drift of the planets' mean elements is left out of the velocities.
+        """
+        elements, rates, parents = self.arrays()
+        dt = jd - elements[:, 6]
+        a, e, i, node, peri = (elements[:, :5] + rates * dt[:, None]).T
+        mean_motion = elements[:, 7]
+        eccentric_anomaly = solve_kepler(np.remainder(elements[:, 5] + mean_motion * dt, 2 * np.pi), e)
+        cos_anomaly, sin_anomaly = np.cos(eccentric_anomaly), np.sin(eccentric_anomaly)
+        semi_minor = a * np.sqrt(1 - e ** 2)
+        anomaly_rate = mean_motion / (1 - e * cos_anomaly)  # dE/dt
+        positions = to_ecliptic(a * (cos_anomaly - e), semi_minor * sin_anomaly, i, node, peri)
+        velocities = to_ecliptic(-a * sin_anomaly * anomaly_rate, semi_minor * cos_anomaly * anomaly_rate, i, node, peri)
+        satellites = parents >= 0
+        positions[satellites] += positions[parents[satellites]]
+        velocities[satellites] += velocities[parents[satellites]]
+        return positions, velocities
+
+    def orbit_paths(self, jd: float, samples: int = 181, rows=None) -> np.ndarray:
+        """
+        Returns an (N, samples, 3) array of closed polylines tracing every body's orbit with its elements at a Julian date,
+        in the order of self.ids. Points are evenly spaced in eccentric anomaly, so they're closer together near perihelion.
+        Orbits of satellites are relative to their parent.
+        :param rows: The rows (indices in self.ids) of the bodies to trace, if not all of them.
+        """
+        elements, rates, _ = self.arrays()
+        if rows is not None:
+            elements, rates = elements[rows], rates[rows]
+        dt = jd - elements[:, 6]
+        a, e, i, node, peri = (elements[:, :5] + rates * dt[:, None]).T
+        eccentric_anomaly = np.linspace(0, 2 * np.pi, samples)[None, :]
+        x_orbit = a[:, None] * (np.cos(eccentric_anomaly) - e[:, None])
+        y_orbit = (a * np.sqrt(1 - e ** 2))[:, None] * np.sin(eccentric_anomaly)
+        # Rotate every point at once, with the elements repeated for each point of an orbit
+        i, node, peri = (np.repeat(angle, samples) for angle in (i, node, peri))
+        return to_ecliptic(x_orbit.ravel(), y_orbit.ravel(), i, node, peri).reshape(len(elements), samples, 3)
+
+    def position(self, body_id: str, jd: float) -> tuple[float, float]:
+        """Returns the (X, Y) position of one body at a Julian date, in AU."""
+        x, y, _ = self.positions(jd)[self._index[str(body_id)]]
+        return float(x), float(y)
+
+
+def planet_elements(horizons_id: str, jd: float = J2000):
+    """Returns the (a [AU], e, i, node, argument of perihelion [deg]) of a planet at a Julian date, from its mean elements."""
+    (a, e, i, longitude, perihelion, node), rates = PLANET_ELEMENTS[str(horizons_id)]
+    centuries = (jd - J2000) / 36525
+    a, e, i, perihelion, node = (value + rate * centuries for value, rate in
+                                 zip((a, e, i, perihelion, node), (rates[0], rates[1], rates[2], rates[4], rates[5])))
+    return a, e, i, node, perihelion - node
+
+
+def tisserand(a, e, i, planet: str = '599'):
+    """
+    Returns the Tisserand parameter of every orbit with respect to a planet (Jupiter by default). Below 3, an orbit is
+    comet-like; above 3, asteroid-like.
+    :param a: Semi-major axes in AU.
+    :param e: Eccentricities.
+    :param i: Inclinations in degrees.
+    """
+    a_planet = PLANET_ELEMENTS[planet][0][0]
+    a, e, i = np.asarray(a, dtype=float), np.asarray(e, dtype=float), np.radians(i)
+    return a_planet / a + 2 * np.cos(i) * np.sqrt(a / a_planet * (1 - e ** 2))
+
+
+def synodic_period(a, planet: str = '399'):
+    """
+    Returns the synodic period of every orbit with respect to a planet (the Earth by default) in days: how often the
+    two line up again as seen from the Sun. Orbits with the planet's period never line up again (inf).
+    :param a: Semi-major axes in AU.
+    """
+    period = 2 * np.pi / GAUSS_K * np.asarray(a, dtype=float) ** 1.5
+    planet_period = 2 * np.pi / GAUSS_K * PLANET_ELEMENTS[planet][0][0] ** 1.5
+    with np.errstate(divide='ignore'):
+        return 1 / np.abs(1 / period - 1 / planet_period)
+
+
+def perihelion_velocity(a, e):
+    """Returns the speed of every orbit at perihelion in km/s (from the vis-viva equation). a is in AU."""
+    a, e = np.asarray(a, dtype=float), np.asarray(e, dtype=float)
+    return GAUSS_K * np.sqrt((1 + e) / (a * (1 - e))) * AU_KM / 86400
+
+
+def aphelion_velocity(a, e):
+    """Returns the speed of every orbit at aphelion in km/s (from the vis-viva equation). a is in AU."""
+    a, e = np.asarray(a, dtype=float), np.asarray(e, dtype=float)
+    return GAUSS_K * np.sqrt((1 - e) / (a * (1 + e))) * AU_KM / 86400
+
+
+def _earth_distance(true_anomaly, p, e, cos_i, sin_i, node, peri, earth):
+    """The distance from the points of orbits at some true anomalies to the orbit of the Earth, in AU (see earth_moid)."""
+    earth_p, earth_e, earth_perihelion = earth
+    r = p / (1 + e * np.cos(true_anomaly))
+    u = peri + true_anomaly  # Argument of latitude
+    cos_u, sin_u = np.cos(u), np.sin(u)
+    z = r * sin_u * sin_i
+    in_plane = r * np.sqrt(cos_u ** 2 + (sin_u * cos_i) ** 2)
+    longitude = node + np.arctan2(sin_u * cos_i, cos_u)
+    earth_r = earth_p / (1 + earth_e * np.cos(longitude - earth_perihelion))
+    return np.hypot(in_plane - earth_r, z)
+
+
+def _conic_points(true_anomaly, p, e, i, node, peri):
+    """
+    Returns the ecliptic positions of the points of orbits at some true anomalies, and their first and second derivatives
+    with respect to the true anomaly, as three (N, 3) arrays.
+    """
+    cos_v, sin_v = np.cos(true_anomaly), np.sin(true_anomaly)
+    denominator = 1 + e * cos_v
+    r = p / denominator
+    scale = p / denominator ** 2  # The derivative of p / (1 + e cos v) * (cos v, sin v) is scale * (-sin v, e + cos v)
+    scale_derivative = 2 * p * e * sin_v / denominator ** 3
+    return (to_ecliptic(r * cos_v, r * sin_v, i, node, peri),
+            to_ecliptic(-scale * sin_v, scale * (e + cos_v), i, node, peri),
+            to_ecliptic(-scale_derivative * sin_v - scale * cos_v, scale_derivative * (e + cos_v) - scale * sin_v, i, node, peri))
+
+
+def _polish_moid(true_anomaly, earth_anomaly, p, e, i, node, peri, earth, iterations: int = 6):
+    """
+    Refines pairs of points on orbits and on the Earth's orbit that are close to each other into the closest pairs, with
+    Newton's method on both true anomalies, and returns the distances between them (see earth_moid).
+    """
+    earth_p, earth_e, earth_perihelion = earth
+    zeros = np.zeros_like(true_anomaly)
+    for _ in range(iterations):
+        point, velocity, curvature = _conic_points(true_anomaly, p, e, i, node, peri)
+        earth_point, earth_velocity, earth_curvature = _conic_points(earth_anomaly, earth_p, earth_e, zeros, zeros, earth_perihelion + zeros)
+        separation = point - earth_point
+        # Gradient and Hessian of half the squared distance
+        gradient = (np.einsum('nk,nk->n', separation, velocity), -np.einsum('nk,nk->n', separation, earth_velocity))
+        h11 = np.einsum('nk,nk->n', velocity, velocity) + np.einsum('nk,nk->n', separation, curvature)
+        h22 = np.einsum('nk,nk->n', earth_velocity, earth_velocity) - np.einsum('nk,nk->n', separation, earth_curvature)
+        h12 = -np.einsum('nk,nk->n', velocity, earth_velocity)
+        determinant = h11 * h22 - h12 ** 2
+        valid = (determinant > 0) & (h11 > 0)  # Only step towards a minimum
+        determinant = np.where(valid, determinant, 1)
+        true_anomaly = true_anomaly - np.where(valid, np.clip((h22 * gradient[0] - h12 * gradient[1]) / determinant, -0.1, 0.1), 0)
+        earth_anomaly = earth_anomaly - np.where(valid, np.clip((h11 * gradient[1] - h12 * gradient[0]) / determinant, -0.1, 0.1), 0)
+    point = _conic_points(true_anomaly, p, e, i, node, peri)[0]
+    earth_point = _conic_points(earth_anomaly, earth_p, earth_e, zeros, zeros, earth_perihelion + zeros)[0]
+    return np.linalg.norm(point - earth_point, axis=1)
+
+
+def earth_moid(q, e, i, node, peri, jd: float = J2000, samples: int = 90, refinements: int = 7, chunk_size: int = 4096):
+    """
+    Returns the minimum orbit intersection distance (MOID) of every orbit with the Earth's, in AU.
+    Each orbit is sampled at evenly spaced true anomalies, and its two closest local minima are refined on ever finer
+    grids, for every orbit at once. On the grids, the distance of a point to the Earth's orbit is measured along the
+    ecliptic direction of the point, which is within about 0.02% of the true distance since the Earth's orbit is almost
+    circular; the closest pairs of points are then polished with Newton's method on both orbits' true anomalies, which
+    makes the result the exact distance between the two orbits. The Earth's mean orbit is used, so results can differ from
+    JPL's MOIDs (computed with the osculating orbit of the Earth-Moon barycenter) by a few 0.0001 AU.
+    Works for hyperbolic orbits too, which is why the perihelion distance is used instead of the semi-major axis.
+    :param q: Perihelion distances in AU.
+    :param e: Eccentricities.
+    :param i: Inclinations in degrees.
+    :param node: Longitudes of the ascending node in degrees.
+    :param peri: Arguments of perihelion in degrees.
+    :param jd: The Julian date of the Earth's orbit (from its mean elements).
+    :param samples: The number of points each orbit is first sampled at.
+    :param refinements: The number of times the closest points are refined (each time on a grid 4 times finer).
+    :param chunk_size: The number of orbits processed at a time, to limit memory use.
+    """
+    q, e, i, node, peri = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (q, e, i, node, peri)))
+    shape = q.shape
+    q, e, i, node, peri = (value.ravel() for value in (q, e, np.radians(i), np.radians(node), np.radians(peri)))
+    earth_a, earth_e, _, earth_node, earth_peri = planet_elements('399', jd)
+    earth = (earth_a * (1 - earth_e ** 2), earth_e, np.radians(earth_node + earth_peri))
+    moid = np.empty(q.size)
+    for start in range(0, q.size, chunk_size):
+        rows = slice(start, start + chunk_size)
+        # Orbits along the first axis, candidate minima along the second and grid points along the third
+        p, ecc = (q[rows] * (1 + e[rows]))[:, None, None], e[rows][:, None, None]
+        orbit = (p, ecc, np.cos(i[rows])[:, None, None], np.sin(i[rows])[:, None, None], node[rows][:, None, None],
+                 peri[rows][:, None, None], earth)
+        # Hyperbolic orbits only exist for true anomalies short of their asymptotes
+        limit = np.where(ecc < 1, np.pi, np.arccos(-1 / np.maximum(ecc, 1)) * 0.999)
+        grid = np.linspace(-1, 1, samples, endpoint=False)[None, None, :] * limit
+        step = 2 * limit / samples
+        distances = _earth_distance(grid, *orbit)[:, 0, :]
+        # Orbits can pass close to the Earth's twice (near each node); keep the two closest local minima
+        local_minima = (distances <= np.roll(distances, 1, axis=1)) & (distances <= np.roll(distances, -1, axis=1))
+        candidates = np.argsort(np.where(local_minima, distances, np.inf), axis=1)[:, :2]
+        best = np.take_along_axis(grid[:, 0, :], candidates, axis=1)[:, :, None]
+        for _ in range(refinements):
+            grid = best + np.linspace(-1, 1, 9)[None, None, :] * step
+            distances = _earth_distance(grid, *orbit)
+            best = np.take_along_axis(grid, np.argmin(distances, axis=2)[:, :, None], axis=2)
+            step = step / 4
+        # The Earth's point closest to each candidate is (almost) the one at the same ecliptic longitude
+        u = peri[rows][:, None] + best[:, :, 0]
+        earth_anomaly = node[rows][:, None] + np.arctan2(np.sin(u) * np.cos(i[rows])[:, None], np.cos(u)) - earth[2]
+        repeat = lambda value: np.repeat(value, 2)
+        polished = _polish_moid(best[:, :, 0].ravel(), earth_anomaly.ravel(), repeat(p[:, 0, 0]), repeat(e[rows]), repeat(i[rows]),
+                                repeat(node[rows]), repeat(peri[rows]), earth)
+        moid[rows] = np.minimum(distances.min(axis=(1, 2)), polished.reshape(-1, 2).min(axis=1))
+    return moid.reshape(shape)
@@ -0,0 +1,339 @@
+import numpy as np
+
+from kepler import GAUSS_K, KeplerPropagator
+
+SUN_GM = GAUSS_K ** 2  # Gravitational parameter of the Sun, in AU^3/day^2
+# Gravitational parameters of the massive bodies by Horizons ID, from the IAU mass ratios (the Earth includes the Moon)
+BODY_GM = {
+    '10': SUN_GM,
+    '199': SUN_GM / 6023600,  # Mercury
+    '299': SUN_GM / 408523.71,  # Venus
+    '399': SUN_GM / 328900.56,  # Earth-Moon barycenter
+    '499': SUN_GM / 3098708,  # Mars
+    '599': SUN_GM / 1047.3486,  # Jupiter
+    '699': SUN_GM / 3497.898,  # Saturn
+    '799': SUN_GM / 22902.98,  # Uranus
+    '899': SUN_GM / 19412.24,  # Neptune
+}
+HILL_RADII = 3.0  # Test particles closer than this many Hill radii to a planet have a close encounter and are substepped
+ENCOUNTER_ETA = 0.005  # The fraction of an encounter's timescale a substep covers
+MAX_SUBSTEPS = 2048  # The most substeps a step is split into (a power of two)
+# Fractions of a step taken by the three leapfrog steps of Yoshida's fourth-order integrator (the middle one goes backwards)
+YOSHIDA_WEIGHTS = (1 / (2 - 2 ** (1 / 3)), -2 ** (1 / 3) / (2 - 2 ** (1 / 3)), 1 / (2 - 2 ** (1 / 3)))
+
+
+def accelerations(positions: np.ndarray, gm: np.ndarray, massive: np.ndarray | None = None) -> np.ndarray:
+    """
+    Returns the acceleration of every body (AU/day^2) caused by the bodies with a gravitational parameter.
+    :param massive: The rows of the massive bodies, if already known.
+    """
+    return _accelerations(positions, gm, np.flatnonzero(gm > 0) if massive is None else massive)[0]
+
+
+def _accelerations(positions: np.ndarray, gm: np.ndarray, massive: np.ndarray) -> tuple:
+    """Returns the accelerations, and the (N, M) squared distances from every body to every massive body they came from."""
+    separation = positions[massive][None, :, :] - positions[:, None, :]  # From each body to each massive body
+    distance_squared = np.einsum('nmk,nmk->nm', separation, separation)
+    distance_cubed = distance_squared ** 1.5
+    distance_cubed[massive, np.arange(massive.size)] = np.inf  # Bodies don't pull on themselves
+    return np.einsum('nm,nmk->nk', gm[massive] / distance_cubed, separation), distance_squared
+
+
+def close_encounters(positions: np.ndarray, velocities: np.ndarray, gm: np.ndarray, massive: np.ndarray, dt: float,
+                     distance_squared: np.ndarray | None = None):
+    """
+    Finds the test particles that come within HILL_RADII Hill radii of a planet during a step of dt days (moving in straight
+    lines), and how many substeps each needs: enough for ENCOUNTER_ETA of the encounter's timescale (the time to cross the
+    closest distance, or to fall into the planet from there) per substep, rounded up to a power of two. Each particle's
+    substeps only depend on itself, so particles are integrated the same way whichever others they're integrated with.
+    :param distance_squared: The squared distances from every body to every massive body, as computed with the accelerations.
+    If given, the particles too far to reach a planet during the step are skipped without looking at them further.
+    :return: The rows of the close particles, and the number of substeps of each.
+    """
+    particles = np.flatnonzero(gm == 0)
+    if massive.size < 2 or not particles.size:
+        return particles[:0], particles[:0]
+    sun = massive[np.argmax(gm[massive])]
+    planets = massive[massive != sun]
+    hill = np.linalg.norm(positions[planets] - positions[sun], axis=1) * np.cbrt(gm[planets] / (3 * gm[sun]))
+    if distance_squared is not None:
+        reach = HILL_RADII * hill + abs(dt) * np.linalg.norm(velocities[planets], axis=1)
+        reach = reach[None, :] + abs(dt) * np.linalg.norm(velocities[particles], axis=1)[:, None]
+        particles = particles[(distance_squared[particles][:, massive != sun] < reach ** 2).any(axis=1)]
+        if not particles.size:
+            return particles, particles
+    separation = positions[particles][:, None, :] - positions[planets][None, :, :]
+    relative_velocity = velocities[particles][:, None, :] - velocities[planets][None, :, :]
+    speed_squared = np.einsum('pmk,pmk->pm', relative_velocity, relative_velocity)
+    when = np.clip(-np.einsum('pmk,pmk->pm', separation, relative_velocity) / np.maximum(speed_squared, 1e-30), min(dt, 0), max(dt, 0))
+    closest = np.linalg.norm(separation + relative_velocity * when[:, :, None], axis=2)
+    near = closest < HILL_RADII * hill
+    if not near.any():
+        return particles[:0], particles[:0]
+    rows, columns = np.nonzero(near)
+    distance = np.maximum(closest[rows, columns], 1e-9)
+    timescale = np.minimum(distance / np.sqrt(np.maximum(speed_squared[rows, columns], 1e-30)), np.sqrt(distance ** 3 / gm[planets][columns]))
+    needed = np.zeros(len(particles))
+    np.maximum.at(needed, rows, abs(dt) / (ENCOUNTER_ETA * timescale))
+    close = np.flatnonzero(needed > 1)  # Slow encounters (e.g. far inside Jupiter's large Hill sphere) are fine with whole steps
+    return particles[close], np.minimum(2 ** np.ceil(np.log2(needed[close])), MAX_SUBSTEPS).astype(int)
+
+
+def _interpolate(start: tuple, end: tuple, dt: float, fraction: float) -> np.ndarray:
+    """Interpolates positions between two (positions, velocities) states dt days apart with a cubic Hermite polynomial."""
+    squared, cubed = fraction ** 2, fraction ** 3
+    return ((2 * cubed - 3 * squared + 1) * start[0] + (cubed - 2 * squared + fraction) * dt * start[1]
+            + (3 * squared - 2 * cubed) * end[0] + (cubed - squared) * dt * end[1])
+
+
+def _substep(state: tuple, start: tuple, end: tuple, gm: np.ndarray, dt: float, substeps: int) -> tuple:
+    """
+    Advances test particles by dt days in substeps, while the massive bodies (gm) move from their start to their end state.
+    :param state: The (positions, velocities, accelerations) of the particles.
+    :return: The new (positions, velocities, accelerations) of the particles.
+    """
+    positions, velocities, acceleration = (array.copy() for array in state)
+    count, step = len(gm), dt / substeps
+    gm = np.concatenate([gm, np.zeros(len(positions))])
+    massive = np.arange(count)
+    for substep in range(1, substeps + 1):
+        velocities += 0.5 * step * acceleration
+        positions += step * velocities
+        acceleration = accelerations(np.vstack([_interpolate(start, end, dt, substep / substeps), positions]), gm, massive)[count:]
+        velocities += 0.5 * step * acceleration
+    return positions, velocities, acceleration
+
+
+def _kick_drift_kick(positions: np.ndarray, velocities: np.ndarray, forces: tuple, gm: np.ndarray, massive: np.ndarray, dt: float) -> tuple:
+    """
+    Takes one kick-drift-kick step of dt days in place, from the (accelerations, squared distances) of _accelerations, and
+    returns the new ones. Test particles having a close encounter with a planet (see close_encounters) take the step in
+    substeps, along the massive bodies' path interpolated over the step; the massive bodies always take the whole step.
+    """
+    acceleration, distance_squared = forces
+    close, substeps = close_encounters(positions, velocities, gm, massive, dt, distance_squared)
+    if close.size:
+        before = (positions[close], velocities[close], acceleration[close])
+        start = (positions[massive], velocities[massive])
+    velocities += 0.5 * dt * acceleration
+    positions += dt * velocities
+    acceleration, distance_squared = _accelerations(positions, gm, massive)
+    velocities += 0.5 * dt * acceleration
+    if close.size:
+        end = (positions[massive], velocities[massive])
+        for count in np.unique(substeps):
+            group = substeps == count
+            positions[close[group]], velocities[close[group]], acceleration[close[group]] = _substep(
+                tuple(array[group] for array in before), start, end, gm[massive], dt, count)
+        separation = positions[massive][None, :, :] - positions[close][:, None, :]
+        distance_squared[close] = np.einsum('nmk,nmk->nm', separation, separation)
+    return acceleration, distance_squared
+
+
+def leapfrog(state: np.ndarray, gm: np.ndarray, dt: float, steps: int) -> np.ndarray:
+    """
+    Advances (N, 6) states by a number of steps of dt days and returns the new states. Each step is Yoshida's fourth-order
+    composition of three kick-drift-kick leapfrog steps (YOSHIDA_WEIGHTS), which stays symplectic but is far more accurate
+    than a single leapfrog step of the same size.
+    Test particles don't affect anything else, so they can be split between calls that each include the massive bodies.
+    """
+    positions, velocities = state[:, :3].copy(), state[:, 3:].copy()
+    massive = np.flatnonzero(gm > 0)
+    forces = _accelerations(positions, gm, massive)
+    for _ in range(steps):
+        for weight in YOSHIDA_WEIGHTS:
+            forces = _kick_drift_kick(positions, velocities, forces, gm, massive, weight * dt)
+    return np.hstack([positions, velocities])
+
+
+def refine_approaches(before: np.ndarray, at: np.ndarray, after: np.ndarray, closest: np.ndarray, when: np.ndarray, interval: float,
+                      points: int = 64, chunk: int = 4096) -> tuple:
+    """
+    Refines sampled closest approaches: the relative motion between the closest sample and the samples on either side of it
+    is interpolated with quintic Hermite polynomials (from positions, velocities and accelerations), searched on a grid of
+    points, and the grid minimum is polished with a parabola through the squared distances around it.
+    :param before: The (N, 9) relative positions, velocities and accelerations at the samples before the closest ones (NaN if
+    there is none).
+    :param at: The (N, 9) relative positions, velocities and accelerations at the closest samples.
+    :param after: The (N, 9) relative positions, velocities and accelerations at the samples after the closest ones (NaN if
+    there is none).
+    :param closest: The sampled smallest distances.
+    :param when: The Julian dates of the closest samples.
+    :param interval: The days between samples.
+    :return: The refined (closest, when) arrays.
+    """
+    closest, when = closest.copy(), when.copy()
+    fractions = np.linspace(0, 1, points + 1)
+    powers = [fractions ** power for power in range(6)]
+    # The weights of the start position, velocity and acceleration, then the end acceleration, velocity and position
+    weights = np.stack([1 - 10 * powers[3] + 15 * powers[4] - 6 * powers[5], powers[1] - 6 * powers[3] + 8 * powers[4] - 3 * powers[5],
+                        (powers[2] - 3 * powers[3] + 3 * powers[4] - powers[5]) / 2, (powers[3] - 2 * powers[4] + powers[5]) / 2,
+                        -4 * powers[3] + 7 * powers[4] - 3 * powers[5], 10 * powers[3] - 15 * powers[4] + 6 * powers[5]])
+    scales = (1, interval, interval ** 2)
+    for first in range(0, len(at), chunk):
+        rows = slice(first, first + chunk)
+        for start, end, offset in ((before[rows], at[rows], -1), (at[rows], after[rows], 0)):
+            terms = [start[:, 3 * order:3 * order + 3] * scales[order] for order in range(3)]
+            terms += [end[:, 3 * order:3 * order + 3] * scales[order] for order in (2, 1, 0)]
+            curve = sum(weight[None, :, None] * term[:, None, :] for weight, term in zip(weights, terms))
+            distance_squared = np.einsum('nsk,nsk->ns', curve, curve)
+            valid = ~np.isnan(distance_squared[:, 0])
+            if not valid.any():
+                continue
+            index = np.clip(np.argmin(np.where(valid[:, None], distance_squared, np.inf), axis=1), 1, points - 1)
+            lower, middle, upper = (np.take_along_axis(distance_squared, (index + shift)[:, None], axis=1)[:, 0] for shift in (-1, 0, 1))
+            curvature = lower - 2 * middle + upper
+            shift = np.where(curvature > 0, np.clip(0.5 * (lower - upper) / np.where(curvature > 0, curvature, 1), -1, 1), 0)
+            refined = np.sqrt(np.maximum(middle - 0.25 * (lower - upper) * shift, 0))
+            better = valid & (refined < closest[rows])
+            closest[rows][better] = refined[better]
+            when[rows][better] += (offset + (index[better] + shift[better]) / points) * interval
+    return closest, when
+
+
+class NBodyIntegrator:
+    def __init__(self, step_days: float = 0.25):
+        """
+        Integrates the Sun, the planets and any number of test particles (asteroids, the Moon...) together with a
+        fourth-order composition of kick-drift-kick leapfrog steps (see leapfrog), which is symplectic, so energy doesn't
+        drift over long runs. Massive bodies pull on everything; test particles feel them but don't pull back. Every body is
+        stored in one NumPy state array, so a step costs the same few array operations however many bodies there are.
+        States are barycentric, in AU and AU/day, on the J2000 ecliptic plane; positions() returns them relative to the Sun.
+        A particle within a few Hill radii of a planet takes smaller substeps through the encounter (see close_encounters),
+        so flybys such as Apophis' in 2029 are resolved whatever the step size.
+        :param step_days: The largest step in days. Integrating to a time takes whole steps of at most this size.
+        """
+        self.step_days = step_days
+        self.jd = None  # The Julian date of the states
+        self.ids = list()
+        self._index = dict()
+        self.state = np.empty((0, 6))  # Position and velocity of every body
+        self.gm = np.empty(0)  # Gravitational parameter of every body; 0 for test particles
+
+    @classmethod
+    def from_propagator(cls, propagator: KeplerPropagator, jd: float, step_days: float = 0.25):
+        """
+        Seeds an integrator with the states of every body of a KeplerPropagator (mean planetary elements and SBDB elements)
+        at a Julian date. Bodies in BODY_GM are massive; the others are test particles. The Sun and planets the propagator
+        doesn't have are added from their mean elements, so every body is perturbed by all of them.
+        """
+        integrator = cls(step_days=step_days)
+        perturbers = KeplerPropagator()
+        for body_id in BODY_GM:
+            if body_id not in propagator:
+                perturbers.add_planet(body_id)
+        for source in (perturbers, propagator):
+            if len(source):
+                positions, velocities = source.states(jd)
+                integrator.add(source.ids, positions, velocities, jd)
+        return integrator
+
+    def __contains__(self, body_id):
+        return str(body_id) in self._index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, body_ids, positions, velocities, jd: float):
+        """
+        Adds bodies from their states relative to the Sun, or replaces them if they already exist.
+        :param body_ids: The IDs of the bodies (usually their Horizons IDs).
+        :param positions: An (N, 3) array of positions in AU.
+        :param velocities: An (N, 3) array of velocities in AU/day.
+        :param jd: The Julian date of the states; it must be the integrator's time unless the integrator is empty.
+        """
+        if len(self.ids) and jd != self.jd:
+            raise ValueError(f"States must be at the integrator's time (JD {self.jd}), not JD {jd}")
+        self.jd = jd
+        body_ids = [str(body_id) for body_id in body_ids]
+        states = np.hstack([np.asarray(positions, dtype=float).reshape(-1, 3), np.asarray(velocities, dtype=float).reshape(-1, 3)])
+        states += self._sun_state()  # Relative to the Sun -> the integrator's frame
+        new_rows, new_gm = list(), list()
+        for body_id, state in zip(body_ids, states):
+            gm = BODY_GM.get(body_id, 0.0)
+            if body_id in self._index:
+                self.state[self._index[body_id]], self.gm[self._index[body_id]] = state, gm
+            else:
+                self._index[body_id] = len(self.ids)
+                self.ids.append(body_id)
+                new_rows.append(state)
+                new_gm.append(gm)
+        if new_rows:
+            self.state = np.vstack([self.state, new_rows])
+            self.gm = np.concatenate([self.gm, new_gm])
+        if '10' in self._index and any(BODY_GM.get(body_id, 0.0) for body_id in body_ids):  # Until the Sun is added, it's the origin
+            self._center()
+
+    def remove(self, body_id: str):
+        """Removes a body."""
+        index = self._index.pop(str(body_id), None)
+        if index is None:
+            return
+        del self.ids[index]
+        self._index = {body: position for position, body in enumerate(self.ids)}
+        self.state = np.delete(self.state, index, axis=0)
+        self.gm = np.delete(self.gm, index)
+
+    def _sun_state(self) -> np.ndarray:
+        """The barycentric state of the Sun, or zeros if there is no Sun."""
+        index = self._index.get('10')
+        return self.state[index].copy() if index is not None else np.zeros(6)
+
+    def _center(self):
+        """Moves the states to the barycentric frame, so the system as a whole stays still."""
+        total = self.gm.sum()
+        if total > 0:
+            self.state -= (self.gm[:, None] * self.state).sum(axis=0) / total
+
+    def steps_to(self, jd: float):
+        """Returns the number of equal steps of at most step_days to a Julian date, and their size in days."""
+        steps = int(np.ceil(abs(jd - self.jd) / self.step_days))
+        return steps, (jd - self.jd) / steps if steps else 0.0
+
+    def integrate(self, jd: float):
+        """Moves every body to a Julian date (forwards or backwards) in equal steps of at most step_days."""
+        if len(self.ids) and jd != self.jd:
+            self.state = leapfrog(self.state, self.gm, *reversed(self.steps_to(jd)))
+        self.jd = jd
+
+    def positions(self, jd: float | None = None) -> np.ndarray:
+        """Returns an (N, 3) array of positions relative to the Sun in AU, in the order of self.ids, integrating to jd first if given."""
+        if jd is not None:
+            self.integrate(jd)
+        return self.state[:, :3] - self._sun_state()[:3]
+
+    def _relative_motion(self, target: int) -> np.ndarray:
+        """Returns the (N, 9) positions, velocities and accelerations of every body relative to one body."""
+        motion = np.hstack([self.state, accelerations(self.state[:, :3], self.gm)])
+        return motion - motion[target]
+
+    def closest_approaches(self, body_id: str, jd: float, every: int = 1):
+        """
+        Integrates to a Julian date and records how close every body comes to one body (e.g. '399' for the Earth) on the way.
+        The closest sample of every body is refined between its neighbouring samples (see refine_approaches), so the
+        minimum isn't limited to the times that were sampled.
+        :param body_id: The ID of the body distances are measured to.
+        :param jd: The Julian date to integrate to.
+        :param every: Distances are checked every this many steps.
+        :return: Arrays of the smallest distance of every body in AU and the Julian date it happened, in the order of self.ids.
+        """
+        target = self._index[str(body_id)]
+        start = self.jd
+        steps = max(int(np.ceil(abs(jd - start) / (self.step_days * every))), 1)
+        previous = self._relative_motion(target)
+        closest, when = np.linalg.norm(previous[:, :3], axis=1), np.full(len(self.ids), start)
+        # The relative states at the closest sample of every body, and at the samples before and after it (NaN at the ends)
+        at, before, after = previous.copy(), np.full_like(previous, np.nan), np.full_like(previous, np.nan)
+        latest = np.ones(len(self.ids), dtype=bool)  # Bodies whose closest sample is the latest one
+        for step in range(1, steps + 1):
+            self.integrate(start + (jd - start) * step / steps)
+            current = self._relative_motion(target)
+            after[latest] = current[latest]
+            distances = np.linalg.norm(current[:, :3], axis=1)
+            latest = distances < closest
+            closest[latest], when[latest] = distances[latest], self.jd
+            before[latest], at[latest], after[latest] = previous[latest], current[latest], np.nan
+            previous = current
+        closest, when = refine_approaches(before, at, after, closest, when, (jd - start) / steps)
+        closest[target] = np.nan
+        return closest, when
@@ -0,0 +1,159 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from kepler import KeplerPropagator, orbit_positions
+from nbody import NBodyIntegrator, leapfrog
+
+
+class SharedArray:
+    def __init__(self):
+        """
+        A NumPy array in shared memory that worker processes attach to by name, so it is never pickled. The memory grows
+        when a bigger array is asked for and is reused otherwise.
+        """
+        self._memory = None
+
+    @property
+    def name(self):
+        return self._memory.name if self._memory is not None else None
+
+    def array(self, shape) -> np.ndarray:
+        """Returns an array of float64s of a shape backed by the shared memory, allocating more if needed."""
+        size = max(int(np.prod(shape)) * 8, 1)
+        if self._memory is None or self._memory.size < size:
+            self.close()
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        return np.ndarray(shape, dtype=float, buffer=self._memory.buf)
+
+    def close(self):
+        """Frees the shared memory."""
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+def _attach(name: str, shape):
+    """Attaches to a SharedArray from a worker process; returns the SharedMemory (to close) and the array."""
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=float, buffer=memory.buf)
+
+
+def _kepler_shard(elements: tuple, rates: tuple, output: tuple, start: int, stop: int, jds):
+    """Worker: writes the positions of rows start:stop at every Julian date into the shared output array (T, N, 3)."""
+    memories = list()
+    try:
+        for name, shape in (elements, rates, output):
+            memories.append(_attach(name, shape))
+        (_, element_rows), (_, rate_rows), (_, positions) = memories
+        for index, jd in enumerate(jds):
+            positions[index, start:stop] = orbit_positions(element_rows[start:stop], rate_rows[start:stop], jd)
+        del element_rows, rate_rows, positions
+    finally:
+        for memory, _ in memories:
+            memory.close()
+
+
+def _nbody_shard(massive_state: np.ndarray, massive_gm: np.ndarray, particles: tuple, start: int, stop: int, dt: float, steps: int):
+    """
+    Worker: integrates the massive bodies together with the test particles in rows start:stop of the shared (N, 6) array,
+    which are replaced by their new states. Returns the new states of the massive bodies.
+    """
+    memory, states = _attach(*particles)
+    try:
+        count = len(massive_gm)
+        state = leapfrog(np.vstack([massive_state, states[start:stop]]), np.concatenate([massive_gm, np.zeros(stop - start)]), dt, steps)
+        states[start:stop] = state[count:]
+        del states
+        return state[:count]
+    finally:
+        memory.close()
+
+
+class ParallelPropagator:
+    def __init__(self, workers: int | None = None):
+        """
+        Computes the positions of many bodies on several processes at once, for swarms of tens of thousands of asteroids.
+        Bodies are split into one contiguous shard per process. Their elements, states and positions are exchanged
+        through shared memory, so only a few numbers are pickled per shard whatever the number of bodies.
+        Kepler positions are independent, and test particles of the N-body integrator don't pull on each other, so every
+        shard runs without talking to the others: each process integrates the Sun and planets itself along with its shard.
+        :param workers: The number of processes. If None, one per CPU core.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._elements, self._rates, self._output, self._states = SharedArray(), SharedArray(), SharedArray(), SharedArray()
+        self._arrays = None  # The propagator arrays currently copied into shared memory
+        weakref.finalize(self, ParallelPropagator._release, self._elements, self._rates, self._output, self._states)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _shards(self, count: int):
+        """Splits rows 0:count into one (start, stop) range per worker, leaving out empty ones."""
+        bounds = np.linspace(0, count, min(self.workers, count) + 1).astype(int)
+        return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+    def positions(self, propagator: KeplerPropagator, jd, arrays: tuple | None = None) -> np.ndarray:
+        """
+        The same as KeplerPropagator.positions, computed in parallel.
+        :param jd: A Julian date, or a sequence of them to get a (T, N, 3) array of the positions at each.
+        :param arrays: The propagator's arrays() from earlier, or None for the current ones.
+        """
+        jds = np.atleast_1d(np.asarray(jd, dtype=float))
+        elements, rates, parents = arrays = propagator.arrays() if arrays is None else arrays
+        if self._arrays is not arrays:  # Bodies changed, so the shared elements are out of date
+            self._elements.array(elements.shape)[:] = elements
+            self._rates.array(rates.shape)[:] = rates
+            self._arrays = arrays
+        shape = (jds.size, len(elements), 3)
+        output = self._output.array(shape)
+        futures = [self.executor.submit(_kepler_shard, (self._elements.name, elements.shape), (self._rates.name, rates.shape),
+                                        (self._output.name, shape), start, stop, jds.tolist())
+                   for start, stop in self._shards(len(elements))]
+        for future in futures:
+            future.result()
+        positions = output.copy()
+        satellites = parents >= 0
+        positions[:, satellites] += positions[:, parents[satellites]]
+        return positions if np.ndim(jd) else positions[0]
+
+    def integrate(self, integrator: NBodyIntegrator, jd: float):
+        """The same as NBodyIntegrator.integrate, computed in parallel."""
+        if not len(integrator) or jd == integrator.jd:
+            integrator.integrate(jd)
+            return
+        steps, dt = integrator.steps_to(jd)
+        massive = integrator.gm > 0
+        massive_state, massive_gm = integrator.state[massive], integrator.gm[massive]
+        shape = (int(np.count_nonzero(~massive)), 6)
+        particles = self._states.array(shape)
+        particles[:] = integrator.state[~massive]
+        futures = [self.executor.submit(_nbody_shard, massive_state, massive_gm, (self._states.name, shape), start, stop, dt, steps)
+                   for start, stop in self._shards(shape[0])]
+        results = [future.result() for future in futures]
+        state = integrator.state.copy()
+        state[~massive] = particles
+        # Every shard integrated the massive bodies the same way; without particles, they're integrated here
+        state[massive] = results[0] if results else leapfrog(massive_state, massive_gm, dt, steps)
+        integrator.state, integrator.jd = state, jd
+
+    @staticmethod
+    def _release(*shared_arrays):
+        for shared_array in shared_arrays:
+            shared_array.close()
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._arrays = None
+        self._release(self._elements, self._rates, self._output, self._states)
@@ -0,0 +1,132 @@
+import threading
+from collections import deque
+from datetime import timedelta
+from time import monotonic
+
+
+class Playback:
+    def __init__(self, widget, engine, max_fps: float = 30, buffer_frames: int = 3, on_state=None):
+        """
+        Plays a simulation in real time: simulated time advances at a set rate, and frames are shown with Tk's after().
+        A thread computes the positions of the next frames ahead of time, so drawing never waits for them. The time between
+        frames follows how long a frame actually takes to apply and draw (up to max_fps), and the simulated step grows with
+        it. A frame that is ready too late is dropped for a newer one, so a slow machine shows fewer frames, not a lag.
+        :param widget: Any widget of the window; its after() method schedules the frames.
+        :param engine: The SimulationEngine to play.
+        :param max_fps: The most frames shown per second.
+        :param buffer_frames: How many frames are computed ahead.
+        :param on_state: An optional function called with True when playback starts and False when it stops.
+        """
+        self.widget = widget
+        self.engine = engine
+        self.max_fps = max_fps
+        self.buffer_frames = buffer_frames
+        self.on_state = on_state
+        self.rate = 24.0  # Simulated hours per second
+        self.playing = False
+        self.frame_cost = 1 / max_fps  # Moving average of the seconds a frame takes to apply and draw
+        self.shown, self.dropped = 0, 0  # Frames shown and dropped since playback started
+        self._frames = deque()  # (seconds after the start, (time, ids, positions)) of the computed frames, in order
+        self._work = 0.0  # The seconds the last frame took to apply
+        self._condition = threading.Condition()
+        self._generation = 0  # Bumped when playback stops, so the computing thread of the previous run quits
+        self._start = None  # (monotonic time, simulated time) playback started at
+        self._last_tick = None  # (started, due) of the last frame: when it started, and when the next one is due
+
+    @property
+    def frame_period(self) -> float:
+        """The seconds between frames: what a frame costs, but no less than 1 / max_fps."""
+        return max(1 / self.max_fps, self.frame_cost)
+
+    def _elapsed(self) -> float:
+        return monotonic() - self._start[0]
+
+    def _time_at(self, elapsed: float):
+        return self._start[1] + timedelta(hours=self.rate * elapsed)
+
+    def play(self, rate: float | None = None):
+        """
+        Starts playing from the engine's current time, or changes the rate if already playing.
+        :param rate: Simulated hours per second (negative to play backwards). If None, the last rate is kept.
+        """
+        if rate is not None and rate != self.rate:
+            self.pause()  # Frames computed at the old rate are useless
+            self.rate = float(rate)
+        if self.playing or not self.rate:
+            return
+        self.playing = True
+        self.shown, self.dropped = 0, 0
+        self._start = (monotonic(), self.engine.time)
+        self._last_tick = None
+        with self._condition:
+            self._generation += 1
+            generation = self._generation
+        threading.Thread(target=self._compute, args=(generation,), daemon=True).start()
+        if self.on_state is not None:
+            self.on_state(True)
+        self.widget.after(0, self._tick, generation)
+
+    def pause(self):
+        """Stops playing; the simulation stays at the last frame shown."""
+        if not self.playing:
+            return
+        self.playing = False
+        with self._condition:
+            self._generation += 1
+            self._frames.clear()
+            self._condition.notify_all()
+        if self.on_state is not None:
+            self.on_state(False)
+
+    def toggle(self, rate: float | None = None):
+        """Plays if paused, and pauses if playing."""
+        if self.playing:
+            self.pause()
+        else:
+            self.play(rate)
+
+    def _compute(self, generation: int):
+        """Computes frames ahead of the one shown; runs on its own thread until playback stops."""
+        elapsed = 0.0
+        while True:
+            with self._condition:
+                while self._generation == generation and len(self._frames) >= self.buffer_frames:
+                    self._condition.wait()
+                if self._generation != generation:
+                    return
+                # The next frame is one period after the last, or after now if computing has fallen behind
+                elapsed = max(elapsed + self.frame_period, self._elapsed() + self.frame_period)
+            frame = self.engine.positions_at(self._time_at(elapsed))
+            with self._condition:
+                if self._generation != generation:
+                    return
+                self._frames.append((elapsed, frame))
+
+    def _tick(self, generation: int):
+        """Shows the newest frame that is due, dropping older ones; runs on the Tk main thread."""
+        if generation != self._generation:
+            return
+        started = monotonic()
+        if self._last_tick is not None:
+            last_started, due = self._last_tick
+            # Late means applying and drawing the last frame took longer than the period: that's what a frame costs. On time,
+            # the drawing is hidden in the delay, so only applying is counted and the period shrinks until frames are late.
+            late = started - due > 0.002
+            cost = started - last_started if late else self._work
+            self.frame_cost = 0.8 * self.frame_cost + 0.2 * cost
+        frame = None
+        with self._condition:
+            elapsed = started - self._start[0]
+            while self._frames and self._frames[0][0] <= elapsed:
+                if frame is not None:
+                    self.dropped += 1
+                frame = self._frames.popleft()[1]
+            self._condition.notify_all()
+        if frame is not None:
+            self.engine.apply_positions(*frame)
+            self.shown += 1
+        finished = monotonic()
+        self._work = finished - started
+        delay_ms = max(int((self.frame_period - self._work) * 1000), 1)
+        self._last_tick = (started, finished + delay_ms / 1000)
+        self.widget.after(delay_ms, self._tick, generation)
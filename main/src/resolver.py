@@ -0,0 +1,145 @@
+import re
+import sqlite3
+import threading
+from os import makedirs, path
+from typing import NamedTuple
+
+DEFAULT_RESOLVER_PATH = path.join(path.expanduser('~'), '.astroinfo', 'resolver.sqlite3')
+MMAP_BYTES = 256 * 1024 * 1024  # How much of the index file SQLite may memory-map instead of reading it page by page
+# Splits an SBDB full name such as '99942 Apophis (2004 MN4)' or '(2020 AB)' into its number, name and provisional designation
+FULL_NAME = re.compile(r'^\s*(?:(\d+)\s+)?([^()]*?)\s*(?:\(([^()]+)\))?\s*$')
+
+
+def normalize(identifier) -> str:
+    """Returns the form an identifier is looked up by: case and spacing don't matter, and '(2004 MN4)' is '2004 mn4'."""
+    identifier = ' '.join(str(identifier).split()).lower()
+    if identifier.startswith('(') and identifier.endswith(')'):
+        identifier = identifier[1:-1].strip()
+    return identifier
+
+
+def canonical_spkid(designation: str, spkid) -> str:
+    """
+    Returns the SPK-ID that NeoWs and Horizons know an asteroid by. Numbered asteroids are 2,000,000 + their number (SBDB
+    reports some of them as 20,000,000 + their number); unnumbered ones keep the SPK-ID SBDB gives them.
+    :param designation: The primary designation from SBDB (the number, for numbered asteroids).
+    :param spkid: The SPK-ID from SBDB.
+    """
+    designation = str(designation).strip()
+    return str(2_000_000 + int(designation)) if designation.isdigit() else str(spkid).strip()
+
+
+class Resolution(NamedTuple):
+    """The identifiers of one asteroid, as stored in the ResolverIndex."""
+    spkid: str
+    designation: str  # The primary designation SBDB files the asteroid under: its number, or its provisional designation
+    full_name: str
+    neo: bool
+
+    @classmethod
+    def from_sbdb(cls, sbdb):
+        """Builds a Resolution from an SBDB payload (anything with an 'object' section)."""
+        obj = sbdb['object']
+        return cls(canonical_spkid(obj['des'], obj['spkid']), str(obj['des']), str(obj['fullname']).strip(), bool(obj.get('neo')))
+
+    def aliases(self) -> set:
+        """Returns every normalized identifier the asteroid can be looked up by."""
+        aliases = {normalize(self.spkid), normalize(self.designation), normalize(self.full_name)}
+        number, name, provisional = FULL_NAME.match(self.full_name).groups()
+        for alias in (number, name, provisional):
+            if alias:
+                aliases.add(normalize(alias))
+        if number and name:
+            aliases.add(normalize(f"{number} {name}"))
+        return aliases
+
+
+class ResolverIndex:
+    def __init__(self, db_path: str = DEFAULT_RESOLVER_PATH, mmap_bytes: int = MMAP_BYTES):
+        """
+        A local index that maps names, designations, numbers and SPK-IDs of asteroids to each other, so an identifier such as
+        'Apophis', '99942' or '2004 MN4' is resolved without the network. It grows with every asteroid looked up in SBDB, or
+        can be filled in bulk from the SBDB query API (see classes.build_resolver_index).
+        The file is memory-mapped, so lookups after startup don't have to read it from disk.
+        :param db_path: The path of the SQLite file. Use ':memory:' for an index that isn't persisted.
+        :param mmap_bytes: How many bytes of the file may be memory-mapped; 0 turns memory-mapping off.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        if db_path != ':memory:':
+            makedirs(path.dirname(path.abspath(db_path)), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute(f"PRAGMA mmap_size = {int(mmap_bytes)}")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (spkid TEXT PRIMARY KEY, designation TEXT, full_name TEXT, neo INTEGER) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, spkid TEXT) WITHOUT ROWID;
+        """)
+        self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+
+    def resolve(self, identifier) -> Resolution | None:
+        """Returns the Resolution of an identifier, or None if the index doesn't know it."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT objects.spkid, designation, full_name, neo FROM aliases JOIN objects USING (spkid) WHERE alias = ?",
+                (normalize(identifier),)).fetchone()
+        return Resolution(*row[:3], bool(row[3])) if row is not None else None
+
+    def resolve_many(self, identifiers) -> dict:
+        """
+        Resolves many identifiers with a few queries.
+        :return: A dictionary of identifier (as given) -> Resolution, or None for the identifiers the index doesn't know.
+        """
+        identifiers = list(identifiers)
+        found = dict()
+        aliases = list({normalize(identifier) for identifier in identifiers})
+        with self._lock:
+            for index in range(0, len(aliases), 500):  # Stay under SQLite's limit on query parameters
+                chunk = aliases[index:index + 500]
+                rows = self._connection.execute(
+                    "SELECT alias, objects.spkid, designation, full_name, neo FROM aliases JOIN objects USING (spkid) "
+                    f"WHERE alias IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((alias, Resolution(*row[:3], bool(row[3]))) for alias, *row in rows)
+        return {identifier: found.get(normalize(identifier)) for identifier in identifiers}
+
+    def add(self, resolutions, extra_aliases=()):
+        """
+        Stores asteroids and every identifier they can be looked up by.
+        :param resolutions: An iterable of Resolutions.
+        :param extra_aliases: (identifier, SPK-ID) tuples of other identifiers to remember, e.g. what a user typed.
+        """
+        objects, aliases = list(), list()
+        for resolution in resolutions:
+            objects.append((resolution.spkid, resolution.designation, resolution.full_name, int(resolution.neo)))
+            aliases.extend((alias, resolution.spkid) for alias in resolution.aliases())
+        aliases.extend((normalize(alias), spkid) for alias, spkid in extra_aliases)
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)", objects)
+            self._connection.executemany("INSERT OR REPLACE INTO aliases VALUES (?, ?)", aliases)
+
+    def add_sbdb(self, identifier, sbdb) -> Resolution:
+        """Stores the asteroid of an SBDB payload, remembering the identifier it was looked up by, and returns its Resolution."""
+        resolution = Resolution.from_sbdb(sbdb)
+        self.add([resolution], extra_aliases=[(identifier, resolution.spkid)])
+        return resolution
+
+    def add_sbdb_query(self, response: dict) -> int:
+        """
+        Stores every asteroid of an SBDB query API response that has the spkid, full_name, pdes and neo fields.
+        :return: The number of asteroids stored.
+        """
+        fields = response['fields']
+        spkid, full_name, pdes, neo = (fields.index(field) for field in ('spkid', 'full_name', 'pdes', 'neo'))
+        resolutions = [Resolution(canonical_spkid(row[pdes], row[spkid]), str(row[pdes]), str(row[full_name]).strip(), row[neo] == 'Y')
+                       for row in response.get('data', [])]
+        self.add(resolutions)
+        return len(resolutions)
+
+    def clear(self):
+        """Forgets every asteroid."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM objects")
+            self._connection.execute("DELETE FROM aliases")
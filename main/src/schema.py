@@ -0,0 +1,132 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+class SBDBRecord(NamedTuple):
+    """
+    The fields ASTROINFO reads from an SBDB payload, flattened and typed. Numbers are plain floats in the units SBDB uses
+    (AU, degrees, days, km, hours, g/cm^3); anything the payload doesn't have is None.
+    """
+    full_name: str | None = None
+    designation: str | None = None
+    neo: bool | None = None
+    pha: bool | None = None
+    orbit_class: str | None = None
+    orbit_id: str | None = None
+    epoch: float | None = None  # Julian date of the elements
+    moid: float | None = None  # Earth MOID reported by SBDB, in AU
+    e: float | None = None
+    a: float | None = None
+    q: float | None = None
+    Q: float | None = None
+    i: float | None = None
+    om: float | None = None
+    w: float | None = None
+    M: float | None = None
+    tp: float | None = None  # Julian date of perihelion passage
+    period: float | None = None
+    n: float | None = None  # Mean motion, in degrees per day
+    H: float | None = None
+    diameter: float | None = None
+    albedo: float | None = None
+    rot_per: float | None = None
+    density: float | None = None
+    spec_B: str | None = None
+    spec_T: str | None = None
+
+    def fill(self, other):
+        """Returns a copy with the missing fields taken from another record (e.g. one extracted from NeoWs)."""
+        missing = {field: value for field, value, own in zip(self._fields, other, self) if own is None and value is not None}
+        return self._replace(**missing) if missing else self
+
+
+def _float(value):
+    """Converts a number, a numeric string or an astropy Quantity to a float; returns None if it can't."""
+    try:
+        if isinstance(value, np.ndarray):  # Quantities are arrays; item() is much faster than .value, which copies the array
+            value = np.ndarray.item(value)
+        return float(value) if not isinstance(value, bool) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _string(value):
+    value = getattr(value, 'value', value)
+    return str(value) if value is not None else None
+
+
+def _bool(value):
+    return bool(value) if value is not None else None
+
+
+# Where each SBDBRecord field is found: (section of the payload, the keys it may be under in order of preference, converter)
+SBDB_SCHEMA = (
+    ('full_name', 'object', ('fullname',), _string),
+    ('designation', 'object', ('des',), _string),
+    ('neo', 'object', ('neo',), _bool),
+    ('pha', 'object', ('pha',), _bool),
+    ('orbit_class', 'orbit_class', ('name',), _string),
+    ('orbit_id', 'object', ('orbit_id',), _string),
+    ('epoch', 'orbit', ('epoch',), _float),
+    ('moid', 'orbit', ('moid',), _float),
+    ('e', 'elements', ('e',), _float),
+    ('a', 'elements', ('a',), _float),
+    ('q', 'elements', ('q',), _float),
+    ('Q', 'elements', ('Q', 'ad'), _float),
+    ('i', 'elements', ('i',), _float),
+    ('om', 'elements', ('om',), _float),
+    ('w', 'elements', ('w',), _float),
+    ('M', 'elements', ('M', 'ma'), _float),
+    ('tp', 'elements', ('tp',), _float),
+    ('period', 'elements', ('period', 'per'), _float),
+    ('n', 'elements', ('n',), _float),
+    ('H', 'phys_par', ('H',), _float),
+    ('diameter', 'phys_par', ('diameter',), _float),
+    ('albedo', 'phys_par', ('albedo',), _float),
+    ('rot_per', 'phys_par', ('rot_per',), _float),
+    ('density', 'phys_par', ('density',), _float),
+    ('spec_B', 'phys_par', ('spec_B',), _string),
+    ('spec_T', 'phys_par', ('spec_T',), _string),
+)
+# The same for a NeoWs record, used to fill in what SBDB doesn't have
+NEOWS_SCHEMA = (
+    ('orbit_id', 'orbital_data', ('orbit_id',), _string),
+    ('e', 'orbital_data', ('eccentricity',), _float),
+    ('a', 'orbital_data', ('semi_major_axis',), _float),
+    ('q', 'orbital_data', ('perihelion_distance',), _float),
+    ('Q', 'orbital_data', ('aphelion_distance',), _float),
+    ('M', 'orbital_data', ('mean_anomaly',), _float),
+    ('period', 'orbital_data', ('orbital_period',), _float),
+    ('H', 'neows', ('absolute_magnitude_h',), _float),
+    ('diameter', 'kilometers', ('estimated_diameter_min',), _float),
+)
+
+
+def _extract(sections: dict, schema) -> SBDBRecord:
+    """Reads every field of a schema from the sections of a payload in one pass, without raising for missing keys."""
+    values = dict()
+    for field, section, keys, convert in schema:
+        found = sections[section]
+        for key in keys:
+            value = found.get(key)
+            if value is not None:
+                values[field] = convert(value)
+                break
+    return SBDBRecord(**values)
+
+
+def extract_sbdb(sbdb) -> SBDBRecord:
+    """Converts an SBDB payload (as astroquery's SBDB.query returns it, or a plain decoded JSON response) to an SBDBRecord."""
+    sbdb = sbdb or dict()
+    obj, orbit = sbdb.get('object') or dict(), sbdb.get('orbit') or dict()
+    orbit_class = obj.get('orbit_class')
+    return _extract({'object': obj, 'orbit_class': orbit_class if isinstance(orbit_class, dict) else dict(), 'orbit': orbit,
+                     'elements': orbit.get('elements') or dict(), 'phys_par': sbdb.get('phys_par') or dict()}, SBDB_SCHEMA)
+
+
+def extract_neows(neows) -> SBDBRecord:
+    """Converts a NeoWs record to an SBDBRecord with the fields NeoWs has."""
+    neows = neows or dict()
+    kilometers = (neows.get('estimated_diameter') or dict()).get('kilometers') or dict()
+    return _extract({'orbital_data': neows.get('orbital_data') or dict(), 'neows': neows, 'kilometers': kilometers}, NEOWS_SCHEMA)
@@ -0,0 +1,95 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundWorker:
+    def __init__(self, widget, max_workers: int = 4, poll_ms: int = 50, on_busy=None):
+        """
+        Runs slow calls (network requests) on a pool of threads so a Tk window keeps responding, and hands their results back
+        to the Tk main thread with after(). Tk widgets must only be touched from the main thread, so callbacks always run there.
+        :param widget: Any widget of the window; its after() method is used to poll for finished jobs.
+        :param max_workers: The maximum number of jobs running at the same time.
+        :param poll_ms: How often (in milliseconds) finished jobs are checked for while jobs are running.
+        :param on_busy: An optional function called with True when the first job starts and False when the last one ends
+        (e.g. to show a progress bar).
+        """
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._results = queue.Queue()
+        self._jobs = dict()  # Key -> (generation, future, on_done, on_error) of the latest job submitted with that key
+        self._generations = dict()
+        self._polling = False
+
+    @property
+    def busy(self) -> bool:
+        """True if any job hasn't been handed back yet."""
+        return bool(self._jobs)
+
+    def submit(self, key: str, function, *args, on_done=None, on_error=None, **kwargs):
+        """
+        Runs a function in the background. Submitting another job with the same key supersedes this one: it is cancelled if it
+        hasn't started, and its result is thrown away if it has.
+        :param key: The name of the request (e.g. 'asteroid'); only the latest job of each key reports back.
+        :param function: The function to run, called with args and kwargs.
+        :param on_done: Called on the main thread with the function's return value.
+        :param on_error: Called on the main thread with the exception if the function raises one. If None, the exception is re-raised there.
+        """
+        if (job := self._jobs.pop(key, None)) is not None:
+            job[1].cancel()
+        generation = self._generations[key] = self._generations.get(key, 0) + 1
+        future = self._executor.submit(function, *args, **kwargs)
+        self._jobs[key] = (generation, future, on_done, on_error)
+        future.add_done_callback(lambda done: self._results.put((key, generation, done)))
+        if len(self._jobs) == 1 and job is None and self.on_busy is not None:
+            self.on_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+        return future
+
+    def cancel(self, key: str):
+        """Forgets the running job of a key, cancelling it if it hasn't started yet."""
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job[1].cancel()
+            if not self._jobs and self.on_busy is not None:
+                self.on_busy(False)
+
+    def _poll(self):
+        """Hands finished jobs back to their callbacks; runs on the main thread."""
+        try:
+            while True:
+                try:
+                    key, generation, future = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                job = self._jobs.get(key)
+                if job is None or job[0] != generation:
+                    continue  # Superseded or cancelled
+                del self._jobs[key]
+                _, _, on_done, on_error = job
+                if not self._jobs and self.on_busy is not None:
+                    self.on_busy(False)
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is None:
+                    if on_done is not None:
+                        on_done(future.result())
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    raise error
+        finally:  # Keep polling even if a callback raised
+            if self._jobs or not self._results.empty():
+                self.widget.after(self.poll_ms, self._poll)
+            else:
+                self._polling = False
+
+    def shutdown(self):
+        """Cancels every job that hasn't started and stops reporting results."""
+        for key in list(self._jobs):
+            self.cancel(key)
+        self._executor.shutdown(wait=False, cancel_futures=True)